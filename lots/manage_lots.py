@@ -23,6 +23,8 @@ django.setup()
 
 from lots.models import Grower, Lot, StockSeed, Inventory, GermSamplePrint, Germination, GerminationBatch, RetiredLot, LotNote, Growout, MixLot
 from products.models import Variety
+from products.reports import ReportContext
+from lots.reports import lots_without_germ, lots_with_pending_germs
 
 
 # ============================================================================
@@ -303,26 +305,9 @@ def find_lots_without_germ_for_year():
     
     year = int(year_input)
     
-    # Get all non-retired lots
-    lots_without_germ = []
-    all_lots = Lot.objects.all().select_related('variety', 'grower').order_by('variety__sku_prefix', 'year')
+    missing = lots_without_germ(ReportContext(), year)
     
-    for lot in all_lots:
-        # Skip retired lots
-        if hasattr(lot, 'retired_info'):
-            continue
-        
-        # Skip lots from the previous year (year - 1)
-        if lot.year == (year - 1):
-            continue
-        
-        # Check if lot has any germination record for this year
-        has_germ_for_year = lot.germinations.filter(for_year=year).exists()
-        
-        if not has_germ_for_year:
-            lots_without_germ.append(lot)
-    
-    if not lots_without_germ:
+    if not missing:
         print(f"\n✅ All non-retired lots (excluding 20{year-1} lots) have germination entries for 20{year}")
         return
     
@@ -332,12 +317,10 @@ def find_lots_without_germ_for_year():
     print(f"{'Lot Code':<20} {'Variety':<40} {'Lot':<10} {'Status'}")
     print("-"*100)
     
-    for lot in lots_without_germ:
-        status = lot.get_lot_status()
-        lot_short = lot.get_four_char_lot_code()
-        print(f"{lot.build_lot_code():<20} {lot.variety.var_name[:38]:<40} {lot_short:<10} {status}")
+    for lot in missing:
+        print(f"{lot['lot_code']:<20} {lot['variety'][:38]:<40} {lot['lot']:<10} {lot['status']}")
     
-    print(f"\nTotal: {len(lots_without_germ)} lots without germ entry for 20{year}")
+    print(f"\nTotal: {len(missing)} lots without germ entry for 20{year}")
 
 def delete_mix_variety_lots():
     """Delete all lots associated with mix varieties"""
@@ -377,14 +360,9 @@ def find_lots_with_pending_germs():
     
     year = int(year_input)
     
-    # Find all lots that have pending germinations for this year
-    lots_with_pending = Lot.objects.filter(
-        germinations__for_year=year,
-        germinations__status='pending',
-        germinations__test_date__isnull=False 
-    ).distinct().select_related('variety', 'grower').prefetch_related('germinations')
+    lots_with_pending = lots_with_pending_germs(ReportContext(), year)
     
-    if not lots_with_pending.exists():
+    if not lots_with_pending:
         print(f"\nNo lots found with pending germinations for 20{year}")
         return
     
@@ -393,19 +371,13 @@ def find_lots_with_pending_germs():
     print(f"{'='*80}")
     
     for lot in lots_with_pending:
-        pending_germs = lot.germinations.filter(for_year=year, status='pending', test_date__isnull=False)
-        
-        print(f"\nLot: {lot.build_lot_code()}")
-        print(f"Variety: {lot.variety.name if hasattr(lot.variety, 'name') else lot.variety}")
-        print(f"Grower: {lot.grower}")
-        print(f"Pending Germs: {pending_germs.count()}")
-        
-        for germ in pending_germs:
-            print(f"  - Rate: {germ.germination_rate}%, Test Date: {germ.test_date or 'Not set'}")
-            if germ.notes:
-                print(f"    Notes: {germ.notes}")
+        print(f"\nLot: {lot['lot_code']}")
+        print(f"Variety: {lot['variety']}")
+        print(f"Grower: {lot['grower']}")
+        print(f"Pending Germs: {lot['pending_germs']}")
+        print(f"  - {lot['rates']}")
     
-    print(f"\nTotal lots with pending germs: {lots_with_pending.count()}")
+    print(f"\nTotal lots with pending germs: {len(lots_with_pending)}")
 
 
 
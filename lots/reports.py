@@ -0,0 +1,44 @@
+"""
+Read-only lot and germination checks for run_reports (see products.reports.REPORTS).
+Both read the lots and germinations preloaded in the shared ReportContext.
+"""
+
+
+def lots_without_germ(context, year):
+    """
+    Non-retired lots (except last year's) with no germination entry for the year
+    """
+    results = []
+    for lot in context.lots:
+        if lot.id in context.retired_lot_ids or lot.year == year - 1:
+            continue
+        if any(germination.for_year == year for germination in context.germinations.get(lot.id, [])):
+            continue
+        results.append({
+            'lot_code': lot.build_lot_code(),
+            'variety': lot.variety.var_name or '--',
+            'lot': lot.get_four_char_lot_code(),
+            'status': context.lot_status(lot),
+        })
+    return results
+
+
+def lots_with_pending_germs(context, year):
+    """
+    Lots with tested germinations still pending for the year
+    """
+    results = []
+    for lot in context.lots:
+        pending = [
+            germination for germination in context.germinations.get(lot.id, [])
+            if germination.for_year == year and germination.status == 'pending' and germination.test_date
+        ]
+        if pending:
+            results.append({
+                'lot_code': lot.build_lot_code(),
+                'variety': lot.variety.var_name or '--',
+                'grower': str(lot.grower) if lot.grower else '--',
+                'pending_germs': len(pending),
+                'rates': ", ".join(f"{germination.germination_rate}% ({germination.test_date})" for germination in pending),
+            })
+    return results
@@ -15,37 +15,16 @@ function initializeShippingPage() {
     checkboxes.forEach(checkbox => {
         checkbox.addEventListener('change', handleQuickBooksToggle);
     });
-
-    // Trigger filter on page load to show only the selected year
-    if (yearSelect && yearSelect.value) {
-        filterByYear.call(yearSelect);
-    }
 }
 
 /**
- * Filter table rows by selected year
+ * Reload the ledger for the selected year (filtering and paging happen server-side)
  */
-
 function filterByYear() {
-    const selectedYear = this.value;
-    const tableRows = document.querySelectorAll('#ordersTableBody tr[data-year]');
-    
-    tableRows.forEach(row => {
-        if (!selectedYear) {
-            // Show all rows if no year is selected
-            row.style.display = '';
-        } else {
-            // Show only rows matching the selected year
-            const rowYear = row.getAttribute('data-year');
-            // Compare last 2 digits of selected year with row year
-            const selectedYearSuffix = selectedYear.slice(-2);
-            if (rowYear === selectedYearSuffix) {
-                row.style.display = '';
-            } else {
-                row.style.display = 'none';
-            }
-        }
-    });
+    const params = new URLSearchParams(window.location.search);
+    params.set('year', this.value);
+    params.delete('page');
+    window.location.search = params.toString();
 }
 
 
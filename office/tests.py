@@ -1,3 +1,108 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import transaction
 from django.test import TestCase
+from django.utils import timezone
+
+from office.views import shipping_ledger_queryset, store_sales_summary
+from products.models import Product, Variety, Sales
+from stores.models import Store, StoreOrder, SOIncludes, StoreReturns, WholesalePktPrice
+from stores.order_lines import resolve_order_products, sync_order_lines
+from uprising.utils.cache import invalidate
+
+
+class ShippingLedgerTests(TestCase):
+
+    def setUp(self):
+        variety = Variety.objects.create(sku_prefix="RAD-T0", var_name="Radish")
+        product = Product.objects.create(variety=variety, sku_suffix="pkt")
+        other = Product.objects.create(variety=variety, sku_suffix="1oz")
+
+        credited = Store.objects.create(store_num=21, store_name="Returns Store")
+        normal = Store.objects.create(store_num=22, store_name="Normal Store")
+        WholesalePktPrice.objects.create(year=25, price_per_packet=Decimal("2.50"))
+        WholesalePktPrice.objects.create(year=26, price_per_packet=Decimal("2.75"))
+        StoreReturns.objects.create(store=credited, return_year=25, packets_returned=4)
+        StoreReturns.objects.create(store=normal, return_year=24, packets_returned=9)
+
+        for store, order_number, lines in (
+            (credited, "W2101-26", [(product, 10, "2.75"), (other, 2, "5.00")]),
+            (credited, "W2102-26", [(product, 3, "2.75")]),
+            (normal, "W2201-26", [(product, 6, "2.75")]),
+            (normal, "W2202-26", []),
+        ):
+            order = StoreOrder.objects.create(store=store, order_number=order_number, fulfilled_date=timezone.now())
+            for line_product, quantity, price in lines:
+                SOIncludes.objects.create(store_order=order, product=line_product, quantity=quantity, price=Decimal(price))
+        StoreOrder.objects.create(store=normal, order_number="W2203-26")  # not fulfilled
+
+    def test_totals_and_credit(self):
+        with self.assertNumQueries(1):
+            ledger = {
+                order.order_number: (order.total_packets, order.subtotal, order.credit)
+                for order in shipping_ledger_queryset(26)
+            }
+        self.assertEqual(ledger, {
+            # first order of the year gets last year's returns x last year's packet price
+            "W2101-26": (12, Decimal("37.50"), Decimal("10.00")),
+            "W2102-26": (3, Decimal("8.25"), Decimal("0")),
+            # no returns for 25 (the 24 returns don't count)
+            "W2201-26": (6, Decimal("16.50"), Decimal("0")),
+            "W2202-26": (0, Decimal("0"), Decimal("0")),
+        })
+
+
+class AnalyticsCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.store = Store.objects.create(store_num=13, store_name="Store 13")
+        variety = Variety.objects.create(sku_prefix="KAL-T0", var_name="Kale", crop="Kale")
+        self.product = Product.objects.create(variety=variety, sku_suffix="pkt")
+
+    def fulfill(self, order_number, quantity):
+        order = StoreOrder.objects.create(store=self.store, order_number=order_number, fulfilled_date=timezone.now())
+        items = [{'sku_prefix': "KAL-T0", 'quantity': quantity}]
+        sync_order_lines(order, items, resolve_order_products(items), Decimal("2.00"))
+
+    def test_cached_until_domain_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fulfill("W1301-26", 5)
+
+        self.assertEqual(store_sales_summary(26)['sales_by_store'][0]['total_packets'], 5)
+        with self.assertNumQueries(0):
+            store_sales_summary(26)
+
+        # an unrelated domain leaves it cached
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate('lots')
+        with self.assertNumQueries(0):
+            store_sales_summary(26)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fulfill("W1302-26", 4)
+        self.assertEqual(store_sales_summary(26)['sales_by_store'][0]['total_packets'], 9)
+
+    def test_one_bump_per_transaction(self):
+        with mock.patch('uprising.utils.cache._bump') as bump:
+            with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+                for i in range(5):
+                    Variety.objects.create(sku_prefix=f"KAL-X{i}", var_name="Kale")
+                Sales.objects.create(product=self.product, quantity=1, year=26)
+        self.assertEqual(bump.call_count, 1)
+        self.assertTrue({'products', 'sales'} <= bump.call_args[0][0])
 
-# Create your tests here.
+    def test_rolled_back_savepoint_keeps_pending_domains(self):
+        with mock.patch('uprising.utils.cache._bump') as bump:
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        invalidate('lots')
+                        raise ValueError
+                except ValueError:
+                    pass
+                invalidate('sales')
+        self.assertEqual(bump.call_count, 1)
+        self.assertTrue({'lots', 'sales'} <= bump.call_args[0][0])
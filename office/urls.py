@@ -32,6 +32,7 @@ urlpatterns = [
     path('api/update-website-bulk/', update_website_bulk, name='update_website_bulk'),
     path('variety/<str:sku_prefix>/update-growout/', update_variety_growout, name='update_variety_growout'),
     path('api/variety-sales/<str:sku_prefix>/', variety_sales_data, name='variety_sales_data'),
+    path('api/sales-matrix/', sales_matrix_data, name='sales_matrix_data'),
     path('variety-usage/<str:sku_prefix>/', variety_usage, name='variety_usage'),
     path('variety/<str:sku_prefix>/update_notes/', update_variety_notes, name='update_variety_notes'),
     path('api/check-shopify-inventory/<str:sku_prefix>/', check_shopify_inventory, name='check_shopify_inventory'),
@@ -132,6 +133,7 @@ urlpatterns = [
     path('store-returns-data/', get_store_returns_data, name='get_store_returns_data'),
     path('store-sales-data/', get_store_sales_data, name='get_store_sales_data'),
     path('store-sales-details/', store_sales_details, name='store_sales_details'),
+    path('api/sales-series/', sales_series_data, name='sales_series_data'),
     path('set-wholesale-price/', set_wholesale_price, name='set_wholesale_price'),
     path('combine-orders/', combine_store_orders, name='combine_store_orders'),
     path('set-photos-auto/', set_photos_auto, name='set_photos_auto'),
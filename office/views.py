@@ -6,25 +6,29 @@ from django.shortcuts import redirect, render, get_object_or_404
 from django.contrib.auth.decorators import user_passes_test, login_required
 from django.http import JsonResponse
 from django.contrib.auth import login
-from products.models import Variety, Product, LastSelected, LabelPrint, Sales, MiscSales, MiscProduct
-from stores.models import Store, StoreProduct, StoreOrder, SOIncludes, PickListPrinted, StoreReturns, WholesalePktPrice
-from orders.models import OOIncludes, OnlineOrder
+from products.models import Variety, Product, LastSelected, LabelPrint, Sales, ProductSalesYear
+from products.envelopes import envelope_report
+from products.series import sales_series, sales_matrix, SERIES_CHANNELS, MATRIX_SELECTORS
+from products.reports import read_shopify_export, stream_uploaded_csv, build_pre_opening_report
+from products.snapshots import try_save_inventory_snapshot, frame_from_csv_products
+from stores.models import Store, StoreProduct, StoreOrder, SOIncludes, PickListPrinted, StoreReturns, WholesalePktPrice, StoreProductHistory, StoreSalesDaily
+from stores.reports import get_store_sales_report, get_store_returns_report
+from stores.order_lines import resolve_order_products, sync_order_lines, merge_order_groups
 from lots.models import Grower, Lot, RetiredLot, StockSeed, Germination, GermSamplePrint, Inventory, MixLot, MixLotComponent, MixBatch, RetiredMixLot, Growout
 from django.contrib.auth.forms import AuthenticationForm
-from django.db.models import Case, When, IntegerField, Max, Sum, F, CharField, Value, Q, Prefetch
-from django.db.models.functions import Concat
+from django.db.models import Case, When, IntegerField, Max, Sum, F, CharField, Value, Q, Prefetch, OuterRef, Subquery, DecimalField, ExpressionWrapper
+from django.db.models.functions import Concat, Coalesce
+from django.core.paginator import Paginator
 from uprising.utils.auth import is_employee
+from uprising.utils.cache import invalidate, versioned_cache
 from django.conf import settings
 from django.views.decorators.http import require_http_methods
 from django.core.exceptions import ValidationError
 from django.utils import timezone
-from datetime import timedelta
+from datetime import date, timedelta
 import pytz
 from decimal import Decimal, InvalidOperation
 from stores.models import WholesalePktPrice
-import math
-import csv
-import io
 import shopify
 from django.db import transaction
 from decimal import Decimal
@@ -226,6 +230,7 @@ def view_variety(request, sku_prefix=None):  # Add optional parameter
         # Auto-assign active mix lot to all products
         if active_mix_lot:
             products.update(mix_lot=active_mix_lot, lot=None)
+            invalidate('products')
 
         has_pending_germ = False  # Mixes don't have pending germ samples
         
@@ -311,7 +316,8 @@ def view_variety(request, sku_prefix=None):  # Add optional parameter
         'last_selected': variety_obj,
         'variety': variety_obj,
         'is_mix': is_mix, 
-        'products': products,
+        # sales/print columns come from annotations, not per-product queries
+        'products': products.with_stats(),
         'lots': lots,
         'lots_json': lots_json,
         'lots_extra_data': lots_extra_data,
@@ -456,6 +462,7 @@ def assign_lot_to_product(request):
                 lot = Lot.objects.get(pk=lot_id) if lot_id else None
                 # Update all products with the same variety
                 Product.objects.filter(variety=product.variety).update(lot=lot)
+                invalidate('products')
                 return JsonResponse({'success': True})
             
             product = Product.objects.get(pk=product_id)
@@ -577,12 +584,10 @@ def analytics(request):
     """
     View for displaying analytics and business performance metrics
     """
-    # Get envelope count data for the most recent sales year
-    envelope_data = get_envelope_count_data()
-    total_store_sales, pending_store_sales = Store.get_total_store_sales(settings.CURRENT_ORDER_YEAR)
-    # print(f"DEBUG VIEW: total_store_sales = {total_store_sales}")
-    total_store_pkts, pending_store_pkts = Store.get_total_store_packets(settings.CURRENT_ORDER_YEAR)
-    # print(f"DEBUG VIEW: total_store_pkts = {total_store_pkts}")
+    # Envelope usage for the most recent sales year and next season's projection
+    report = envelope_report(years_back=3)
+    envelope_data = get_envelope_count_data(report)
+    store_totals = Store.get_store_totals(settings.CURRENT_ORDER_YEAR)
     current_year = f"20{settings.CURRENT_ORDER_YEAR}"
 
     # Ensure we serialize the JSON properly
@@ -596,12 +601,16 @@ def analytics(request):
         'envelope_data': envelope_data['envelope_counts'],
         'envelope_total': envelope_data['total'],
         'last_sales_year': envelope_data['year'],
-        'total_store_sales': total_store_sales,
-        'pending_store_sales': pending_store_sales,
-        'total_store_pkts': total_store_pkts,
-        'pending_store_pkts': pending_store_pkts,
+        'envelope_forecast_json': json.dumps(report['forecast']),
+        'envelope_forecast_year': report['forecast_year'],
+        'total_store_sales': store_totals['fulfilled_sales'],
+        'pending_store_sales': store_totals['pending_sales'],
+        'total_store_pkts': store_totals['fulfilled_packets'],
+        'pending_store_pkts': store_totals['pending_packets'],
         'current_year': current_year,
+        'current_order_year': settings.CURRENT_ORDER_YEAR,
         'top_sellers': top_sellers,
+        'top_seller_years': list(ProductSalesYear.objects.values_list('year', flat=True).distinct().order_by('-year')),
     }
     
     # print(f"DEBUG VIEW: final context envelope_data_json = {context['envelope_data_json']}")
@@ -609,132 +618,52 @@ def analytics(request):
     return render(request, 'products/analytics.html', context)
 
 
-def get_envelope_count_data():
+def get_envelope_count_data(report=None):
     """
     Calculate envelope usage for the most recent sales year
     """
-    # Find the most recent sales year
-    latest_year = Sales.objects.aggregate(max_year=Max('year'))['max_year']
-    # print(f"DEBUG: Latest sales year: {latest_year}")
-    
-    if not latest_year:
+    report = report or envelope_report(years_back=1)
+    if not report['years']:
         return {
             'envelope_counts': {},
             'total': 0,
             'year': None
         }
-    
-    # Get all sales for the latest year
-    sales_data = Sales.objects.filter(year=latest_year).select_related('product')
-    # print(f"DEBUG: Found {sales_data.count()} sales records for {latest_year}")
-    
-    # Group by product and sum quantities (combining wholesale and retail)
-    product_totals = {}
-    for sale in sales_data:
-        product_id = sale.product.id
-        if product_id not in product_totals:
-            product_totals[product_id] = {
-                'product': sale.product,
-                'total_quantity': 0
-            }
-        product_totals[product_id]['total_quantity'] += sale.quantity
-    
-    # print(f"DEBUG: Found {len(product_totals)} unique products")
-    
-    # Group by envelope type and calculate totals
-    envelope_counts = {}
-    total_envelopes = 0
-    products_with_env_type = 0
-    products_without_env_type = 0
-    
-    for product_data in product_totals.values():
-        product = product_data['product']
-        quantity = product_data['total_quantity']
-        
-        # print(f"DEBUG: Product {product.id} - env_type: '{product.env_type}' - quantity: {quantity}")
-        
-        # Skip if product doesn't have env_type or it's empty
-        if not product.env_type:
-            products_without_env_type += 1
-            print(f"DEBUG: Skipping product {product.id} - no env_type")
-            continue
-            
-        products_with_env_type += 1
-        envelope_type = product.env_type
-        
-        if envelope_type not in envelope_counts:
-            envelope_counts[envelope_type] = 0
-        
-        envelope_counts[envelope_type] += quantity
-        total_envelopes += quantity
-
-    # --- Misc Sales Mapping ---
-    MISC_ENVELOPE_MAP = {
-        "TOM-CH-pkts": ("Tomato", 7),
-        "PEA-SP-pkts": ("Pea", 3),
-        "BEA-MF-pkts": ("Bean", 4),
-    }
-
-    misc_sales = MiscSales.objects.filter(year=latest_year).select_related("product")
-
-    for misc_sale in misc_sales:
-        sku = misc_sale.product.sku
-        quantity = misc_sale.quantity
-
-        if sku in MISC_ENVELOPE_MAP:
-            env_type, multiplier = MISC_ENVELOPE_MAP[sku]
-            env_count = quantity * multiplier
-
-            if env_type not in envelope_counts:
-                envelope_counts[env_type] = 0
-
-            envelope_counts[env_type] += env_count
-            total_envelopes += env_count
-        else:
-            # Optional: log or skip unknown SKUs
-            print(f"⚠️ Unmapped misc SKU: {sku}")
 
-    
-    # Sort envelope counts by quantity (descending)
-    envelope_counts = dict(sorted(envelope_counts.items(), key=lambda x: x[1], reverse=True))
-    
+    year = report['years'][0]
+    envelope_counts = report['usage'][year]
     return {
         'envelope_counts': envelope_counts,
-        'total': total_envelopes,
-        'year': latest_year
+        'total': sum(envelope_counts.values()),
+        'year': year
     }
 
 
 def get_envelope_data_for_printing(request):
     """
-    Get envelope data for the last 3 years for printing
+    Get envelope data for the last 3 years for printing, plus next season's projection
     """
-    from django.http import JsonResponse
-    from django.db.models import Max
     from datetime import datetime
     
     try:
-        # Get the most recent sales year
-        latest_year = Sales.objects.aggregate(max_year=Max('year'))['max_year']
-        
-        if not latest_year:
+        report = envelope_report(years_back=3)
+        years_to_include = report['years']
+
+        if not years_to_include:
             return JsonResponse({'error': 'No sales data found'}, status=404)
-        
-        # Get data for last 3 years
-        years_to_include = [latest_year - i for i in range(3)]
-        
+
         envelope_data_by_year = {}
-        
         for year in years_to_include:
-            # print(f"Getting envelope data for year: {year}")
-            year_data = get_envelope_count_data_for_year(year)
-            
+            envelope_counts = report['usage'][year]
+            total = sum(envelope_counts.values())
+
             # Only include years that have data
-            if year_data['total'] > 0:
-                envelope_data_by_year[str(year)] = year_data
-                # print(f"Added data for year {year}: {year_data['total']} total envelopes")
-            else:
-                print(f"No data found for year {year}")
+            if total > 0:
+                envelope_data_by_year[str(year)] = {
+                    'envelope_counts': envelope_counts,
+                    'total': total,
+                    'year': year
+                }
         
         # Calculate grand totals across all years
         grand_total_envelopes = sum(data['total'] for data in envelope_data_by_year.values())
@@ -744,15 +673,13 @@ def get_envelope_data_for_printing(request):
         for data in envelope_data_by_year.values():
             all_envelope_types.update(data['envelope_counts'].keys())
         
-        # print(f"Returning data for {len(envelope_data_by_year)} years")
-        # print(f"Grand total envelopes: {grand_total_envelopes}")
-        # print(f"Unique envelope types: {sorted(all_envelope_types)}")
-        
         return JsonResponse({
             'envelope_data_by_year': envelope_data_by_year,
             'years': [year for year in years_to_include if str(year) in envelope_data_by_year],
             'grand_total': grand_total_envelopes,
             'envelope_types': sorted(all_envelope_types),
+            'forecast_year': report['forecast_year'],
+            'forecast': report['forecast'],
             'generated_at': datetime.now().isoformat(),
             'report_title': f'Envelope Usage Report - Last 3 Years ({min(years_to_include)} - {max(years_to_include)})'
         })
@@ -761,124 +688,24 @@ def get_envelope_data_for_printing(request):
         print(f"Error in get_envelope_data_for_printing: {str(e)}")
         return JsonResponse({'error': str(e)}, status=500)
 
-def get_envelope_count_data_for_year(year):
-    """
-    Calculate envelope usage for a specific sales year
-    """
-    from django.db.models import Sum
-    
-    if not year:
-        return {
-            'envelope_counts': {},
-            'total': 0,
-            'year': None
-        }
-   
-    # Get aggregated sales data for the specific year, grouped by product
-    # This combines wholesale and retail quantities for each product
-    product_totals = (
-        Sales.objects
-        .filter(year=year)
-        .values('product', 'product__env_type')
-        .annotate(total_quantity=Sum('quantity'))
-    )
-    
-    # print(f"DEBUG: Found {len(product_totals)} unique products for {year}")
-   
-    # Group by envelope type and calculate totals
-    envelope_counts = {}
-    total_envelopes = 0
-    products_with_env_type = 0
-    products_without_env_type = 0
-   
-    for item in product_totals:
-        env_type = item['product__env_type']
-        quantity = item['total_quantity']
-        product_id = item['product']
-        
-        # print(f"DEBUG: Product {product_id} - env_type: '{env_type}' - quantity: {quantity}")
-       
-        # Skip if product doesn't have env_type or it's empty
-        if not env_type or env_type.strip() == '':
-            products_without_env_type += 1
-            print(f"DEBUG: Skipping product {product_id} - no env_type")
-            continue
-           
-        products_with_env_type += 1
-       
-        if env_type not in envelope_counts:
-            envelope_counts[env_type] = 0
-       
-        envelope_counts[env_type] += quantity
-        total_envelopes += quantity
-    
-    # print(f"DEBUG: Products with env_type: {products_with_env_type}")
-    # print(f"DEBUG: Products without env_type: {products_without_env_type}")
-    
-    # --- Misc Sales Mapping ---
-    MISC_ENVELOPE_MAP = {
-        "TOM-CH-pkts": ("Tomato", 7),
-        "PEA-SP-pkts": ("Pea", 3),
-        "BEA-MF-pkts": ("Bean", 4),
-    }
-    
-    misc_sales = MiscSales.objects.filter(year=year).select_related("product")
-    # print(f"DEBUG: Found {misc_sales.count()} misc sales records for {year}")
-    
-    for misc_sale in misc_sales:
-        sku = misc_sale.product.sku
-        quantity = misc_sale.quantity
-        # print(f"DEBUG: Processing misc sale - SKU: {sku}, Quantity: {quantity}")
-        
-        if sku in MISC_ENVELOPE_MAP:
-            env_type, multiplier = MISC_ENVELOPE_MAP[sku]
-            env_count = quantity * multiplier
-            # print(f"DEBUG: Mapping {sku} -> {env_type} (x{multiplier}) = {env_count} envelopes")
-            
-            if env_type not in envelope_counts:
-                envelope_counts[env_type] = 0
-            envelope_counts[env_type] += env_count
-            total_envelopes += env_count
-        else:
-            print(f"⚠️ Unmapped misc SKU: {sku}")
-   
-    # Sort envelope counts by quantity (descending)
-    envelope_counts = dict(sorted(envelope_counts.items(), key=lambda x: x[1], reverse=True))
-    
-    # print(f"DEBUG: Final envelope counts for {year}: {envelope_counts}")
-    # print(f"DEBUG: Total envelopes for {year}: {total_envelopes}")
-   
-    return {
-        'envelope_counts': envelope_counts,
-        'total': total_envelopes,
-        'year': year
-    }
+
+TOP_SELLER_CHANNELS = (ProductSalesYear.ONLINE, ProductSalesYear.WHOLESALE, 'all')
 
 
-def get_top_selling_products(limit=4):
+@versioned_cache('sales', 'products')
+def get_top_selling_products(limit=4, year=None, channel=ProductSalesYear.ONLINE):
     """
-    Get top selling products by total sales quantity for the most recent sales year
+    Get top selling products by quantity for a 2-digit year (default: current order year)
+    and channel ('online', 'wholesale' or 'all'), from the ProductSalesYear rollup
     """
-    # Get the current order year (two digit) and convert to full year
-    current_year = settings.CURRENT_ORDER_YEAR
-    full_year = 2000 + int(current_year)  # 25 -> 2025
-    
-    # DEBUG: Print what year we're looking for
-    # print(f"DEBUG: Looking for orders from year {full_year}")
-    # print(f"DEBUG: CURRENT_ORDER_YEAR setting = {current_year}")
-    
-    # DEBUG: Check if we have any orders from this year
-    total_orders = OnlineOrder.objects.filter(date__year=full_year).count()
-    # print(f"DEBUG: Found {total_orders} orders from {full_year}")
-    
-    # DEBUG: Check if we have any OOIncludes from this year
-    total_includes = OOIncludes.objects.filter(order__date__year=full_year).count()
-    # print(f"DEBUG: Found {total_includes} OOIncludes entries from {full_year}")
-    
-    # Query OOIncludes for orders from that year, aggregate by product
+    year = settings.CURRENT_ORDER_YEAR if year is None else int(year) % 100
+
+    rows = ProductSalesYear.objects.filter(year=year)
+    if channel != 'all':
+        rows = rows.filter(channel=channel)
+
     top_products = (
-        OOIncludes.objects
-        .filter(order__date__year=full_year)
+        rows
         .values('product__variety__var_name', 'product__sku_suffix')
         .annotate(
             display_name=Case(
@@ -895,33 +722,28 @@ def get_top_selling_products(limit=4):
                 )
             ),
             total_packets=Sum('qty'),
-            total_revenue=Sum(F('qty') * F('price'))
+            total_revenue=Sum('revenue')
         )
-        .order_by('-total_packets')
+        .order_by('-total_packets', 'display_name')
         [:limit]
     )
     
-    # DEBUG: Print the raw queryset
-    print(f"DEBUG: Query returned {len(list(top_products))} results")
-    
     # Convert to the format expected by frontend
     result = []
     for item in top_products:
-        # print(f"DEBUG: Processing item: {item}")
         result.append({
             'name': item['display_name'] or 'Unknown Product',
             'packets': int(item['total_packets'] or 0),
             'revenue': float(item['total_revenue'] or 0)
         })
     
-    # print(f"DEBUG: Final result: {result}")
     return result
 
-def get_detailed_top_sellers(limit=50):
+def get_detailed_top_sellers(limit=50, year=None, channel=ProductSalesYear.ONLINE):
     """
     Get detailed top sellers for modal - same logic, more items
     """
-    return get_top_selling_products(limit=limit)
+    return get_top_selling_products(limit=limit, year=year, channel=channel)
 
 # Add this API endpoint for the modal
 @login_required(login_url='/office/login/')
@@ -931,11 +753,22 @@ def top_sellers_details(request):
     """
     API endpoint for detailed top sellers data (for the modal)
     """
+    channel = request.GET.get('channel', ProductSalesYear.ONLINE)
+    if channel not in TOP_SELLER_CHANNELS:
+        return JsonResponse({'success': False, 'error': f'Invalid channel: {channel}'}, status=400)
+
     try:
-        top_sellers = get_detailed_top_sellers(limit=50)
+        year = int(request.GET.get('year', settings.CURRENT_ORDER_YEAR)) % 100
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid year'}, status=400)
+
+    try:
+        top_sellers = get_detailed_top_sellers(limit=50, year=year, channel=channel)
         
         return JsonResponse({
             'success': True,
+            'year': year,
+            'channel': channel,
             'top_sellers': top_sellers
         })
     except Exception as e:
@@ -945,6 +778,84 @@ def top_sellers_details(request):
         }, status=500)
 
 
+@versioned_cache('store_orders', 'products')
+def store_sales_summary(year_suffix):
+    """
+    Chart/table data for the store sales modal (fulfilled sales of a 2-digit year)
+    """
+    # Fulfilled sales this year, pre-aggregated per store/product/day
+    daily_rollup = StoreSalesDaily.objects.filter(year=int(year_suffix))
+    
+    # 1. Sales over time - group by fulfilled date
+    sales_over_time = []
+    daily_sales = daily_rollup.values('date').annotate(
+        total_sales=Sum('sales')
+    ).order_by('date')
+    
+    for day in daily_sales:
+        if day['total_sales'] and day['date']:
+            sales_over_time.append({
+                'date': day['date'].isoformat(),
+                'total_sales': float(day['total_sales'])
+            })
+    
+    # print(f"DEBUG: Sales over time entries: {len(sales_over_time)}")
+    
+    # 2. Sales by store
+    sales_by_store = []
+    store_sales = daily_rollup.values(
+        'store__store_name'
+    ).annotate(
+        total_sales=Sum('sales'),
+        total_packets=Sum('packets')
+    ).order_by('-total_sales')
+    
+    for store in store_sales:
+        if store['total_sales']:
+            sales_by_store.append({
+                'store_name': store['store__store_name'] or 'Unknown Store',
+                'total_sales': float(store['total_sales']),
+                'total_packets': store['total_packets'] or 0
+            })
+    
+    # print(f"DEBUG: Sales by store entries: {len(sales_by_store)}")
+    
+    # 3. Sales by product - Use var_name with crop in parentheses
+    sales_by_product = []
+    product_sales = daily_rollup.values(
+        'product__variety__var_name',
+        'product__variety__crop'
+    ).annotate(
+        total_sales=Sum('sales'),
+        total_packets=Sum('packets')
+    ).order_by('-total_sales')
+    
+    for product in product_sales:
+        if product['total_sales']:
+            var_name = product['product__variety__var_name'] or 'Unknown Variety'
+            crop = product['product__variety__crop']
+            
+            # Format: "Variety Name (Crop)" or just "Variety Name" if no crop
+            if crop:
+                product_name = f"{var_name} ({crop})"
+            else:
+                product_name = var_name
+            
+            sales_by_product.append({
+                'product_name': product_name,
+                'total_sales': float(product['total_sales']),
+                'total_packets': product['total_packets'] or 0
+            })
+    
+    # print(f"DEBUG: Sales by product entries: {len(sales_by_product)}")
+    
+    return {
+        'sales_over_time': sales_over_time,
+        'sales_by_store': sales_by_store,
+        'sales_by_product': sales_by_product
+    }
+
+
 @login_required(login_url='/office/login/')
 @user_passes_test(is_employee)
 def store_sales_details(request):
@@ -956,88 +867,8 @@ def store_sales_details(request):
         # Get current year suffix (e.g., "25" for 2025)
         current_year = getattr(settings, 'CURRENT_ORDER_YEAR', str(timezone.now().year)[-2:])
         year_suffix = str(current_year)[-2:]
-        
-        # print(f"DEBUG: Looking for orders ending with: -{year_suffix}")
-        
-        # Base queryset for fulfilled orders this year
-        base_orders = StoreOrder.objects.filter(
-            order_number__endswith=f'-{year_suffix}',
-            fulfilled_date__isnull=False
-        ).select_related('store').prefetch_related('items__product__variety')
-        
-        # print(f"DEBUG: Found {base_orders.count()} fulfilled orders")
-        
-        # 1. Sales over time - group by fulfilled date
-        sales_over_time = []
-        daily_sales = base_orders.values('fulfilled_date__date').annotate(
-            total_sales=Sum(F('items__price') * F('items__quantity'))
-        ).order_by('fulfilled_date__date')
-        
-        for day in daily_sales:
-            if day['total_sales'] and day['fulfilled_date__date']:
-                sales_over_time.append({
-                    'date': day['fulfilled_date__date'].isoformat(),
-                    'total_sales': float(day['total_sales'])
-                })
-        
-        # print(f"DEBUG: Sales over time entries: {len(sales_over_time)}")
-        
-        # 2. Sales by store
-        sales_by_store = []
-        store_sales = base_orders.values(
-            'store__store_name'
-        ).annotate(
-            total_sales=Sum(F('items__price') * F('items__quantity')),
-            total_packets=Sum('items__quantity')
-        ).order_by('-total_sales')
-        
-        for store in store_sales:
-            if store['total_sales']:
-                sales_by_store.append({
-                    'store_name': store['store__store_name'] or 'Unknown Store',
-                    'total_sales': float(store['total_sales']),
-                    'total_packets': store['total_packets'] or 0
-                })
-        
-        # print(f"DEBUG: Sales by store entries: {len(sales_by_store)}")
-        
-        # 3. Sales by product - Use var_name with crop in parentheses
-        sales_by_product = []
-        product_sales = base_orders.values(
-            'items__product__variety__var_name',
-            'items__product__variety__crop'
-        ).annotate(
-            total_sales=Sum(F('items__price') * F('items__quantity')),
-            total_packets=Sum('items__quantity')
-        ).order_by('-total_sales')
-        
-        for product in product_sales:
-            if product['total_sales']:
-                var_name = product['items__product__variety__var_name'] or 'Unknown Variety'
-                crop = product['items__product__variety__crop']
-                
-                # Format: "Variety Name (Crop)" or just "Variety Name" if no crop
-                if crop:
-                    product_name = f"{var_name} ({crop})"
-                else:
-                    product_name = var_name
-                
-                sales_by_product.append({
-                    'product_name': product_name,
-                    'total_sales': float(product['total_sales']),
-                    'total_packets': product['total_packets'] or 0
-                })
-        
-        # print(f"DEBUG: Sales by product entries: {len(sales_by_product)}")
-        
-        response_data = {
-            'sales_over_time': sales_over_time,
-            'sales_by_store': sales_by_store,
-            'sales_by_product': sales_by_product
-        }
-        
-        # print(f"DEBUG: Returning response with {len(response_data)} keys")
-        return JsonResponse(response_data)
+
+        return JsonResponse(store_sales_summary(year_suffix))
         
     except Exception as e:
         print(f"ERROR in store_sales_details: {str(e)}")
@@ -1046,6 +877,40 @@ def store_sales_details(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@login_required(login_url='/office/login/')
+@user_passes_test(is_employee)
+@require_http_methods(["GET"])
+def sales_series_data(request):
+    """
+    Binned packets/revenue arrays for the analytics charts.
+    ?start=YYYY-MM-DD&end=YYYY-MM-DD (default: Jan 1 this year to today), bin=day|week|month,
+    channel=online|wholesale|all, group=category|crop (optional), compare=N previous years
+    """
+    today = timezone.localdate()
+    try:
+        start = date.fromisoformat(request.GET.get('start') or date(today.year, 1, 1).isoformat())
+        end = date.fromisoformat(request.GET.get('end') or today.isoformat())
+        compare = int(request.GET.get('compare', 0))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid start, end or compare'}, status=400)
+
+    channel = request.GET.get('channel', 'all')
+    channels = SERIES_CHANNELS if channel == 'all' else (channel,)
+
+    try:
+        series = sales_series(
+            start, end,
+            unit=request.GET.get('bin', 'week'),
+            channels=channels,
+            group=request.GET.get('group') or None,
+            compare=compare
+        )
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    return JsonResponse({'success': True, 'start': start.isoformat(), 'end': end.isoformat(), **series})
+
+
 
 
 @login_required(login_url='/office/login/')
@@ -2069,6 +1934,132 @@ def get_variety_lot_inventory(variety, current_order_year):
     }
 
 
+@versioned_cache('sales', 'products', 'lots')
+def variety_sales_summary(sku_prefix):
+    """
+    Sales for the variety's most recent year, last season's usage and lot inventory.
+    None if the variety doesn't exist.
+    """
+    # Get the variety
+    variety = Variety.objects.filter(sku_prefix=sku_prefix).first()
+    if variety is None:
+        return None
+    
+    # Find the most recent year with sales data for this variety
+    most_recent_year = Sales.objects.filter(
+        product__variety=variety
+    ).aggregate(max_year=Max('year'))['max_year']
+    
+    if not most_recent_year:
+        # print(f"No sales data found for variety {sku_prefix}")
+        return {'sales_data': [], 'year': None}
+    
+    # print(f"Most recent sales year for {sku_prefix}: {most_recent_year}")
+    
+    # Convert 2-digit year to 4-digit for display (25 -> 2025)
+    display_year = f"20{most_recent_year:02d}" if most_recent_year < 100 else str(most_recent_year)
+    
+    # Get sales data for the most recent year, grouped by product AND wholesale status
+    sales_data = Sales.objects.filter(
+        product__variety=variety,
+        year=most_recent_year
+    ).values(
+        'product__sku_suffix',
+        'product__variety__sku_prefix',
+        'wholesale'
+    ).annotate(
+        total_quantity=Sum('quantity')
+    ).order_by('product__sku_suffix', 'wholesale')  # Order by product, then wholesale status
+    
+    # Group and format the data for frontend
+    product_groups = {}
+    for sale in sales_data:
+        base_sku = sale['product__sku_suffix'] or sale['product__variety__sku_prefix']
+        sku_suffix = sale['product__sku_suffix']
+        
+        if base_sku not in product_groups:
+            product_groups[base_sku] = {
+                'online': 0,
+                'wholesale': 0,
+                'sku_suffix': sku_suffix
+            }
+        
+        if sale['wholesale']:
+            product_groups[base_sku]['wholesale'] = sale['total_quantity']
+        else:
+            product_groups[base_sku]['online'] = sale['total_quantity']
+    
+    formatted_sales = []
+    
+    for base_sku, data in product_groups.items():
+        online_qty = data['online']
+        wholesale_qty = data['wholesale']
+        sku_suffix = data['sku_suffix']
+        
+        # Determine if this is a packet product (sku_suffix contains "PKT")
+        is_packet = sku_suffix and 'PKT' in sku_suffix.upper()
+        
+        # Only PKT products with sku_suffix need online/wholesale distinction
+        if is_packet and sku_suffix:
+            # Products with PKT sku_suffix need online/wholesale distinction
+            if online_qty > 0:
+                formatted_sales.append({
+                    'display_name': f"{base_sku} - online",
+                    'quantity': online_qty,
+                    'is_packet': True,
+                    'is_total': False
+                })
+            
+            if wholesale_qty > 0:
+                formatted_sales.append({
+                    'display_name': f"{base_sku} - wholesale",
+                    'quantity': wholesale_qty,
+                    'is_packet': True,
+                    'is_total': False
+                })
+            
+            # Add total row if both online and wholesale exist
+            if online_qty > 0 and wholesale_qty > 0:
+                formatted_sales.append({
+                    'display_name': f"{base_sku} - total",
+                    'quantity': online_qty + wholesale_qty,
+                    'is_packet': True,
+                    'is_total': True
+                })
+        else:
+            # All other products: no online/wholesale distinction
+            total_qty = online_qty + wholesale_qty
+            formatted_sales.append({
+                'display_name': base_sku,
+                'quantity': total_qty,
+                'is_packet': bool(sku_suffix and 'PKT' in sku_suffix.upper()),
+                'is_total': False
+            })
+    
+    # Sort: packets first, then bulk, then by quantity descending within each group
+    formatted_sales.sort(key=lambda x: (not x['is_packet'], -x['quantity']))
+    
+    # Calculate usage for previous sales year
+    # During transition, look back 2 years; otherwise look back 1 year
+    previous_sales_year = settings.CURRENT_ORDER_YEAR - (2 if settings.TRANSITION else 1)
+    usage_data = calculate_variety_usage(variety, previous_sales_year)
+  
+    lot_inventory_data = get_variety_lot_inventory(variety, settings.CURRENT_ORDER_YEAR)
+
+    return {
+        'sales_data': formatted_sales,
+        'year': most_recent_year,
+        'display_year': display_year,  # Add 4-digit year for display
+        'variety_name': variety.var_name,
+        'sku_prefix': variety.sku_prefix,
+        'wholesale': variety.wholesale, 
+        'wholesale_rack_designation': variety.wholesale_rack_designation,
+        'usage_data': usage_data,
+        'lot_inventory_data': lot_inventory_data,
+        'growout_needed': variety.growout_needed or '',
+    }
+
+
 @login_required(login_url='/office/login/')
 @user_passes_test(is_employee)
 @require_http_methods(["GET"])
@@ -2076,127 +2067,11 @@ def variety_sales_data(request, sku_prefix):
     """Get sales data for a specific variety from the most recent year"""
     
     try:
-        # print(f"Getting sales data for variety: {sku_prefix}")
-        
-        # Get the variety
-        try:
-            variety = Variety.objects.get(sku_prefix=sku_prefix)
-        except Variety.DoesNotExist:
+        data = variety_sales_summary(sku_prefix)
+        if data is None:
             return JsonResponse({'error': 'Variety not found'}, status=404)
-        
-        # Find the most recent year with sales data for this variety
-        most_recent_year = Sales.objects.filter(
-            product__variety=variety
-        ).aggregate(max_year=Max('year'))['max_year']
-        
-        if not most_recent_year:
-            # print(f"No sales data found for variety {sku_prefix}")
-            return JsonResponse({'sales_data': [], 'year': None})
-        
-        # print(f"Most recent sales year for {sku_prefix}: {most_recent_year}")
-        
-        # Convert 2-digit year to 4-digit for display (25 -> 2025)
-        display_year = f"20{most_recent_year:02d}" if most_recent_year < 100 else str(most_recent_year)
-        
-        # Get sales data for the most recent year, grouped by product AND wholesale status
-        sales_data = Sales.objects.filter(
-            product__variety=variety,
-            year=most_recent_year
-        ).values(
-            'product__sku_suffix',
-            'product__variety__sku_prefix',
-            'wholesale'
-        ).annotate(
-            total_quantity=Sum('quantity')
-        ).order_by('product__sku_suffix', 'wholesale')  # Order by product, then wholesale status
-        
-        # Group and format the data for frontend
-        product_groups = {}
-        for sale in sales_data:
-            base_sku = sale['product__sku_suffix'] or sale['product__variety__sku_prefix']
-            sku_suffix = sale['product__sku_suffix']
-            
-            if base_sku not in product_groups:
-                product_groups[base_sku] = {
-                    'online': 0,
-                    'wholesale': 0,
-                    'sku_suffix': sku_suffix
-                }
-            
-            if sale['wholesale']:
-                product_groups[base_sku]['wholesale'] = sale['total_quantity']
-            else:
-                product_groups[base_sku]['online'] = sale['total_quantity']
-        
-        formatted_sales = []
-        
-        for base_sku, data in product_groups.items():
-            online_qty = data['online']
-            wholesale_qty = data['wholesale']
-            sku_suffix = data['sku_suffix']
-            
-            # Determine if this is a packet product (sku_suffix contains "PKT")
-            is_packet = sku_suffix and 'PKT' in sku_suffix.upper()
-            
-            # Only PKT products with sku_suffix need online/wholesale distinction
-            if is_packet and sku_suffix:
-                # Products with PKT sku_suffix need online/wholesale distinction
-                if online_qty > 0:
-                    formatted_sales.append({
-                        'display_name': f"{base_sku} - online",
-                        'quantity': online_qty,
-                        'is_packet': True,
-                        'is_total': False
-                    })
-                
-                if wholesale_qty > 0:
-                    formatted_sales.append({
-                        'display_name': f"{base_sku} - wholesale",
-                        'quantity': wholesale_qty,
-                        'is_packet': True,
-                        'is_total': False
-                    })
-                
-                # Add total row if both online and wholesale exist
-                if online_qty > 0 and wholesale_qty > 0:
-                    formatted_sales.append({
-                        'display_name': f"{base_sku} - total",
-                        'quantity': online_qty + wholesale_qty,
-                        'is_packet': True,
-                        'is_total': True
-                    })
-            else:
-                # All other products: no online/wholesale distinction
-                total_qty = online_qty + wholesale_qty
-                formatted_sales.append({
-                    'display_name': base_sku,
-                    'quantity': total_qty,
-                    'is_packet': bool(sku_suffix and 'PKT' in sku_suffix.upper()),
-                    'is_total': False
-                })
-        
-        # Sort: packets first, then bulk, then by quantity descending within each group
-        formatted_sales.sort(key=lambda x: (not x['is_packet'], -x['quantity']))
-        
-        # Calculate usage for previous sales year
-        # During transition, look back 2 years; otherwise look back 1 year
-        previous_sales_year = settings.CURRENT_ORDER_YEAR - (2 if settings.TRANSITION else 1)
-        usage_data = calculate_variety_usage(variety, previous_sales_year)
-      
-        lot_inventory_data = get_variety_lot_inventory(variety, settings.CURRENT_ORDER_YEAR)
 
-        return JsonResponse({
-            'sales_data': formatted_sales,
-            'year': most_recent_year,
-            'display_year': display_year,  # Add 4-digit year for display
-            'variety_name': variety.var_name,
-            'sku_prefix': variety.sku_prefix,
-            'wholesale': variety.wholesale, 
-            'wholesale_rack_designation': variety.wholesale_rack_designation,
-            'usage_data': usage_data,
-            'lot_inventory_data': lot_inventory_data,
-            'growout_needed': variety.growout_needed or '',
-        })
+        return JsonResponse(data)
         
     except Exception as e:
         # print(f"Error getting sales data for {sku_prefix}: {str(e)}")
@@ -2205,6 +2080,34 @@ def variety_sales_data(request, sku_prefix):
         return JsonResponse({'error': str(e)}, status=500)
     
 
+@login_required(login_url='/office/login/')
+@user_passes_test(is_employee)
+@require_http_methods(["GET"])
+def sales_matrix_data(request):
+    """
+    Year x SKU x channel sales quantities for one variety, crop or group.
+    ?variety=SKU_PREFIX | crop=NAME | group=NAME, years=N (default 5)
+    """
+    selectors = [(selector, request.GET[selector]) for selector in MATRIX_SELECTORS if request.GET.get(selector)]
+    if len(selectors) != 1:
+        return JsonResponse({'success': False, 'error': 'Pass exactly one of variety, crop or group'}, status=400)
+    selector, value = selectors[0]
+
+    try:
+        years = int(request.GET.get('years', 5))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid years'}, status=400)
+
+    try:
+        matrix = sales_matrix(selector, value, years=years)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    if matrix is None:
+        return JsonResponse({'success': False, 'error': f'No varieties for {selector} {value}'}, status=404)
+
+    return JsonResponse({'success': True, 'selector': selector, 'value': value, **matrix})
+
 
 
 
@@ -2409,26 +2312,9 @@ def save_order_changes(request):
         # Get the order
         order = StoreOrder.objects.get(id=order_id)
         
-        # Clear existing SOIncludes for this order
-        SOIncludes.objects.filter(store_order=order).delete()
-        pkt_price = settings.PACKET_PRICE
-        # Add new items
-        for item_data in items:
-            # Find the product based on variety with sku_suffix="pkt"
-            variety = Variety.objects.get(sku_prefix=item_data['sku_prefix'])
-            product = Product.objects.filter(variety=variety, sku_suffix="pkt").first()
-            
-            if product:
-                SOIncludes.objects.create(
-                    store_order=order,
-                    product=product,
-                    quantity=item_data['quantity'],
-                    price=pkt_price,  # You'll need to set appropriate price logic
-                    photo=item_data.get('has_photo', False)
-                )
-            else:
-                # Log or handle case where no "pkt" product exists for this variety
-                print(f"Warning: No 'pkt' product found for variety {variety.sku_prefix}")
+        # Varieties without a pkt product are skipped (with a warning)
+        products = resolve_order_products(items, skip_missing_pkt=True)
+        sync_order_lines(order, items, products, settings.PACKET_PRICE)
         
         return JsonResponse({'success': True, 'message': f'Order updated with {len(items)} items'})
         
@@ -2489,21 +2375,12 @@ def set_photos_auto(request):
             message = "First order - all photos enabled"
         else:
             # Not first order - check history
-            # Get all previous orders for this store in the same year
-            previous_orders = StoreOrder.objects.filter(
-                store__store_num=store_num,
-                order_number__endswith=f'-{order_year}',
-                order_number__lt=order_number  # Only orders before this one
-            )
-            
-            print(f"Found {previous_orders.count()} previous orders:")
-            for po in previous_orders:
-                print(f"  - {po.order_number}")
-            
-            # Get all product IDs that were ordered before
-            previously_ordered_products = SOIncludes.objects.filter(
-                store_order__in=previous_orders
-            ).values_list('product_id', flat=True).distinct()
+            # Products this store first ordered this year on an earlier order
+            previously_ordered_products = StoreProductHistory.objects.filter(
+                store_id=store_num,
+                year=int(order_year),
+                first_order_number__lt=order_number  # Only orders before this one
+            ).values_list('product_id', flat=True)
             
             previously_ordered_set = set(previously_ordered_products)
             print(f"Previously ordered product IDs ({len(previously_ordered_set)} total)")
@@ -2622,56 +2499,21 @@ def finalize_order(request):
         # print(f"Final credit value: {credit}")
         # print(f"=== CREDIT DEBUG END ===\n")
        
-        # Set fulfilled_date to current timezone-aware datetime
-        from django.utils import timezone
-        order.fulfilled_date = timezone.now()
-        order.shipping = shipping
-        order.save()
-        
-        pkt_price = settings.PACKET_PRICE  
-        
-        # Validate all products exist first (safer approach)
-        new_so_includes = []
-        for item in items:
-            try:
-                # Get Variety by sku_prefix
-                variety = Variety.objects.get(sku_prefix=item['sku_prefix'])
-               
-                # Find the associated Product with sku_suffix == "pkt"
-                product = Product.objects.get(
-                    variety=variety,
-                    sku_suffix="pkt"
-                )
-               
-                new_so_includes.append({
-                    'product': product,
-                    'variety': variety,  # Keep variety reference for response
-                    'quantity': item['quantity'],
-                    'photo': item.get('has_photo', False),
-                    'price': pkt_price
-                })
-               
-            except Variety.DoesNotExist:
-                return JsonResponse({'error': f'Variety with sku_prefix {item["sku_prefix"]} not found'}, status=400)
-            except Product.DoesNotExist:
-                return JsonResponse({'error': f'Packet product not found for variety {item["sku_prefix"]}'}, status=400)
-       
-        # Only delete existing ones after validating all new ones can be created
-        SOIncludes.objects.filter(store_order=order).delete()
+        # Resolve every submitted line before touching the order
+        try:
+            products = resolve_order_products(items)
+        except (Variety.DoesNotExist, Product.DoesNotExist) as e:
+            return JsonResponse({'error': str(e)}, status=400)
        
-        # Create new SOIncludes
-        for include_data in new_so_includes:
-            SOIncludes.objects.create(
-                store_order=order,
-                product=include_data['product'],
-                quantity=include_data['quantity'],
-                price=pkt_price,
-                photo=include_data['photo']
-            )
+        # Fulfill the order and sync its lines in one transaction
+        with transaction.atomic():
+            order.fulfilled_date = timezone.now()
+            order.shipping = shipping
+            order.save()
+            so_includes = sync_order_lines(order, items, products, settings.PACKET_PRICE)
        
         # Get store and return response
         store = order.store
-        so_includes = SOIncludes.objects.filter(store_order=order).select_related('product', 'product__variety')
         
         # print(f"\n=== RESPONSE DEBUG ===")
         # print(f"Credit being returned in response: {credit}")
@@ -2728,78 +2570,70 @@ def combine_store_orders(request):
     """
     Combine multiple pending store orders from the same store.
     Transfers all items to the order with the lowest order number.
+    Accepts one group ({"order_numbers": [...]}) or several ({"groups": [[...], [...]]}),
+    e.g. to consolidate every store's duplicate orders at season end in one request.
     """
     try:
         data = json.loads(request.body)
-        order_numbers = data.get('order_numbers', [])
+        groups = data.get('groups') or [data.get('order_numbers', [])]
         
-        if len(order_numbers) < 2:
+        if any(len(group) < 2 for group in groups):
             return JsonResponse({
                 'success': False,
                 'error': 'Please select at least 2 orders to combine'
             }, status=400)
         
-        # Fetch all orders
-        orders = StoreOrder.objects.filter(
-            order_number__in=order_numbers,
-            fulfilled_date__isnull=True  # Only pending orders
-        ).select_related('store')
-        
-        if orders.count() != len(order_numbers):
+        all_order_numbers = [order_number for group in groups for order_number in group]
+        if len(set(all_order_numbers)) != len(all_order_numbers):
             return JsonResponse({
                 'success': False,
-                'error': 'One or more orders not found or already fulfilled'
+                'error': 'An order can only be combined once per request'
             }, status=400)
         
-        # Verify all orders belong to the same store
-        store_nums = set(order.store.store_num for order in orders)
-        if len(store_nums) > 1:
+        # Fetch all orders
+        orders = {
+            order.order_number: order
+            for order in StoreOrder.objects.filter(
+                order_number__in=all_order_numbers,
+                fulfilled_date__isnull=True  # Only pending orders
+            ).select_related('store')
+        }
+        
+        if len(orders) != len(all_order_numbers):
             return JsonResponse({
                 'success': False,
-                'error': 'Selected orders do not belong to the same store'
+                'error': 'One or more orders not found or already fulfilled'
             }, status=400)
         
-        # Sort orders by order number to find the one to keep (lowest number)
-        sorted_orders = sorted(orders, key=lambda x: x.order_number)
-        target_order = sorted_orders[0]
-        orders_to_delete = sorted_orders[1:]
+        # Verify all orders in a group belong to the same store
+        order_groups = [[orders[order_number] for order_number in group] for group in groups]
+        for group in order_groups:
+            if len({order.store_id for order in group}) > 1:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Selected orders do not belong to the same store'
+                }, status=400)
         
-        # Use transaction to ensure atomicity
+        # Merge every group in one transaction
         with transaction.atomic():
-            # Transfer all items from orders being deleted to target order
-            for order in orders_to_delete:
-                items = SOIncludes.objects.filter(store_order=order)
-                
-                for item in items:
-                    # Check if target order already has this product
-                    existing_item = SOIncludes.objects.filter(
-                        store_order=target_order,
-                        product=item.product
-                    ).first()
-                    
-                    if existing_item:
-                        # Keep the LARGER quantity instead of adding them
-                        if item.quantity > existing_item.quantity:
-                            existing_item.quantity = item.quantity
-                        # Keep photo=True if either order had it
-                        existing_item.photo = existing_item.photo or item.photo
-                        existing_item.save()
-                        item.delete()
-                    else:
-                        # Move item to target order
-                        item.store_order = target_order
-                        item.save()
-            
-            # Delete the empty orders
-            order_numbers_deleted = [order.order_number for order in orders_to_delete]
-            for order in orders_to_delete:
-                order.delete()
+            combined = merge_order_groups(order_groups)
+        
+        results = [
+            {'target_order': target_order.order_number, 'deleted_orders': deleted_orders}
+            for target_order, deleted_orders in combined
+        ]
+        
+        if len(results) == 1:
+            return JsonResponse({
+                'success': True,
+                **results[0],
+                'message': f'Successfully combined {len(all_order_numbers)} orders into {results[0]["target_order"]}'
+            })
         
         return JsonResponse({
             'success': True,
-            'target_order': target_order.order_number,
-            'deleted_orders': order_numbers_deleted,
-            'message': f'Successfully combined {len(order_numbers)} orders into {target_order.order_number}'
+            'combined': results,
+            'message': f'Successfully combined {len(all_order_numbers)} orders into {len(results)} orders'
         })
         
     except json.JSONDecodeError:
@@ -3501,7 +3335,7 @@ def record_store_returns(request):
             return_year=year,
             defaults={'packets_returned': packets_returned}
         )
-        
+
         action = "created" if created else "updated"
         
         return JsonResponse({
@@ -3532,18 +3366,11 @@ def get_store_returns_years(request):
     Get list of all years from store orders, always including 25 as minimum
     """
     try:
-        # Extract unique years from order numbers (e.g., "W1001-25" -> 25)
-        order_numbers = StoreOrder.objects.values_list('order_number', flat=True)
-        years = set()
-        
-        for order_num in order_numbers:
-            try:
-                # Split by '-' and get last part (year)
-                year_str = order_num.split('-')[-1]
-                year = int(year_str)
-                years.add(year)
-            except (ValueError, IndexError):
-                continue
+        # Unique order years (e.g., "W1001-25" -> 25)
+        years = set(
+            StoreOrder.objects.filter(order_year__isnull=False)
+            .order_by().values_list('order_year', flat=True).distinct()
+        )
         
         # Always include 25 as minimum
         years.add(25)
@@ -3591,52 +3418,7 @@ def get_store_returns_data(request):
                 'message': 'Invalid year format'
             }, status=400)
         
-        # Get all stores
-        stores = Store.objects.all().order_by('store_num')
-        
-        # Get wholesale price for this year
-        try:
-            price = WholesalePktPrice.objects.get(year=year).price_per_packet
-        except WholesalePktPrice.DoesNotExist:
-            price = None
-        
-        # Build data for each store
-        stores_data = []
-        for store in stores:
-            # Calculate total packets sold for this store in this year
-            # Get all orders for this store ending with this year
-            year_suffix = str(year).zfill(2)  # Ensure 2 digits (e.g., 25)
-            
-            total_packets_sold = SOIncludes.objects.filter(
-                store_order__store=store,
-                store_order__order_number__endswith=f'-{year_suffix}',
-                store_order__fulfilled_date__isnull=False  # Only count fulfilled orders
-            ).aggregate(total=Sum('quantity'))['total'] or 0
-            
-            # Calculate 5% of total packets sold, rounded up
-            if total_packets_sold > 0:
-                packets_allowed = math.ceil(total_packets_sold * 0.05)
-            else:
-                packets_allowed = None  # Will display as "--"
-            
-            # Get returns for this store/year
-            try:
-                returns = StoreReturns.objects.get(store=store, return_year=year)
-                packets_returned = returns.packets_returned
-            except StoreReturns.DoesNotExist:
-                packets_returned = 0
-            
-            # Calculate credit
-            credit = float(packets_returned * price) if (price and packets_returned > 0) else 0
-            
-            stores_data.append({
-                'store_num': store.store_num,
-                'store_name': store.store_name,
-                'total_packets_sold': total_packets_sold,
-                'packets_allowed': packets_allowed if packets_allowed is not None else '--',
-                'packets_returned': packets_returned,
-                'credit': credit
-            })
+        price, stores_data = get_store_returns_report(year)
         
         return JsonResponse({
             'success': True,
@@ -3679,50 +3461,7 @@ def get_store_sales_data(request):
                 'message': 'Invalid year format'
             }, status=400)
         
-        # Get all stores
-        stores = Store.objects.all().order_by('store_num')
-        
-        # Build sales data for each store
-        stores_data = []
-        year_suffix = str(year).zfill(2)  # Ensure 2 digits
-        
-        for store in stores:
-            # Get all fulfilled orders for this store in this year
-            orders = StoreOrder.objects.filter(
-                store=store,
-                order_number__endswith=f'-{year_suffix}',
-                fulfilled_date__isnull=False
-            )
-            
-            # Calculate total packets
-            total_packets = SOIncludes.objects.filter(
-                store_order__in=orders
-            ).aggregate(total=Sum('quantity'))['total'] or 0
-            
-            # Calculate subtotal (sum of all line items)
-            from django.db.models import F
-            subtotal = SOIncludes.objects.filter(
-                store_order__in=orders
-            ).aggregate(
-                total=Sum(F('quantity') * F('price'))
-            )['total'] or 0
-            
-            # Calculate total shipping
-            total_shipping = orders.aggregate(
-                total=Sum('shipping')
-            )['total'] or 0
-            
-            # Calculate grand total
-            total = float(subtotal) + float(total_shipping)
-            
-            stores_data.append({
-                'store_num': store.store_num,
-                'store_name': store.store_name,
-                'total_packets': total_packets,
-                'subtotal': float(subtotal),
-                'total_shipping': float(total_shipping),
-                'total': total
-            })
+        stores_data = get_store_sales_report(year)
         
         return JsonResponse({
             'success': True,
@@ -4256,104 +3995,10 @@ def process_pre_opening_report_v2(request):
         if not csv_file.name.endswith('.csv'):
             return JsonResponse({'error': 'File must be a CSV'}, status=400)
         
-        # Read entire CSV into memory
-        decoded_file = csv_file.read().decode('utf-8')
-        csv_reader = csv.DictReader(io.StringIO(decoded_file))
-        
-        # Store CSV data with title forward-filling
-        csv_products = {}
-        last_title = ""
-        
-        for row in csv_reader:
-            sku = row.get('Variant SKU', '').strip()
-            title = row.get('Title', '').strip()
-            
-            # Forward-fill title if blank (same variety, different variant)
-            if title:
-                last_title = title
-            elif last_title:
-                title = last_title
-            
-            if sku:
-                csv_products[sku] = {
-                    'title': title,
-                    'tracker': row.get('Variant Inventory Tracker', '').strip(),
-                    'qty': int(row.get('Variant Inventory Qty', '0').strip() or 0)
-                }
-        
-        # Check 1: Products in CSV not in database
-        products_not_in_db = []
-        for sku, data in csv_products.items():
-            if not check_product_exists(sku):
-                products_not_in_db.append({
-                    'sku': sku,
-                    'title': data['title'],
-                    'tracker': data['tracker'],
-                    'qty': data['qty']
-                })
-    
-        # Check 2: Products without active germinations (tracked or untracked)
-        products_without_germ = []
-        for sku, data in csv_products.items():
-            # Skip if qty is 0
-            if data['qty'] == 0:
-                continue
-            
-            # Check if product exists in database
-            if not check_product_exists(sku):
-                continue
-            
-            # Check if it has active germination
-            if not check_active_germination(sku, current_order_year):
-                # Determine if tracked or untracked
-                tracker_value = data['tracker'].strip()
-                is_tracked = tracker_value.lower() == 'shopify'
-                is_untracked = tracker_value == '' or tracker_value.lower() == 'none'
-                
-                # Include if either tracked or untracked
-                if is_tracked or is_untracked:
-                    products_without_germ.append({
-                        'sku': sku,
-                        'title': data['title'],
-                        'qty': 'untracked' if is_untracked else data['qty']
-                    })
-        
-        # Check 3: Varieties with active germ but pkt product inventory <=0
-        varieties_with_germ_but_no_inventory = []
-        
-        varieties_with_active_germ = Variety.objects.filter(
-            lots__germinations__status='active',
-            lots__germinations__for_year=current_order_year
-        ).distinct()
-        
-        for variety in varieties_with_active_germ:
-            pkt_sku = f"{variety.sku_prefix}-pkt"
-            
-            if pkt_sku in csv_products:
-                csv_data = csv_products[pkt_sku]
-                
-                # Check if tracked and inventory <=0
-                if csv_data['tracker'].lower() == 'shopify' and csv_data['qty'] <= 0:
-                    varieties_with_germ_but_no_inventory.append({
-                        'variety': variety.sku_prefix,
-                        'var_name': variety.var_name or '',
-                        'sku': pkt_sku,
-                        'qty': csv_data['qty'],
-                        'title': csv_data['title']
-                    })
-        
-        report_data = {
-            'current_order_year': current_order_year,
-            'products_not_in_db': products_not_in_db,
-            'products_without_germ': products_without_germ,
-            'varieties_with_germ_but_no_inventory': varieties_with_germ_but_no_inventory,
-            'summary': {
-                'total_not_in_db': len(products_not_in_db),
-                'total_without_germ': len(products_without_germ),
-                'total_germ_but_no_inv': len(varieties_with_germ_but_no_inventory),
-                'total_csv_products': len(csv_products)
-            }
-        }
+        csv_products = read_shopify_export(stream_uploaded_csv(csv_file))
+        try_save_inventory_snapshot(frame_from_csv_products(csv_products), 'pre_opening', csv_file.name, request.user)
+
+        report_data = build_pre_opening_report(csv_products, current_order_year)
         
         return JsonResponse({
             'success': True,
@@ -4368,53 +4013,6 @@ def process_pre_opening_report_v2(request):
         }, status=500)
 
 
-def check_product_exists(variant_sku):
-    """
-    Check if a product exists in either Product or MiscProduct table
-    """
-    # Check MiscProduct first (simpler - just match SKU)
-    if MiscProduct.objects.filter(sku=variant_sku).exists():
-        return True
-    
-    # Check Product table (need to parse SKU)
-    # SKU format: PREFIX-SUFFIX (e.g., "PEA-SP-pkt")
-    parts = variant_sku.rsplit('-', 1)  # Split from right, only once
-    
-    if len(parts) == 2:
-        sku_prefix = parts[0]
-        sku_suffix = parts[1]
-        
-        if Product.objects.filter(
-            variety__sku_prefix=sku_prefix,
-            sku_suffix=sku_suffix
-        ).exists():
-            return True
-    
-    return False
-
-
-def check_active_germination(variant_sku, current_order_year):
-    """
-    Check if a product has an active germination for the current order year
-    """
-    # Parse SKU to get variety prefix
-    parts = variant_sku.rsplit('-', 1)
-    
-    if len(parts) != 2:
-        return False
-    
-    sku_prefix = parts[0]
-    
-    # Check if variety has any lots with active germinations for current year
-    has_active_germ = Germination.objects.filter(
-        lot__variety__sku_prefix=sku_prefix,
-        status='active',
-        for_year=current_order_year
-    ).exists()
-    
-    return has_active_germ
-
-
 @login_required(login_url='/office/login/')
 @user_passes_test(is_employee)
 @require_http_methods(["POST"])
@@ -4523,88 +4121,101 @@ def check_shopify_inventory(request, sku_prefix):
 @user_passes_test(is_employee)
 def shipping_view(request):
     """
-    Display all fulfilled orders with calculated totals and credit information.
-    Orders are sorted by fulfilled_date descending (newest first).
+    Display fulfilled orders for one year (?year=2026, default most recent) with calculated
+    totals and credit information, newest first and paginated (?page=).
+    The whole ledger page comes from a single annotated query.
     """
-    # Get all fulfilled orders (orders with a fulfilled_date)
-    orders = StoreOrder.objects.filter(
-        fulfilled_date__isnull=False
-    ).select_related('store').prefetch_related('items__product').order_by('-fulfilled_date')
-    
-    # Extract available years from order numbers (last 2 digits)
-    year_suffixes = set()
-    for order in orders:
-        if order.order_number and '-' in order.order_number:
-            parts = order.order_number.split('-')
-            if len(parts) == 2:
-                year_suffix = parts[1]  # Get the ZZ part
-                year_suffixes.add(year_suffix)
-    
-    # Convert 2-digit years to 4-digit years and sort
-    available_years = sorted([f"20{year}" for year in year_suffixes], reverse=True)
-    
-    # Prepare order data with calculations
+    # Available years (order_year 26 -> "2026")
+    year_suffixes = (
+        StoreOrder.objects.fulfilled().filter(order_year__isnull=False)
+        .order_by().values_list('order_year', flat=True).distinct()
+    )
+    available_years = sorted({f"20{suffix:02d}" for suffix in year_suffixes}, reverse=True)
+
+    selected_year = request.GET.get('year')
+    if selected_year not in available_years:
+        selected_year = available_years[0] if available_years else None
+
     orders_data = []
-    for order in orders:
-        # Calculate total packets from SOIncludes
-        total_packets = order.items.aggregate(
-            total=Sum('quantity')
-        )['total'] or 0
-        
-        # Calculate subtotal (price × quantity for all items)
-        subtotal = order.items.aggregate(
-            total=Sum(F('price') * F('quantity'))
-        )['total'] or Decimal('0')
-        
-        # Determine if this is the first order of the year and calculate credit
-        # Determine if this is the first order of the year and calculate credit
-        credit = Decimal('0')
-        order_parts = order.order_number.split('-')
-        if len(order_parts) == 2:
-            order_num_part = order_parts[0]  # WXXYY
-            year_suffix = order_parts[1]      # ZZ
-            
-            # Extract the sequential order number (YY is the last 2 digits of WXXYY)
-            if len(order_num_part) >= 2:
-                sequential_num = order_num_part[-2:]  # Get last 2 digits
-                
-                # If this is order 01, calculate credit from previous year's returns
-                if sequential_num == '01':
-                    invoice_year = int(year_suffix)  # Convert ZZ to full year
-                    packets_returned, credit_amount = StoreReturns.get_credit_for_first_invoice(
-                        order.store.store_num,
-                        invoice_year
-                    )
-                    credit = credit_amount
-        
-        # Calculate grand total
-        grand_total = subtotal + order.shipping - credit
-        
-        # Add year suffix for filtering
-        year_suffix_for_filter = order_parts[1] if len(order_parts) == 2 else ''
-        
-        orders_data.append({
-            'id': order.id,
-            'fulfilled_date': order.fulfilled_date,
-            'order_number': order.order_number,
-            'store': order.store,
-            'total_packets': total_packets,
-            'subtotal': subtotal,
-            'shipping': order.shipping,
-            'credit': credit,
-            'grand_total': grand_total,
-            'quickbooks_invoice': order.quickbooks_invoice,
-            'year_suffix': year_suffix_for_filter
-        })
-    
+    page_obj = None
+    if selected_year:
+        year_suffix = selected_year[-2:]
+        orders = shipping_ledger_queryset(int(year_suffix))
+
+        page_obj = Paginator(orders, SHIPPING_PAGE_SIZE).get_page(request.GET.get('page'))
+
+        for order in page_obj:
+            orders_data.append({
+                'id': order.id,
+                'fulfilled_date': order.fulfilled_date,
+                'order_number': order.order_number,
+                'store': order.store,
+                'total_packets': order.total_packets,
+                'subtotal': order.subtotal,
+                'shipping': order.shipping,
+                'credit': order.credit,
+                'grand_total': order.subtotal + order.shipping - order.credit,
+                'quickbooks_invoice': order.quickbooks_invoice,
+                'year_suffix': year_suffix
+            })
+
     context = {
         'orders': orders_data,
         'available_years': available_years,
+        'selected_year': selected_year,
+        'page_obj': page_obj,
     }
     
     return render(request, 'office/shipping.html', context)
 
 
+SHIPPING_PAGE_SIZE = 100
+
+
+def shipping_ledger_queryset(year_suffix):
+    """
+    Fulfilled orders for a 2-digit order year, annotated with:
+    - total_packets / subtotal: sums over the order's SOIncludes
+    - credit: previous year's returned packets x previous year's packet price,
+      applied to the store's first order of the year (WXX01-ZZ) only
+    """
+    previous_year = year_suffix - 1
+    items = SOIncludes.objects.filter(store_order=OuterRef('pk')).order_by().values('store_order')
+    money = DecimalField(max_digits=12, decimal_places=2)
+
+    packets_returned = StoreReturns.objects.filter(
+        store=OuterRef('store'),
+        return_year=previous_year
+    ).values('packets_returned')[:1]
+    price = WholesalePktPrice.objects.filter(year=previous_year).values('price_per_packet')[:1]
+
+    return (
+        StoreOrder.objects.for_year(year_suffix).fulfilled()
+        .select_related('store')
+        .annotate(
+            total_packets=Coalesce(Subquery(items.annotate(total=Sum('quantity')).values('total')), 0),
+            subtotal=Coalesce(
+                Subquery(items.annotate(total=Sum(F('price') * F('quantity'), output_field=money)).values('total')),
+                Value(Decimal('0')),
+                output_field=money
+            ),
+            credit=Case(
+                When(
+                    order_number__endswith=f"01-{year_suffix:02d}",
+                    then=Coalesce(
+                        ExpressionWrapper(Subquery(packets_returned) * Subquery(price), output_field=money),
+                        Value(Decimal('0')),
+                        output_field=money
+                    )
+                ),
+                default=Value(Decimal('0')),
+                output_field=money
+            ),
+        )
+        .order_by('-fulfilled_date')
+    )
+
+
 @login_required(login_url='/office/login/')
 @user_passes_test(is_employee)
 @require_http_methods(["POST"])
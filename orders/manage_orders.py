@@ -15,6 +15,11 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "uprising.settings")
 django.setup()
 
 from orders.models import OnlineOrder, OOIncludes, OOIncludesMisc, BatchMetadata, BulkBatch
+from products.models import ProductSalesYear
+from orders.rollback import rollback_orders, orphaned_includes
+from orders.reports import hybrid_orders
+from products.reports import ReportContext
+from uprising.utils.cache import invalidate
 from django.db import transaction
 
 
@@ -178,6 +183,8 @@ def clear_all_tables():
             oo_includes_misc_count = OOIncludesMisc.objects.all().delete()[0]
             oo_includes_count = OOIncludes.objects.all().delete()[0]
             online_order_count = OnlineOrder.objects.all().delete()[0]
+            ProductSalesYear.objects.filter(channel=ProductSalesYear.ONLINE).delete()
+            invalidate('online_orders', 'sales')
             
         print("\n✓ Successfully deleted:")
         print(f"  - {online_order_count} OnlineOrder records")
@@ -238,6 +245,7 @@ def clear_specific_table():
     try:
         with transaction.atomic():
             deleted_count = model.objects.all().delete()[0]
+            invalidate('online_orders')
         print(f"\n✓ Successfully deleted {deleted_count} records from {table_name}")
     except Exception as e:
         print(f"\n✗ Error during deletion: {str(e)}")
@@ -250,20 +258,13 @@ def find_hybrid_orders():
     print("SEARCHING FOR HYBRID ORDERS")
     print("=" * 70)
     
-    # Find orders with misc=True, bulk=True, and have packet items (OOIncludes)
-    orders_with_all_three = OnlineOrder.objects.filter(
-        misc=True,
-        bulk=True,
-        includes__isnull=False
-    ).distinct()
+    orders_with_all_three = hybrid_orders(ReportContext(), None)
     
-    if orders_with_all_three.exists():
-        print(f"\n✓ Found {orders_with_all_three.count()} orders with MISC + BULK + PACKETS:")
+    if orders_with_all_three:
+        print(f"\n✓ Found {len(orders_with_all_three)} orders with MISC + BULK + PACKETS:")
         print("-" * 70)
         for order in orders_with_all_three:
-            pkt_count = order.includes.count()
-            misc_count = order.includes_misc.count()
-            print(f"  {order.order_number} - {pkt_count} pkt items, {misc_count} misc items")
+            print(f"  {order['order_number']} - {order['pkt_items']} pkt items, {order['misc_items']} misc items")
     else:
         print("\n✗ No orders found with all three types")
     
@@ -294,41 +295,26 @@ def delete_orders_from_number():
         print("\n✗ Could not parse order number!")
         return
     
-    # Find all orders with number >= start_number
-    all_orders = OnlineOrder.objects.all()
-    orders_to_delete = []
-    
-    for order in all_orders:
-        try:
-            order_num = int(order.order_number[1:])
-            if order_num >= start_number:
-                orders_to_delete.append(order)
-        except (ValueError, IndexError):
-            # Skip orders with unexpected format
-            continue
+    # Orders with number >= start_number, plus the bulk batches inside that range
+    preview = rollback_orders(start_number, dry_run=True)
     
-    if not orders_to_delete:
+    if not preview['orders']:
         print(f"\n✓ No orders found with number >= {order_number}")
         return
     
-    # Sort by order number for display
-    orders_to_delete.sort(key=lambda x: int(x.order_number[1:]))
-    
-    print(f"\n⚠️  Found {len(orders_to_delete)} orders to delete:")
+    print(f"\n⚠️  Found {preview['orders']} orders to delete:")
     print("-" * 70)
-    print(f"  First order: {orders_to_delete[0].order_number}")
-    print(f"  Last order:  {orders_to_delete[-1].order_number}")
-    print(f"  Total:       {len(orders_to_delete)} orders")
-    
-    # Count related records that will be deleted
-    order_ids = [o.order_number for o in orders_to_delete]
-    includes_count = OOIncludes.objects.filter(order__in=order_ids).count()
-    misc_includes_count = OOIncludesMisc.objects.filter(order__in=order_ids).count()
+    print(f"  First order: {preview['first_order']}")
+    print(f"  Last order:  {preview['last_order']}")
+    print(f"  Total:       {preview['orders']} orders")
     
     print(f"\n  Related records to be deleted:")
-    print(f"    - {includes_count} OOIncludes records")
-    print(f"    - {misc_includes_count} OOIncludesMisc records")
-    print(f"    - Total: {len(orders_to_delete) + includes_count + misc_includes_count} records")
+    print(f"    - {preview['includes']} OOIncludes records")
+    print(f"    - {preview['misc_includes']} OOIncludesMisc records")
+    print(f"    - {len(preview['batches'])} BatchMetadata records ({preview['bulk_rows']} BulkBatch records)")
+    print(f"    - Total: {preview['orders'] + preview['includes'] + preview['misc_includes'] + len(preview['batches']) + preview['bulk_rows']} records")
+    if preview['pre_pack_restored']:
+        print(f"\n  Bulk pre-pack to restore: {sum(preview['pre_pack_restored'].values())} across {len(preview['pre_pack_restored'])} SKUs")
     
     if not confirm_action(f"Delete all orders from {order_number} onward?"):
         print("\n✗ Operation cancelled.")
@@ -340,18 +326,15 @@ def delete_orders_from_number():
         return
     
     try:
-        with transaction.atomic():
-            # Delete orders (cascade will handle OOIncludes and OOIncludesMisc)
-            deleted_info = OnlineOrder.objects.filter(order_number__in=order_ids).delete()
-            total_deleted = deleted_info[0]
-            
-            # deleted_info[1] is a dict with counts by model
-            by_model = deleted_info[1]
-            
+        result = rollback_orders(start_number)
+        
         print("\n✓ Successfully deleted:")
-        for model_name, count in by_model.items():
-            print(f"  - {count} {model_name} records")
-        print(f"\n  Total: {total_deleted} records deleted")
+        print(f"  - {result['orders']} OnlineOrder records")
+        print(f"  - {result['includes']} OOIncludes records")
+        print(f"  - {result['misc_includes']} OOIncludesMisc records")
+        print(f"  - {len(result['batches'])} BatchMetadata / {result['bulk_rows']} BulkBatch records")
+        for sku, qty in result['pre_pack_restored'].items():
+            print(f"  - Restored bulk pre-pack {sku}: +{qty}")
         
     except Exception as e:
         print(f"\n✗ Error during deletion: {str(e)}")
@@ -479,69 +462,35 @@ def find_orphaned_includes():
     print("SEARCHING FOR ORPHANED INCLUDES RECORDS")
     print("=" * 70)
     
-    # Get all unique order_ids from OOIncludes
-    includes_order_ids = OOIncludes.objects.values_list('order_id', flat=True).distinct()
-    
-    orphaned = []
-    for order_id in includes_order_ids:
-        if not OnlineOrder.objects.filter(order_number=order_id).exists():
-            orphaned.append(order_id)
+    orphans = orphaned_includes()
     
-    if not orphaned:
-        print("\n✓ No orphaned OOIncludes records found!")
-    else:
-        print(f"\n⚠️  Found {len(orphaned)} orphaned order references in OOIncludes:")
-        print("-" * 70)
+    for model in (OOIncludes, OOIncludesMisc):
+        name = model.__name__
+        orphaned = orphans[name]
         
-        for order_id in sorted(orphaned):
-            count = OOIncludes.objects.filter(order_id=order_id).count()
-            print(f"  {order_id}: {count} orphaned OOIncludes records")
+        if name == 'OOIncludesMisc':
+            print("\n" + "-" * 70)
+            print("Checking OOIncludesMisc...")
+            print("-" * 70)
         
-        total_orphaned = OOIncludes.objects.filter(order_id__in=orphaned).count()
-        print("-" * 70)
-        print(f"  Total orphaned OOIncludes records: {total_orphaned}")
+        if not orphaned:
+            print(f"\n✓ No orphaned {name} records found!")
+            continue
         
-        if confirm_action("\nDelete these orphaned records?"):
-            try:
-                with transaction.atomic():
-                    deleted_count = OOIncludes.objects.filter(order_id__in=orphaned).delete()[0]
-                print(f"\n✓ Successfully deleted {deleted_count} orphaned OOIncludes records")
-            except Exception as e:
-                print(f"\n✗ Error during deletion: {str(e)}")
-        else:
-            print("\n✗ Operation cancelled.")
-    
-    # Also check OOIncludesMisc
-    print("\n" + "-" * 70)
-    print("Checking OOIncludesMisc...")
-    print("-" * 70)
-    
-    misc_order_ids = OOIncludesMisc.objects.values_list('order_id', flat=True).distinct()
-    
-    orphaned_misc = []
-    for order_id in misc_order_ids:
-        if not OnlineOrder.objects.filter(order_number=order_id).exists():
-            orphaned_misc.append(order_id)
-    
-    if not orphaned_misc:
-        print("\n✓ No orphaned OOIncludesMisc records found!")
-    else:
-        print(f"\n⚠️  Found {len(orphaned_misc)} orphaned order references in OOIncludesMisc:")
+        print(f"\n⚠️  Found {len(orphaned)} orphaned order references in {name}:")
         print("-" * 70)
         
-        for order_id in sorted(orphaned_misc):
-            count = OOIncludesMisc.objects.filter(order_id=order_id).count()
-            print(f"  {order_id}: {count} orphaned OOIncludesMisc records")
+        for order_id, count in orphaned.items():
+            print(f"  {order_id}: {count} orphaned {name} records")
         
-        total_orphaned_misc = OOIncludesMisc.objects.filter(order_id__in=orphaned_misc).count()
         print("-" * 70)
-        print(f"  Total orphaned OOIncludesMisc records: {total_orphaned_misc}")
+        print(f"  Total orphaned {name} records: {sum(orphaned.values())}")
         
         if confirm_action("\nDelete these orphaned records?"):
             try:
                 with transaction.atomic():
-                    deleted_count = OOIncludesMisc.objects.filter(order_id__in=orphaned_misc).delete()[0]
-                print(f"\n✓ Successfully deleted {deleted_count} orphaned OOIncludesMisc records")
+                    deleted_count = model.objects.filter(order_id__in=list(orphaned)).delete()[0]
+                print(f"\n✓ Successfully deleted {deleted_count} orphaned {name} records")
             except Exception as e:
                 print(f"\n✗ Error during deletion: {str(e)}")
         else:
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.models import BatchMetadata
+from orders.rollback import parse_order_number, rollback_orders
+
+
+class Command(BaseCommand):
+
+    help = 'Roll back an online order upload: delete a batch or an order range and restore bulk pre-pack'
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--batch', help='Batch identifier (e.g. 250312-4), rolls back its order range')
+        target.add_argument('--from', dest='start', help='First order number to delete (e.g. S88983)')
+        parser.add_argument('--to', dest='end',
+                            help='Last order number to delete (default: every order from --from onward)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Show what would be deleted without deleting anything')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='Do not ask for confirmation')
+
+    def handle(self, *args, **options):
+        if options['end'] and not options['start']:
+            raise CommandError("--to needs --from")
+        try:
+            start = parse_order_number(options['start']) if options['start'] else None
+            end = parse_order_number(options['end']) if options['end'] else None
+        except ValueError as e:
+            raise CommandError(str(e))
+        if start is not None and end is not None and end < start:
+            raise CommandError("--to is before --from")
+
+        try:
+            preview = rollback_orders(start, end, batch_identifier=options['batch'], dry_run=True)
+        except BatchMetadata.DoesNotExist:
+            raise CommandError(f"Unknown batch: {options['batch']}")
+
+        self.print_result(preview, "Would delete" if options['dry_run'] else "Found")
+        if not (preview['orders'] or preview['batches']):
+            self.stdout.write("\n✅ Nothing to roll back")
+            return
+        if options['dry_run']:
+            self.stdout.write("\n💡 To delete these records, run without --dry-run")
+            return
+
+        if options['interactive']:
+            confirm = input("\nType 'yes' to delete these records: ").strip().lower()
+            if confirm != 'yes':
+                self.stdout.write("✗ Operation cancelled.")
+                return
+
+        result = rollback_orders(start, end, batch_identifier=options['batch'])
+        self.stdout.write("\n✅ Rolled back")
+        if result['unknown_skus']:
+            self.stdout.write(f"⚠️ No product for pulled SKU(s), pre-pack not restored: {', '.join(result['unknown_skus'])}")
+
+    def print_result(self, result, verb):
+        end = f"S{result['end']}" if result['end'] is not None else "onward"
+        self.stdout.write(f"🧾 Orders S{result['start']} → {end}")
+        if result['orders']:
+            self.stdout.write(f"   {result['first_order']} … {result['last_order']}")
+        self.stdout.write(f"\n{verb}:")
+        self.stdout.write(f"  🗑️ {result['orders']} orders")
+        self.stdout.write(f"  🗑️ {result['includes']} OOIncludes / {result['misc_includes']} OOIncludesMisc")
+        self.stdout.write(f"  🗑️ {len(result['batches'])} batches ({', '.join(result['batches']) or '-'}), {result['bulk_rows']} BulkBatch rows")
+        if result['pre_pack_restored']:
+            self.stdout.write("  ♻️ Bulk pre-pack to restore:")
+            for sku, qty in sorted(result['pre_pack_restored'].items()):
+                self.stdout.write(f"     {sku}: +{qty}")
+        if result['partial_batches']:
+            self.stdout.write(f"\n⚠️ Batches only partly in the range (kept): {', '.join(result['partial_batches'])}")
@@ -0,0 +1,31 @@
+"""
+Read-only online order checks for run_reports (see products.reports.REPORTS).
+"""
+from django.db.models import Count
+
+from orders.models import OnlineOrder
+from orders.rollback import orphaned_includes as orphaned_include_counts
+
+
+def hybrid_orders(context, year):
+    """
+    Orders flagged both misc and bulk that also have packet items
+    """
+    orders = (
+        OnlineOrder.objects.filter(misc=True, bulk=True, includes__isnull=False)
+        .annotate(pkt_items=Count('includes', distinct=True), misc_items=Count('includes_misc', distinct=True))
+        .order_by('order_number')
+        .values('order_number', 'pkt_items', 'misc_items')
+    )
+    return list(orders)
+
+
+def orphaned_includes(context, year):
+    """
+    Order lines (OOIncludes / OOIncludesMisc) whose order no longer exists, per order
+    """
+    return [
+        {'table': table, 'order_id': order_id, 'lines': lines}
+        for table, counts in orphaned_include_counts().items()
+        for order_id, lines in counts.items()
+    ]
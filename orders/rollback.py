@@ -0,0 +1,171 @@
+"""
+Roll back a processed online order upload (a CSV batch or a range of order numbers).
+
+Everything is set-based and runs in one transaction: the orders are selected by the numeric
+part of their order number in SQL, their includes / misc includes / orders and the bulk
+batches that lie inside the range are deleted with one queryset delete each, and the
+bulk_pre_pack that calculate_bulk_pull_and_print consumed for those batches ("pull" rows)
+is given back with a single UPDATE.
+"""
+from django.db import transaction
+from django.db.models import Case, Count, Exists, F, IntegerField, OuterRef, Q, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Substr
+
+from orders.models import BatchMetadata, BulkBatch, OnlineOrder, OOIncludes, OOIncludesMisc
+from products.models import Product, ProductSalesYear
+from products.sales import refresh_product_sales
+from uprising.utils.cache import invalidate
+
+# numeric part of an "S88983" style order number (digits after the first character),
+# NULL for anything else
+ORDER_NUMBER = Case(
+    When(order_number__regex=r'^.[0-9]+$', then=Cast(Substr('order_number', 2), IntegerField())),
+    default=None,
+    output_field=IntegerField()
+)
+
+
+def parse_order_number(order_number):
+    """
+    88983 for "S88983" (or "88983"); ValueError otherwise
+    """
+    order_number = str(order_number).strip().upper()
+    digits = order_number[1:] if order_number.startswith('S') else order_number
+    if not digits.isdigit():
+        raise ValueError(f"Invalid order number: {order_number} (should be like S88983)")
+    return int(digits)
+
+
+def orders_in_range(start, end=None):
+    """
+    Online orders numbered start..end (inclusive, end=None for no upper bound)
+    """
+    orders = OnlineOrder.objects.alias(number=ORDER_NUMBER).filter(number__gte=start)
+    if end is not None:
+        orders = orders.filter(number__lte=end)
+    return orders
+
+
+def _pulled(batches):
+    """
+    {sku: qty} the batches pulled from bulk_pre_pack
+    """
+    return dict(
+        BulkBatch.objects.filter(batch_identifier__in=batches, bulk_type='pull')
+        .values('sku')
+        .annotate(total=Sum('quantity'))
+        .order_by()
+        .values_list('sku', 'total')
+    )
+
+
+def _restore_pre_pack(pulled):
+    """
+    Add the pulled quantities back to the products' bulk_pre_pack (one UPDATE).
+    Returns the SKUs with no product.
+    """
+    # same SKU split as calculate_bulk_pull_and_print: 6 character prefix, suffix after the dash
+    product_ids = {
+        (variety_id, sku_suffix): product_id
+        for product_id, variety_id, sku_suffix in Product.objects.filter(
+            variety_id__in={sku[:6] for sku in pulled}
+        ).values_list('id', 'variety_id', 'sku_suffix')
+    }
+    restore = {}
+    for sku, qty in pulled.items():
+        product_id = product_ids.get((sku[:6], sku[7:]))
+        if product_id is not None:
+            restore[product_id] = restore.get(product_id, 0) + qty
+
+    if restore:
+        Product.objects.filter(pk__in=list(restore)).update(bulk_pre_pack=Case(
+            *[When(pk=product_id, then=Coalesce(F('bulk_pre_pack'), Value(0)) + qty) for product_id, qty in restore.items()],
+            default=F('bulk_pre_pack'),
+            output_field=IntegerField()
+        ))
+        invalidate('products')
+    return sorted(sku for sku in pulled if (sku[:6], sku[7:]) not in product_ids)
+
+
+def rollback_orders(start=None, end=None, batch_identifier=None, dry_run=False):
+    """
+    Delete the online orders numbered start..end (or the range of batch_identifier) with
+    their includes, the bulk batches inside the range with their BulkBatch rows, and restore
+    the bulk_pre_pack those batches pulled. Batches that only partly overlap the range are
+    left alone and reported. With dry_run nothing is written and the counts are what would go.
+    Raises BatchMetadata.DoesNotExist for an unknown batch.
+    """
+    if batch_identifier is not None:
+        batch = BatchMetadata.objects.get(batch_identifier=batch_identifier)
+        start, end = batch.start_order_number, batch.end_order_number
+
+    orders = orders_in_range(start, end)
+    includes = OOIncludes.objects.filter(order__in=orders.values('order_number'))
+    misc_includes = OOIncludesMisc.objects.filter(order__in=orders.values('order_number'))
+
+    inside = Q(start_order_number__gte=start)
+    overlaps = Q(end_order_number__gte=start)
+    if end is not None:
+        inside &= Q(end_order_number__lte=end)
+        overlaps &= Q(start_order_number__lte=end)
+    batches = BatchMetadata.objects.filter(inside)
+    bulk_rows = BulkBatch.objects.filter(batch_identifier__in=batches)
+
+    numbers = orders.order_by('number').values_list('order_number', flat=True)
+    result = {
+        'start': start,
+        'end': end,
+        'first_order': numbers.first(),
+        'last_order': numbers.last(),
+        'orders': orders.count(),
+        'includes': includes.count(),
+        'misc_includes': misc_includes.count(),
+        'batches': list(batches.order_by('id').values_list('batch_identifier', flat=True)),
+        'bulk_rows': bulk_rows.count(),
+        'partial_batches': list(
+            BatchMetadata.objects.filter(overlaps).exclude(inside).order_by('id').values_list('batch_identifier', flat=True)
+        ),
+        'pre_pack_restored': _pulled(batches),
+        'unknown_skus': [],
+    }
+    if dry_run or not (result['orders'] or result['batches']):
+        return result
+
+    with transaction.atomic():
+        # the top sellers rollup is refreshed for the years/products these orders touched
+        sold = set(includes.values_list('order__date__year', 'product_id').distinct())
+
+        result['unknown_skus'] = _restore_pre_pack(result['pre_pack_restored'])
+        for sku in result['unknown_skus']:
+            del result['pre_pack_restored'][sku]
+
+        # children first, so each delete is one select of the keys plus batched deletes
+        bulk_rows.delete()
+        batches.delete()
+        includes.delete()
+        misc_includes.delete()
+        orders.delete()
+        invalidate('online_orders')
+
+        for year in {year for year, product_id in sold}:
+            refresh_product_sales(year, ProductSalesYear.ONLINE, [product_id for sold_year, product_id in sold if sold_year == year])
+
+    return result
+
+
+def orphaned_includes():
+    """
+    {'OOIncludes': {order_id: lines}, 'OOIncludesMisc': {order_id: lines}} for lines whose
+    order no longer exists (one grouped NOT EXISTS query per table)
+    """
+    missing_order = ~Exists(OnlineOrder.objects.filter(order_number=OuterRef('order_id')))
+    return {
+        model.__name__: dict(
+            model.objects.filter(missing_order)
+            .values('order_id')
+            .annotate(lines=Count('id'))
+            .order_by('order_id')
+            .values_list('order_id', 'lines')
+        )
+        for model in (OOIncludes, OOIncludesMisc)
+    }
@@ -1,3 +1,86 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.test import TestCase
+from django.utils import timezone
+
+from orders.models import BatchMetadata, BulkBatch, OOIncludes, OOIncludesMisc, OnlineOrder
+from orders.rollback import orphaned_includes, parse_order_number, rollback_orders
+from products.models import Product, ProductSalesYear, Variety
+from products.sales import refresh_product_sales
+
+
+class RollbackOrdersTests(TestCase):
+
+    def setUp(self):
+        variety = Variety.objects.create(sku_prefix="BEA-T0", var_name="Bean")
+        self.product = Product.objects.create(variety=variety, sku_suffix="1oz", bulk_pre_pack=5)
+        for number in range(100, 104):
+            order = OnlineOrder.objects.create(order_number=f"S{number}", customer_name="A", date=timezone.now())
+            OOIncludes.objects.create(order=order, product=self.product, qty=2, price=Decimal("4.00"))
+        OOIncludesMisc.objects.create(order_id="S101", sku="TOO-1", qty=1, price=Decimal("9.00"))
+        refresh_product_sales(timezone.now().year, ProductSalesYear.ONLINE)
+
+        batch = BatchMetadata.objects.create(
+            batch_identifier="B1", batch_date=date(2026, 3, 1), start_order_number=100, end_order_number=101,
+            start_order_date=date(2026, 3, 1), end_order_date=date(2026, 3, 1)
+        )
+        BulkBatch.objects.create(batch_identifier=batch, bulk_type="pull", sku="BEA-T0-1oz", quantity=3)
+        BulkBatch.objects.create(batch_identifier=batch, bulk_type="pull", sku="GON-E0-1oz", quantity=1)
+        BulkBatch.objects.create(batch_identifier=batch, bulk_type="print", sku="BEA-T0-1oz", quantity=1)
+        BatchMetadata.objects.create(
+            batch_identifier="B2", batch_date=date(2026, 3, 2), start_order_number=102, end_order_number=110,
+            start_order_date=date(2026, 3, 2), end_order_date=date(2026, 3, 2)
+        )
+
+    def test_dry_run_writes_nothing(self):
+        result = rollback_orders(batch_identifier="B1", dry_run=True)
+        self.assertEqual((result['first_order'], result['last_order'], result['orders']), ("S100", "S101", 2))
+        self.assertEqual((result['includes'], result['misc_includes'], result['bulk_rows']), (2, 1, 3))
+        self.assertEqual(result['batches'], ["B1"])
+        self.assertEqual(result['pre_pack_restored'], {"BEA-T0-1oz": 3, "GON-E0-1oz": 1})
+        self.assertEqual(OnlineOrder.objects.count(), 4)
+        self.assertEqual(BulkBatch.objects.count(), 3)
+
+    def test_batch_rollback_restores_pre_pack(self):
+        result = rollback_orders(batch_identifier="B1")
+        self.assertEqual(result['unknown_skus'], ["GON-E0-1oz"])
+        self.assertEqual(result['pre_pack_restored'], {"BEA-T0-1oz": 3})
+        self.assertEqual(sorted(OnlineOrder.objects.values_list('order_number', flat=True)), ["S102", "S103"])
+        self.assertEqual(OOIncludes.objects.count(), 2)
+        self.assertFalse(OOIncludesMisc.objects.exists())
+        self.assertEqual(list(BatchMetadata.objects.values_list('batch_identifier', flat=True)), ["B2"])
+        self.assertFalse(BulkBatch.objects.exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.bulk_pre_pack, 8)
+        self.assertEqual(ProductSalesYear.objects.get(product=self.product).qty, 4)
+
+    def test_open_range_keeps_partial_batches(self):
+        result = rollback_orders(parse_order_number("s101"))
+        self.assertEqual((result['orders'], result['batches'], result['partial_batches']), (3, ["B2"], ["B1"]))
+        self.assertEqual(list(OnlineOrder.objects.values_list('order_number', flat=True)), ["S100"])
+        self.assertTrue(BatchMetadata.objects.filter(batch_identifier="B1").exists())
+        with self.assertRaises(ValueError):
+            parse_order_number("S10x")
+
+    def test_command(self):
+        out = StringIO()
+        call_command('rollback_orders', '--from', 'S100', '--to', 'S101', '--dry-run', stdout=out)
+        self.assertIn("Would delete", out.getvalue())
+        self.assertEqual(OnlineOrder.objects.count(), 4)
+
+        call_command('rollback_orders', '--batch', 'B1', '--noinput', stdout=StringIO())
+        self.assertEqual(OnlineOrder.objects.count(), 2)
+        with self.assertRaises(CommandError):
+            call_command('rollback_orders', '--batch', 'B9', stdout=StringIO())
 
-# Create your tests here.
+    def test_orphaned_includes(self):
+        with connection.constraint_checks_disabled():
+            OOIncludes.objects.create(order_id="S999", product=self.product, qty=1, price=Decimal("4.00"))
+            OOIncludes.objects.create(order_id="S999", product=Product.objects.create(variety=self.product.variety, sku_suffix="pkt"), qty=1, price=Decimal("4.00"))
+        self.assertEqual(orphaned_includes(), {'OOIncludes': {"S999": 2}, 'OOIncludesMisc': {}})
+        OOIncludes.objects.filter(order_id="S999").delete()
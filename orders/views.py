@@ -15,7 +15,9 @@ import requests
 from django.contrib.auth.decorators import login_required, user_passes_test
 from uprising.utils.auth import is_employee
 import pandas as pd
-from products.models import Product, MiscProduct, LabelPrint
+from products.models import Product, MiscProduct, LabelPrint, ProductSalesYear
+from products.sales import refresh_product_sales
+from uprising.utils.cache import invalidate
 from lots.models import Lot, MixLot
 from django.db import transaction
 from django.utils.timezone import now
@@ -492,6 +494,7 @@ def process_orders(request):
             misc_orders = []
             order_start_date = None
             order_end_date = None
+            sold_product_ids = set()
 
             for index, row in df.iterrows():
                 order_number = row['Name']
@@ -621,6 +624,7 @@ def process_orders(request):
                         product=product,
                     )
                     current_order_items.append(item)
+                    sold_product_ids.add(product.id)
 
             # Save last order
             if current_order is not None:
@@ -631,6 +635,13 @@ def process_orders(request):
                 for item in current_order_misc_items:
                     item.order = current_order
                     item.save()
+            # order lines have no cache receivers
+            invalidate('online_orders')
+
+            # Top sellers rollup for the products in this upload
+            if order_start_date is not None:
+                for year in range(order_start_date.year, order_end_date.year + 1):
+                    refresh_product_sales(year, ProductSalesYear.ONLINE, sold_product_ids)
 
             # ============================================================
             # STEP 6: CREATE BATCH METADATA FOR BULK ITEMS
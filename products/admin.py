@@ -1,5 +1,23 @@
 from django.contrib import admin
 from .models import *
+from uprising.utils.cache import invalidate
+
+
+class MiscEnvelopeMapAdmin(admin.ModelAdmin):
+    """The envelope map has no cache receivers, so edits here invalidate the envelope usage"""
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        invalidate('sales')
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        invalidate('sales')
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        invalidate('sales')
+
 
 admin.site.register(Variety)
 admin.site.register(Product)
@@ -9,7 +27,10 @@ admin.site.register(ProductNote)
 admin.site.register(RadType)
 admin.site.register(InitialProductOffering)
 admin.site.register(Sales)
+admin.site.register(ProductSalesYear)
 admin.site.register(Growout)
 admin.site.register(MiscSale)
 admin.site.register(MiscProduct)
-admin.site.register(LastSelected)
\ No newline at end of file
+admin.site.register(MiscEnvelopeMap, MiscEnvelopeMapAdmin)
+admin.site.register(LastSelected)
+admin.site.register(InventorySnapshot)
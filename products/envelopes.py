@@ -0,0 +1,129 @@
+"""
+Envelope usage by year and envelope type, and a projection of next season's needs.
+
+- envelope_usage: two GROUP BY (year, env_type) queries for any number of years, one over
+  Sales (quantity x product env_multiplier) and one over MiscSales mapped through
+  MiscEnvelopeMap (quantity x multiplier). Unmapped misc products are left out.
+- envelope_forecast: fits a linear trend per envelope type across the years in one numpy
+  call and subtracts what has already been printed for the projected year.
+"""
+import numpy as np
+from django.db.models import Case, F, IntegerField, Max, Sum, Value, When
+
+from products.models import LabelPrint, MiscSales, Sales
+from uprising.utils.cache import versioned_cache
+
+# products packed into several envelopes carry env_multiplier > 1; everything else is 1
+PRODUCT_ENVELOPES = Case(
+    When(product__env_multiplier__gt=1, then=F('product__env_multiplier')),
+    default=Value(1),
+    output_field=IntegerField()
+)
+
+
+def envelope_usage(years):
+    """
+    {year: {env_type: envelopes}} for each requested Sales year, sorted by count (descending).
+    Years without any sales come back as {}.
+    """
+    years = list(years)
+    usage = {year: {} for year in years}
+
+    product_rows = (
+        Sales.objects.filter(year__in=years)
+        .exclude(product__env_type__isnull=True)
+        .exclude(product__env_type='')
+        .values('year', 'product__env_type')
+        .annotate(envelopes=Sum(F('quantity') * PRODUCT_ENVELOPES))
+        .order_by()
+        .values_list('year', 'product__env_type', 'envelopes')
+    )
+    misc_rows = (
+        MiscSales.objects.filter(year__in=years, product__envelope__isnull=False)
+        .values('year', 'product__envelope__env_type')
+        .annotate(envelopes=Sum(F('quantity') * F('product__envelope__multiplier')))
+        .order_by()
+        .values_list('year', 'product__envelope__env_type', 'envelopes')
+    )
+
+    for rows in (product_rows, misc_rows):
+        for year, env_type, envelopes in rows:
+            counts = usage[year]
+            counts[env_type] = counts.get(env_type, 0) + (envelopes or 0)
+
+    return {
+        year: dict(sorted(counts.items(), key=lambda item: item[1], reverse=True))
+        for year, counts in usage.items()
+    }
+
+
+def printed_envelopes(year):
+    """
+    {env_type: envelopes} already printed (label prints) for a 2-digit year
+    """
+    return dict(
+        LabelPrint.objects.filter(for_year=year)
+        .exclude(product__env_type__isnull=True)
+        .exclude(product__env_type='')
+        .values('product__env_type')
+        .annotate(envelopes=Sum(F('qty') * PRODUCT_ENVELOPES))
+        .order_by()
+        .values_list('product__env_type', 'envelopes')
+    )
+
+
+def envelope_forecast(usage, target_year, printed=None):
+    """
+    Project each envelope type's usage for target_year from the years in `usage`
+    (a least-squares line through each type's yearly totals; a single year is carried
+    forward as is). Years with no usage at all are ignored.
+    Returns {env_type: {'projected', 'printed', 'remaining'}} sorted by projected (descending).
+    """
+    printed = printed or {}
+    years = sorted(year for year, counts in usage.items() if counts)
+    env_types = sorted({env_type for year in years for env_type in usage[year]} | set(printed))
+    if not env_types:
+        return {}
+
+    if years:
+        # rows = years, columns = envelope types
+        counts = np.array([[usage[year].get(env_type, 0) for env_type in env_types] for year in years], dtype=float)
+        if len(years) > 1:
+            slope, intercept = np.polyfit(np.array(years, dtype=float), counts, 1)
+            projected = slope * target_year + intercept
+        else:
+            projected = counts[-1]
+    else:
+        projected = np.zeros(len(env_types))
+
+    projected = np.clip(np.rint(projected), 0, None).astype(int)
+    already_printed = np.array([printed.get(env_type, 0) or 0 for env_type in env_types], dtype=int)
+    remaining = np.clip(projected - already_printed, 0, None)
+
+    forecast = {
+        env_type: {'projected': int(projected[i]), 'printed': int(already_printed[i]), 'remaining': int(remaining[i])}
+        for i, env_type in enumerate(env_types)
+    }
+    return dict(sorted(forecast.items(), key=lambda item: item[1]['projected'], reverse=True))
+
+
+@versioned_cache('sales', 'products')
+def envelope_report(years_back=3):
+    """
+    Usage for the latest Sales year and the years_back - 1 before it, plus the forecast
+    for the following year. Returns {'years': [latest first], 'usage', 'forecast_year', 'forecast'}.
+    """
+    latest_year = Sales.objects.aggregate(max_year=Max('year'))['max_year']
+    if not latest_year:
+        return {'years': [], 'usage': {}, 'forecast_year': None, 'forecast': {}}
+
+    years = [latest_year - i for i in range(years_back)]
+    usage = envelope_usage(years)
+    forecast_year = latest_year + 1
+
+    return {
+        'years': years,
+        'usage': usage,
+        'forecast_year': forecast_year,
+        'forecast': envelope_forecast(usage, forecast_year, printed_envelopes(forecast_year)),
+    }
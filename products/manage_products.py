@@ -6,7 +6,7 @@ import sys
 import csv
 from prettytable import PrettyTable
 from collections import Counter
-from django.db.models import Q, Sum, Max
+from django.db.models import Q, Sum
 import shopify
 import re
 
@@ -24,6 +24,7 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "uprising.settings")
 django.setup()
 
 from products.models import Product, Variety, Sales, MiscProduct, MiscSales, LabelPrint
+from products.reports import ReportContext, low_label_print_report, below_sales_percentage_report, varieties_without_photo, missing_product_attributes, pkt_print_back_mismatch, bullets_in_pkg_size
 from lots.models import Lot
 from django.db import transaction
 
@@ -119,21 +120,17 @@ def print_var_sku_prefixes_and_categories():
 
 def print_varieties_with_no_photo_path():
     """List varieties missing photos"""
-    from django.db.models import Q
-    
-    # Check for both empty string AND null values
-    varieties = Variety.objects.filter(Q(photo_path="") | Q(photo_path__isnull=True))
+    varieties = varieties_without_photo(ReportContext(), None)
     
     if not varieties:
         print("\n✅ All varieties have photos!")
         return
     
     print("\n" + "="*60)
-    print(f"VARIETIES WITHOUT PHOTOS ({varieties.count()})")
+    print(f"VARIETIES WITHOUT PHOTOS ({len(varieties)})")
     print("="*60)
     for var in varieties:
-        photo_status = "NULL" if var.photo_path is None else "empty string"
-        print(f"{var.sku_prefix:<15} {var.var_name or '--':<30} [{photo_status}]")
+        print(f"{var['sku_prefix']:<15} {var['var_name']:<30} [{var['photo_path']}]")
 
 def update_all_variety_photos():
     """Sets all variety 'photo' attributes to the correct file (webp or jpg)"""
@@ -448,40 +445,26 @@ def view_missing_product_attributes():
         ("env_type", "Missing Envelope Types", True),
     ]
 
-    base_qs = (
-        Product.objects
-        .select_related("variety")
-        .order_by("variety__var_name", "sku_suffix")
-    )
+    rows = missing_product_attributes(ReportContext(), None)
 
     for field, title, show_sku in sections:
         print("\n" + "=" * len(title))
         print(title)
         print("=" * len(title))
 
-        qs = base_qs.filter(
-            Q(**{f"{field}__isnull": True}) |
-            Q(**{f"{field}": ""})
-        )
+        missing_rows = [row for row in rows if row['field'] == field]
 
-        if not qs.exists():
+        if not missing_rows:
             print("✓ None missing")
             continue
 
-        for product in qs:
-            variety_name = (
-                product.variety.var_name
-                if product.variety
-                else "(no variety)"
-            )
-
+        for row in missing_rows:
             if show_sku:
-                sku = product.sku_suffix or "(no SKU)"
-                print(f"- {variety_name} — {sku}")
+                print(f"- {row['variety']} — {row['sku_suffix']}")
             else:
-                print(f"- {variety_name}")
+                print(f"- {row['variety']}")
 
-        print(f"\nTotal: {qs.count()}")
+        print(f"\nTotal: {len(missing_rows)}")
 
 
 def view_bad_lineitems(output_file="bad_lineitems.csv"):
@@ -562,35 +545,29 @@ def reset_bulk_pre_pack_to_zero():
 
 def view_products_with_bullet_in_pkg_size():
     """Display all products that have a bullet (•) in their pkg_size and remove them"""
-    products = Product.objects.filter(
-        pkg_size__contains="•"
-    ).select_related('variety').order_by('variety__sku_prefix', 'sku_suffix')
+    rows = bullets_in_pkg_size(ReportContext(), None)
     
-    if not products:
+    if not rows:
         print("\n✅ No products have bullets in pkg_size!")
         return
     
     print("\n" + "="*100)
-    print(f"PRODUCTS WITH BULLET (•) IN PKG_SIZE ({products.count()})")
+    print(f"PRODUCTS WITH BULLET (•) IN PKG_SIZE ({len(rows)})")
     print("="*100)
     print(f"{'SKU Prefix':<15} {'Suffix':<10} {'Old Pkg Size':<25} {'New Pkg Size':<25}")
     print("-"*100)
     
-    changes = []
-    for prod in products:
-        old_pkg_size = prod.pkg_size
-        new_pkg_size = prod.pkg_size.replace("•", "").strip()
-        changes.append((prod, old_pkg_size, new_pkg_size))
-        print(f"{prod.variety.sku_prefix:<15} {(prod.sku_suffix or '--'):<10} "
-              f"{old_pkg_size:<25} {new_pkg_size:<25}")
+    for row in rows:
+        print(f"{row['sku_prefix']:<15} {row['sku_suffix']:<10} "
+              f"{row['pkg_size']:<25} {row['fixed_pkg_size']:<25}")
     
-    print(f"\nTotal: {len(changes)} products to update")
+    print(f"\nTotal: {len(rows)} products to update")
     confirm = input("\nRemove bullets and save changes? (y/n): ").strip().lower()
     
     if confirm == 'y':
         updated_count = 0
-        for prod, old, new in changes:
-            prod.pkg_size = new
+        for prod in Product.objects.filter(pkg_size__contains="•"):
+            prod.pkg_size = prod.pkg_size.replace("•", "").strip()
             prod.save()
             updated_count += 1
         print(f"✅ Updated {updated_count} products")
@@ -599,30 +576,23 @@ def view_products_with_bullet_in_pkg_size():
 
 def find_pkt_products_with_wrong_print_back_setting():
     """Find 'pkt' products with print_back=True but env_type not in Herb/Veg/Flower"""
-    products = Product.objects.filter(
-        sku_suffix='pkt',
-        print_back=True
-    ).exclude(
-        env_type__in=['Herb', 'Veg', 'Flower']
-    ).select_related('variety').order_by('variety__sku_prefix')
+    products = pkt_print_back_mismatch(ReportContext(), None)
     
     if not products:
         print("\n✅ No pkt products found with incorrect env_type!")
         return
     
     print("\n" + "="*120)
-    print(f"PKT PRODUCTS WITH PRINT_BACK=TRUE AND ENV_TYPE NOT IN [Herb, Veg, Flower] ({products.count()})")
+    print(f"PKT PRODUCTS WITH PRINT_BACK=TRUE AND ENV_TYPE NOT IN [Herb, Veg, Flower] ({len(products)})")
     print("="*120)
     print(f"{'SKU Prefix':<15} {'Suffix':<10} {'Env Type':<15} {'Lineitem Name':<40} {'Print Back':<12}")
     print("-"*120)
     
     for prod in products:
-        env_type_display = prod.env_type or '--'
-        print_back = "✓" if prod.print_back else "✗"
-        print(f"{prod.variety.sku_prefix:<15} {(prod.sku_suffix or '--'):<10} "
-              f"{env_type_display:<15} {(prod.lineitem_name or '--'):<40} {print_back:<12}")
+        print(f"{prod['sku_prefix']:<15} {prod['sku_suffix']:<10} "
+              f"{prod['env_type']:<15} {prod['lineitem_name']:<40} {'✓':<12}")
     
-    print(f"\nTotal: {products.count()} products found")
+    print(f"\nTotal: {len(products)} products found")
 
 
 def view_edit_products_with_bulk_pre_pack():
@@ -752,55 +722,12 @@ def check_pkt_products_low_label_prints():
         print("❌ Invalid year format")
         return
     
-    # Import Germination model
-    from lots.models import Germination
-    
-    # Get all pkt products
-    pkt_products = Product.objects.filter(sku_suffix='pkt').select_related('variety')
-    
-    results = []
-    
-    for product in pkt_products:
-        # Calculate total label prints for this product for the given year
-        total_printed = product.label_prints.filter(for_year=year).aggregate(
-            total=Sum('qty')
-        )['total'] or 0
-        
-        # Only consider products with <= 30 labels printed
-        if total_printed <= threshold:
-            # Get lots for this variety
-            variety_lots = Lot.objects.filter(variety=product.variety)
-            
-            # Check if any of these lots have valid germination records for this year
-            valid_lot_count = 0
-            for lot in variety_lots:
-                # Check if this lot has germination records for the year with non-zero germination_rate
-                has_valid_germ = Germination.objects.filter(
-                    lot=lot,
-                    for_year=year,
-                    germination_rate__gt=0
-                ).exists()
-                
-                if has_valid_germ:
-                    valid_lot_count += 1
-            
-            # If variety has lots with valid germination for this year, include it
-            if valid_lot_count > 0:
-                results.append({
-                    'sku_prefix': product.variety.sku_prefix,
-                    'variety_name': product.variety.var_name or '--',
-                    'pkg_size': product.pkg_size or '--',
-                    'total_printed': total_printed,
-                    'lot_count': valid_lot_count
-                })
+    results = low_label_print_report(year, threshold)
     
     if not results:
         print(f"\n✅ No pkt products with low label prints (≤{threshold}) found for year 20{year}")
         return
     
-    # Sort by total printed (ascending)
-    results.sort(key=lambda x: x['total_printed'])
-    
     table = PrettyTable()
     table.field_names = ["SKU Prefix", "Variety Name", "Pkg Size", "Printed", "Active Lots"]
     table.align["SKU Prefix"] = "l"
@@ -851,11 +778,7 @@ def check_pkt_products_below_sales_percentage():
         print("❌ Invalid threshold format")
         return
     
-    from lots.models import Germination
-    
-    most_recent_sales_year = Sales.objects.aggregate(
-        max_year=Max('year')
-    )['max_year']
+    most_recent_sales_year, results = below_sales_percentage_report(current_year, threshold_pct)
     
     if not most_recent_sales_year:
         print("❌ No sales data found in Sales table")
@@ -863,56 +786,10 @@ def check_pkt_products_below_sales_percentage():
     
     print(f"\n📊 Using sales data from year 20{most_recent_sales_year} for comparison")
     
-    pkt_products = Product.objects.filter(sku_suffix='pkt').select_related('variety')
-    
-    results = []
-    
-    for product in pkt_products:
-        total_printed = product.label_prints.filter(for_year=current_year).aggregate(
-            total=Sum('qty')
-        )['total'] or 0
-        
-        if total_printed > 0:
-            prev_year_sales = product.sales.filter(
-                year=most_recent_sales_year
-            ).aggregate(total=Sum('quantity'))['total'] or 0
-            
-            if prev_year_sales > 0:
-                threshold_qty = (threshold_pct / 100) * prev_year_sales
-                
-                if total_printed < threshold_qty:
-                    actual_pct = (total_printed / prev_year_sales) * 100
-                    
-                    variety_lots = Lot.objects.filter(variety=product.variety)
-                    
-                    valid_lot_count = 0
-                    for lot in variety_lots:
-                        has_valid_germ = Germination.objects.filter(
-                            lot=lot,
-                            for_year=current_year,
-                            germination_rate__gt=0
-                        ).exists()
-                        
-                        if has_valid_germ:
-                            valid_lot_count += 1
-                    
-                    results.append({
-                        'sku_prefix': product.variety.sku_prefix,
-                        'variety_name': product.variety.var_name or '--',
-                        'pkg_size': product.pkg_size or '--',
-                        'total_printed': total_printed,
-                        'prev_year_sales': prev_year_sales,
-                        'percentage': actual_pct,
-                        'threshold_qty': int(threshold_qty),
-                        'lot_count': valid_lot_count
-                    })
-    
     if not results:
         print(f"\n✅ No pkt products found with prints > 0 but < {threshold_pct}% of 20{most_recent_sales_year} sales")
         return
     
-    results.sort(key=lambda x: x['percentage'])
-    
     table = PrettyTable()
     table.field_names = ["SKU", "Variety Name", "Printed", f"20{most_recent_sales_year} Sales", "Threshold", "%", "Lots"]
     table.align["SKU"] = "l"
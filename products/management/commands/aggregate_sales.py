@@ -1,13 +1,75 @@
 from django.core.management.base import BaseCommand
 from django.conf import settings
-from products.models import Sales
+
+from products.sales import (
+    collect_retail_sales, collect_wholesale_sales, collect_misc_sales, upsert_sales, upsert_misc_sales
+)
+
 
 class Command(BaseCommand):
-    
+
     help = 'Aggregate sales data for the current year from many to many bridge tables -> Sales table'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, default=settings.CURRENT_ORDER_YEAR,
+                            help='Order year to aggregate, 2 or 4 digits (default: CURRENT_ORDER_YEAR)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Show what would change without writing anything')
+        parser.add_argument('--prune', action='store_true',
+                            help="Also delete the year's Sales/MiscSales rows that no longer have any sales")
+        parser.add_argument('--verbose-diff', action='store_true',
+                            help='List every created/updated/stale row, not just the counts')
+
     def handle(self, *args, **options):
-        year = settings.CURRENT_ORDER_YEAR
-        self.stdout.write(f"📅 Current order year (from settings): {year}")
+        year = options['year'] % 100
+        dry_run = options['dry_run']
+        self.stdout.write(f"📅 Aggregating sales for 20{year:02d}")
+        if dry_run:
+            self.stdout.write("🔍 DRY RUN MODE - No changes will be saved to database")
+
+        # Products: retail (online orders) + wholesale (fulfilled store orders)
+        totals = {}
+        for product_id, qty in collect_retail_sales(year).items():
+            if qty:
+                totals[(product_id, False)] = qty
+        for product_id, qty in collect_wholesale_sales(year).items():
+            if qty:
+                totals[(product_id, True)] = qty
+
+        # Misc products (online orders only)
+        misc_totals, unknown_skus = collect_misc_sales(year)
+        misc_totals = {product_id: qty for product_id, qty in misc_totals.items() if qty}
+
+        sales_result = upsert_sales(year, totals, dry_run=dry_run, prune=options['prune'])
+        misc_result = upsert_misc_sales(year, misc_totals, dry_run=dry_run, prune=options['prune'])
+
+        self.print_summary("Sales", sales_result, options)
+        self.print_summary("MiscSales", misc_result, options)
+
+        if unknown_skus:
+            self.stdout.write(f"\n⚠️ {len(unknown_skus)} misc SKU(s) with no MiscProduct (skipped):")
+            for sku, qty in sorted(unknown_skus.items()):
+                self.stdout.write(f"   {sku}: {qty}")
+
+        if dry_run:
+            self.stdout.write("\n💡 To save these changes, run without --dry-run")
+
+    def print_summary(self, label, result, options):
+        verb = "Would " if options['dry_run'] else ""
+        self.stdout.write(f"\n{'=' * 60}\n{label}:")
+        self.stdout.write(f"  ✨ {verb}Create: {len(result['created'])}")
+        self.stdout.write(f"  ♻️ {verb}Update: {len(result['updated'])}")
+        self.stdout.write(f"  ✔️ Unchanged: {result['unchanged']}")
+        if result['duplicates']:
+            self.stdout.write(f"  🧹 {verb}Remove duplicates: {result['duplicates']}")
+        if result['stale']:
+            action = f"{verb}Delete" if options['prune'] else "Kept (no sales this year, use --prune)"
+            self.stdout.write(f"  🗑️ {action}: {len(result['stale'])}")
 
-       
\ No newline at end of file
+        if options['verbose_diff']:
+            for key, qty in result['created']:
+                self.stdout.write(f"    + {key}: {qty}")
+            for key, old_qty, new_qty in result['updated']:
+                self.stdout.write(f"    ~ {key}: {old_qty} → {new_qty}")
+            for key, qty in result['stale']:
+                self.stdout.write(f"    - {key}: {qty}")
@@ -0,0 +1,58 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+
+from products.reports import below_sales_percentage_report
+
+FIELDS = ['sku_prefix', 'variety_name', 'pkg_size', 'total_printed', 'prev_year_sales', 'percentage', 'threshold_qty', 'lot_count']
+
+
+class Command(BaseCommand):
+
+    help = "List pkt products whose labels printed for the year are below a percentage of a sales year's sales"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, default=settings.CURRENT_ORDER_YEAR,
+                            help='2-digit year of the label prints and germinations (default: CURRENT_ORDER_YEAR)')
+        parser.add_argument('--threshold', type=float, default=50,
+                            help='Percentage of the sales year to compare against (default: 50)')
+        parser.add_argument('--sales-year', type=int,
+                            help='2-digit Sales year to compare with (default: the latest one)')
+        parser.add_argument('--format', choices=['text', 'csv', 'json'], default='text',
+                            help='Human readable list, CSV or JSON')
+
+    def handle(self, *args, **options):
+        year = options['year'] % 100
+        threshold_pct = options['threshold']
+        sales_year = options['sales_year'] % 100 if options['sales_year'] is not None else None
+
+        sales_year, results = below_sales_percentage_report(year, threshold_pct, sales_year)
+        if sales_year is None:
+            raise CommandError("No sales data found in Sales table")
+
+        if options['format'] == 'json':
+            self.stdout.write(json.dumps({
+                'year': year, 'sales_year': sales_year, 'threshold': threshold_pct, 'products': results
+            }, indent=2))
+            return
+        if options['format'] == 'csv':
+            writer = csv.DictWriter(self.stdout, fieldnames=FIELDS, lineterminator='\n')
+            writer.writeheader()
+            writer.writerows({**item, 'percentage': round(item['percentage'], 1)} for item in results)
+            return
+
+        self.stdout.write(f"📊 Using sales data from year 20{sales_year:02d} for comparison")
+        if not results:
+            self.stdout.write(f"✅ No pkt products found with prints > 0 but < {threshold_pct}% of 20{sales_year:02d} sales")
+            return
+
+        self.stdout.write(f"🏷️ Pkt products with prints < {threshold_pct}% of 20{sales_year:02d} sales - year 20{year:02d}")
+        for item in results:
+            self.stdout.write(
+                f"   {item['sku_prefix']:<12} {item['variety_name'][:28]:<28} {item['total_printed']:>6} printed "
+                f"{item['prev_year_sales']:>6} sold  {item['threshold_qty']:>6} threshold  "
+                f"{item['percentage']:>5.1f}%  {item['lot_count']:>3} lots"
+            )
+        self.stdout.write(f"\nTotal: {len(results)} products below threshold")
@@ -0,0 +1,55 @@
+from django.core.management.base import CommandError
+from django.conf import settings
+
+from products.management.commands.aggregate_sales import Command as AggregateSalesCommand
+from products.sales import read_sales_csv, upsert_sales, upsert_misc_sales
+
+
+class Command(AggregateSalesCommand):
+
+    help = 'Import a SKU,QTY sales export (e.g. products/sales_2025.csv) into the Sales / MiscSales tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help='Path to the sales export (.csv with SKU and QTY columns)')
+        parser.add_argument('--year', type=int, default=settings.CURRENT_ORDER_YEAR,
+                            help='Sales year, 2 or 4 digits (default: CURRENT_ORDER_YEAR)')
+        parser.add_argument('--wholesale', action='store_true',
+                            help='Import as wholesale sales (default: retail)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Show what would change without writing anything')
+        parser.add_argument('--prune', action='store_true',
+                            help="Also delete the year's rows for this channel that are not in the file (MiscSales only for retail)")
+        parser.add_argument('--verbose-diff', action='store_true',
+                            help='List every created/updated/stale row, not just the counts')
+
+    def handle(self, *args, **options):
+        year = options['year'] % 100
+        wholesale = options['wholesale']
+        dry_run = options['dry_run']
+
+        try:
+            with open(options['csv_file'], newline='', encoding='utf-8') as f:
+                totals, misc_totals, zero_rows, problems = read_sales_csv(f, wholesale)
+        except OSError as e:
+            raise CommandError(f"Could not read {options['csv_file']}: {e}")
+
+        self.stdout.write(f"📅 Importing sales for 20{year:02d}")
+        self.stdout.write(f"🏪 Wholesale: {'Yes' if wholesale else 'No (Retail)'}")
+        if dry_run:
+            self.stdout.write("🔍 DRY RUN MODE - No changes will be saved to database")
+
+        sales_result = upsert_sales(year, totals, dry_run=dry_run, prune=options['prune'], wholesale=wholesale)
+        # MiscSales has no channel, so only a retail import prunes it
+        misc_result = upsert_misc_sales(year, misc_totals, dry_run=dry_run, prune=options['prune'] and not wholesale)
+
+        self.print_summary("Sales", sales_result, options)
+        self.print_summary("MiscSales", misc_result, options)
+
+        self.stdout.write(f"\n⏭️ Skipped {zero_rows} row(s) with quantity 0")
+        if problems:
+            self.stdout.write(f"⚠️ Skipped {len(problems)} row(s):")
+            for row_num, message in problems:
+                self.stdout.write(f"   Row {row_num}: {message}")
+
+        if dry_run:
+            self.stdout.write("\n💡 To save these changes, run without --dry-run")
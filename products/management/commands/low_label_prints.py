@@ -0,0 +1,48 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand
+from django.conf import settings
+
+from products.reports import low_label_print_report
+
+FIELDS = ['sku_prefix', 'variety_name', 'pkg_size', 'total_printed', 'lot_count']
+
+
+class Command(BaseCommand):
+
+    help = 'List pkt products with few labels printed for the year whose variety has germinated lots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, default=settings.CURRENT_ORDER_YEAR,
+                            help='2-digit year of the label prints and germinations (default: CURRENT_ORDER_YEAR)')
+        parser.add_argument('--threshold', type=int, default=30,
+                            help='Include products with at most this many labels printed (default: 30)')
+        parser.add_argument('--format', choices=['text', 'csv', 'json'], default='text',
+                            help='Human readable list, CSV or JSON')
+
+    def handle(self, *args, **options):
+        year = options['year'] % 100
+        threshold = options['threshold']
+        results = low_label_print_report(year, threshold)
+
+        if options['format'] == 'json':
+            self.stdout.write(json.dumps({'year': year, 'threshold': threshold, 'products': results}, indent=2))
+            return
+        if options['format'] == 'csv':
+            writer = csv.DictWriter(self.stdout, fieldnames=FIELDS, lineterminator='\n')
+            writer.writeheader()
+            writer.writerows(results)
+            return
+
+        if not results:
+            self.stdout.write(f"✅ No pkt products with low label prints (≤{threshold}) found for year 20{year:02d}")
+            return
+
+        self.stdout.write(f"🏷️ Pkt products with low label prints (≤{threshold}) - year 20{year:02d}")
+        for item in results:
+            self.stdout.write(
+                f"   {item['sku_prefix']:<12} {item['variety_name'][:38]:<38} {item['pkg_size']:<10} "
+                f"{item['total_printed']:>6} printed  {item['lot_count']:>3} lots"
+            )
+        self.stdout.write(f"\nTotal: {len(results)} products with active germination lots")
@@ -0,0 +1,47 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+
+from products.reports import read_shopify_export, build_pre_opening_report
+
+
+class Command(BaseCommand):
+
+    help = 'Run the pre-opening readiness report against a Shopify product export CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help='Path to the Shopify products export (.csv)')
+        parser.add_argument('--year', type=int, default=settings.CURRENT_ORDER_YEAR,
+                            help='Order year to check germinations for (default: CURRENT_ORDER_YEAR)')
+        parser.add_argument('--format', choices=['json', 'text'], default='json',
+                            help='json (stable, diffable) or a human readable summary')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['csv_file'], newline='', encoding='utf-8') as f:
+                csv_products = read_shopify_export(f)
+        except OSError as e:
+            raise CommandError(f"Could not read {options['csv_file']}: {e}")
+
+        report = build_pre_opening_report(csv_products, options['year'])
+
+        if options['format'] == 'json':
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        summary = report['summary']
+        self.stdout.write(f"📅 Pre-opening report for 20{report['current_order_year']}")
+        self.stdout.write(f"   {summary['total_csv_products']} SKUs in export\n")
+
+        self.stdout.write(f"❌ In Shopify but not in database ({summary['total_not_in_db']}):")
+        for item in report['products_not_in_db']:
+            self.stdout.write(f"   {item['sku']:<20} {item['title']} [{item['tracker'] or 'untracked'}: {item['qty']}]")
+
+        self.stdout.write(f"\n⚠️  In stock without active germination ({summary['total_without_germ']}):")
+        for item in report['products_without_germ']:
+            self.stdout.write(f"   {item['sku']:<20} {item['title']} [{item['qty']}]")
+
+        self.stdout.write(f"\n📦 Active germination but no packet inventory ({summary['total_germ_but_no_inv']}):")
+        for item in report['varieties_with_germ_but_no_inventory']:
+            self.stdout.write(f"   {item['sku']:<20} {item['var_name']} [{item['qty']}]")
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from products.snapshots import prune_inventory_snapshots
+
+
+class Command(BaseCommand):
+
+    help = 'Delete all but the newest inventory snapshots (rows and .npz files) and any orphaned snapshot files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', type=int, default=settings.INVENTORY_SNAPSHOT_KEEP,
+                            help=f'Number of newest snapshots to keep (default {settings.INVENTORY_SNAPSHOT_KEEP})')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+
+    def handle(self, *args, **options):
+        if options['keep'] < 0:
+            raise CommandError("--keep can't be negative")
+
+        snapshots, files = prune_inventory_snapshots(options['keep'], dry_run=options['dry_run'])
+
+        if options['dry_run']:
+            self.stdout.write(f"Would delete {snapshots} snapshots and {files} files")
+        else:
+            self.stdout.write(f"✅ Deleted {snapshots} snapshots and {files} files")
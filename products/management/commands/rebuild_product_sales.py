@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from products.sales import rebuild_product_sales
+
+
+class Command(BaseCommand):
+
+    help = 'Rebuild the ProductSalesYear table (qty + revenue per product/year/channel) from the order tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, action='append', dest='years',
+                            help='Only rebuild this year, 2 or 4 digits (repeatable)')
+
+    def handle(self, *args, **options):
+        years = [year % 100 for year in options['years']] if options['years'] else None
+        count = rebuild_product_sales(years)
+
+        self.stdout.write(f"✅ Wrote {count} product sales rows")
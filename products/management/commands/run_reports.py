@@ -0,0 +1,76 @@
+import csv
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from products.reports import REPORTS, ReportContext
+
+
+class Command(BaseCommand):
+
+    help = 'Run read-only reports from the manage_*.py tools in one pass, sharing the data they load'
+
+    def add_arguments(self, parser):
+        parser.add_argument('reports', nargs='*', metavar='report',
+                            help=f"Reports to run (default: all): {', '.join(REPORTS)}")
+        parser.add_argument('--year', type=int, default=settings.CURRENT_ORDER_YEAR,
+                            help='Year the reports check, 2 or 4 digits (default: CURRENT_ORDER_YEAR)')
+        parser.add_argument('--format', choices=['text', 'csv', 'json'], default='text',
+                            help='Human readable summary, CSV or JSON')
+        parser.add_argument('--output-dir',
+                            help='Write one <report>.csv / <report>.json file per report instead of printing')
+        parser.add_argument('--list', action='store_true',
+                            help='List the available reports and exit')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for name, path in REPORTS.items():
+                self.stdout.write(f"{name:<28} {import_string(path).__doc__.strip().splitlines()[0]}")
+            return
+
+        names = options['reports'] or list(REPORTS)
+        unknown = [name for name in names if name not in REPORTS]
+        if unknown:
+            raise CommandError(f"Unknown report(s): {', '.join(unknown)}. Use --list to see them.")
+
+        output_format, output_dir = options['format'], options['output_dir']
+        if output_format == 'csv' and len(names) > 1 and not output_dir:
+            raise CommandError("CSV output of several reports needs --output-dir")
+
+        year = options['year'] % 100
+        context = ReportContext()
+        results = {name: import_string(REPORTS[name])(context, year) for name in names}
+
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+            for name, rows in results.items():
+                path = os.path.join(output_dir, f"{name}.{'csv' if output_format == 'csv' else 'json'}")
+                with open(path, 'w', newline='', encoding='utf-8') as f:
+                    if output_format == 'csv':
+                        self.write_csv(f, rows)
+                    else:
+                        json.dump(rows, f, indent=2, default=str)
+                self.stdout.write(f"💾 {name}: {len(rows)} row(s) → {path}")
+            return
+
+        if output_format == 'json':
+            self.stdout.write(json.dumps({'year': year, 'reports': results}, indent=2, default=str))
+        elif output_format == 'csv':
+            self.write_csv(self.stdout, results[names[0]])
+        else:
+            self.stdout.write(f"📅 Reports for 20{year:02d}")
+            for name, rows in results.items():
+                icon = "✅" if not rows else "⚠️"
+                self.stdout.write(f"\n{icon} {name}: {len(rows)} row(s)")
+                for row in rows:
+                    self.stdout.write("   " + " | ".join(str(value) for value in row.values()))
+
+    def write_csv(self, f, rows):
+        if not rows:
+            return
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]), lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:41
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_remove_variety_veg_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('shopify_inventory', 'Shopify inventory upload'), ('pre_opening', 'Pre-opening report')], max_length=30)),
+                ('file_name', models.CharField(max_length=255, unique=True)),
+                ('original_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('uploaded_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('sku_count', models.IntegerField(default=0)),
+                ('tracked_qty', models.IntegerField(default=0)),
+                ('uploaded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='inventory_snapshots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-uploaded_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-19 16:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# the mapping that used to be hard-coded in office.views
+MISC_ENVELOPES = {
+    "TOM-CH-pkts": ("Tomato", 7),
+    "PEA-SP-pkts": ("Pea", 3),
+    "BEA-MF-pkts": ("Bean", 4),
+}
+
+
+def seed_envelope_map(apps, schema_editor):
+    MiscProduct = apps.get_model('products', 'MiscProduct')
+    MiscEnvelopeMap = apps.get_model('products', 'MiscEnvelopeMap')
+
+    MiscEnvelopeMap.objects.bulk_create([
+        MiscEnvelopeMap(product=product, env_type=MISC_ENVELOPES[product.sku][0], multiplier=MISC_ENVELOPES[product.sku][1])
+        for product in MiscProduct.objects.filter(sku__in=list(MISC_ENVELOPES))
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0013_inventorysnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MiscEnvelopeMap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('env_type', models.CharField(max_length=50)),
+                ('multiplier', models.IntegerField(default=1)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='envelope', to='products.miscproduct')),
+            ],
+        ),
+        migrations.RunPython(seed_envelope_map, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.5 on 2026-10-19 16:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import DecimalField, F, Sum
+from django.db.models.functions import ExtractYear
+
+
+def build_sales_years(apps, schema_editor):
+    """
+    Initial fill from the existing order lines (same as manage.py rebuild_product_sales)
+    """
+    OOIncludes = apps.get_model('orders', 'OOIncludes')
+    SOIncludes = apps.get_model('stores', 'SOIncludes')
+    ProductSalesYear = apps.get_model('products', 'ProductSalesYear')
+    money = DecimalField(max_digits=12, decimal_places=2)
+
+    online = (
+        OOIncludes.objects.annotate(order_year=ExtractYear('order__date'))
+        .values('product_id', 'order_year')
+        .annotate(total=Sum('qty'), revenue=Sum(F('qty') * F('price'), output_field=money))
+        .order_by()
+        .values_list('product_id', 'order_year', 'total', 'revenue')
+    )
+    wholesale = (
+        SOIncludes.objects.filter(store_order__order_year__isnull=False, store_order__fulfilled_date__isnull=False)
+        .values('product_id', 'store_order__order_year')
+        .annotate(total=Sum('quantity'), revenue=Sum(F('quantity') * F('price'), output_field=money))
+        .order_by()
+        .values_list('product_id', 'store_order__order_year', 'total', 'revenue')
+    )
+
+    rows = []
+    for channel, grouped in (('online', online), ('wholesale', wholesale)):
+        for product_id, year, qty, revenue in grouped:
+            rows.append(ProductSalesYear(
+                product_id=product_id, year=year % 100, channel=channel, qty=qty or 0, revenue=revenue or 0
+            ))
+    ProductSalesYear.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0014_miscenvelopemap'),
+        ('orders', '0002_onlineorder_shipping_company'),
+        ('stores', '0009_storeorder_order_year'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSalesYear',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('channel', models.CharField(choices=[('online', 'Online'), ('wholesale', 'Wholesale')], max_length=10)),
+                ('qty', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_years', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Product Sales Year',
+                'verbose_name_plural': 'Product Sales Years',
+                'indexes': [models.Index(fields=['year', 'channel', '-qty'], name='productsalesyear_top_idx')],
+                'unique_together': {('product', 'year', 'channel')},
+            },
+        ),
+        migrations.RunPython(build_sales_years, migrations.RunPython.noop),
+    ]
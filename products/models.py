@@ -3,7 +3,8 @@ from django.db import models
 from lots.models import Lot
 from django.contrib.auth import get_user_model
 User = get_user_model()
-from django.db.models import Sum
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 # from datetime import datetime
 
@@ -46,6 +47,60 @@ class Variety(models.Model):
         return f"{self.sku_prefix} - {self.var_name or ''}"
 
         
+def _summed(queryset, field):
+    """
+    Correlated SUM(field) of a per-product queryset, 0 when there are no rows
+    """
+    total = (
+        queryset.filter(product=OuterRef('pk'))
+        .order_by()
+        .values('product')
+        .annotate(total=Sum(field))
+        .values('total')
+    )
+    return Coalesce(Subquery(total), 0)
+
+
+class ProductQuerySet(models.QuerySet):
+
+    STAT_FIELDS = (
+        'ytd_online_qty', 'ytd_wholesale_qty', 'last_year_retail_qty',
+        'last_year_wholesale_qty', 'total_printed', 'last_print_date'
+    )
+
+    def with_stats(self, year=None):
+        """
+        Annotate the sales/print numbers shown in product tables, one subquery each:
+        ytd_online_qty / ytd_wholesale_qty (calendar year 20YY, fulfilled store orders),
+        last_year_retail_qty / last_year_wholesale_qty (Sales for YY-1),
+        total_printed / last_print_date (label prints for YY).
+        year is a 2-digit order year, default CURRENT_ORDER_YEAR; YTD defaults to this calendar year.
+        """
+        from orders.models import OOIncludes
+        from stores.models import SOIncludes
+
+        if year is None:
+            year = settings.CURRENT_ORDER_YEAR
+            calendar_year = timezone.now().year
+        else:
+            year = int(year) % 100
+            calendar_year = 2000 + year
+
+        return self.annotate(
+            ytd_online_qty=_summed(OOIncludes.objects.filter(order__date__year=calendar_year), 'qty'),
+            ytd_wholesale_qty=_summed(
+                SOIncludes.objects.filter(store_order__date__year=calendar_year, store_order__fulfilled_date__isnull=False),
+                'quantity'
+            ),
+            last_year_retail_qty=_summed(Sales.objects.filter(year=year - 1, wholesale=False), 'quantity'),
+            last_year_wholesale_qty=_summed(Sales.objects.filter(year=year - 1, wholesale=True), 'quantity'),
+            total_printed=_summed(LabelPrint.objects.filter(for_year=year), 'qty'),
+            last_print_date=Subquery(
+                LabelPrint.objects.filter(product=OuterRef('pk'), for_year=year).order_by('-date').values('date')[:1]
+            ),
+        )
+
+
 class Product(models.Model):
     variety = models.ForeignKey("Variety", on_delete=models.CASCADE, related_name="products", null=True, blank=True)
     lot = models.ForeignKey("lots.Lot", on_delete=models.SET_NULL, null=True, blank=True, related_name="products")
@@ -67,12 +122,24 @@ class Product(models.Model):
     bulk_pre_pack = models.IntegerField(blank=True, null=True, default=0)
     is_sub_product = models.BooleanField(default=False)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         unique_together = ("variety", "sku_suffix")
         
     def __str__(self):
         return f"{self.variety.sku_prefix} - {self.pkg_size or ''}"
 
+    def _stats(self):
+        """
+        Load the with_stats() numbers onto this instance if the queryset didn't annotate them
+        (one query instead of one per method)
+        """
+        if not hasattr(self, 'total_printed'):
+            stats = Product.objects.filter(pk=self.pk).with_stats().values(*ProductQuerySet.STAT_FIELDS).first() or {}
+            for field in ProductQuerySet.STAT_FIELDS:
+                setattr(self, field, stats.get(field))
+
     def get_rad_type(self):
         if self.pkg_size != 'pkt':
             if hasattr(self.variety, 'rad_type'):
@@ -80,58 +147,36 @@ class Product(models.Model):
         return None
     
     def get_ytd_sales(self):
-        current_year = timezone.now().year
-        
-        # Get OOIncludes total for current year
-        oo_total = self.ooincludes_set.filter(
-            order__date__year=current_year
-        ).aggregate(total=Sum('qty'))['total'] or 0
-        
+        self._stats()
+        oo_total = self.ytd_online_qty or 0
+
         if self.sku_suffix != 'pkt':
             return f"{oo_total}"
-        
-        # Get SOIncludes total for current year  
-        so_total = self.soincludes_set.filter(
-            store_order__date__year=current_year,
-            store_order__fulfilled_date__isnull=False
-        ).aggregate(total=Sum('quantity'))['total'] or 0
-                
+
+        so_total = self.ytd_wholesale_qty or 0
         if oo_total == 0 and so_total == 0:
             return None  # Will display as "--"
-        
+
         return f"{oo_total} ({so_total})"
     
     def get_last_year_sales(self):
-        last_year = settings.CURRENT_ORDER_YEAR - 1
-        # Get total retail sales for last year
-        retail_total = self.sales.filter(
-            year=last_year,
-            wholesale=False
-        ).aggregate(total=Sum('quantity'))['total'] or 0
+        self._stats()
+        retail_total = self.last_year_retail_qty or 0
 
         if self.sku_suffix != 'pkt':
             return f"{retail_total}"
-        
-        # Get total wholesale sales for last year
-        wholesale_total = self.sales.filter(
-            year=last_year,
-            wholesale=True
-        ).aggregate(total=Sum('quantity'))['total'] or 0
 
-        return f"{retail_total} ({wholesale_total})"
+        return f"{retail_total} ({self.last_year_wholesale_qty or 0})"
         
     # CHANGED THIS SO THAT IT ONLY PULLS LABEL PRINTS FOR CURRENT ORDER YEAR... 
     def get_total_printed(self):
-        total = self.label_prints.filter(for_year=settings.CURRENT_ORDER_YEAR).aggregate(
-            total=Sum('qty')
-        )['total'] or 0
-        
-        return total
+        self._stats()
+        return self.total_printed or 0
     
     def get_last_print_date(self):
-        last_print = self.label_prints.filter(for_year=settings.CURRENT_ORDER_YEAR).order_by('-date').first()
-        if last_print:
-            return last_print.date.strftime("%m/%d/%Y")
+        self._stats()
+        if self.last_print_date:
+            return self.last_print_date.strftime("%m/%d/%Y")
         return "--"
     
 
@@ -174,6 +219,35 @@ class Sales(models.Model):
     wholesale = models.BooleanField(default=False)
 
 
+class ProductSalesYear(models.Model):
+    """
+    Units and revenue per product, 2-digit year and channel: online orders by order date,
+    wholesale by fulfilled store orders of the order year. Refreshed for the affected
+    products by process_orders and finalize_order (products.sales.refresh_product_sales);
+    rebuild with manage.py rebuild_product_sales. The top sellers leaderboard reads from here.
+    """
+    ONLINE = 'online'
+    WHOLESALE = 'wholesale'
+    CHANNEL_CHOICES = [(ONLINE, 'Online'), (WHOLESALE, 'Wholesale')]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="sales_years")
+    year = models.IntegerField()
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    qty = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Product Sales Year"
+        verbose_name_plural = "Product Sales Years"
+        unique_together = ('product', 'year', 'channel')
+        indexes = [
+            models.Index(fields=['year', 'channel', '-qty'], name='productsalesyear_top_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product} 20{self.year:02d} {self.channel}: {self.qty}"
+
+
 # rethink this, maybe tie into lot??
 class Growout(models.Model):
     variety = models.OneToOneField(Variety, on_delete=models.CASCADE, related_name="growout_info")
@@ -202,6 +276,18 @@ class MiscSales(models.Model):
     quantity = models.IntegerField()
     year = models.IntegerField()
 
+
+class MiscEnvelopeMap(models.Model):
+    """
+    Envelopes used per unit of a misc product (e.g. a 7-pack of tomatoes = 7 Tomato envelopes)
+    """
+    product = models.OneToOneField(MiscProduct, on_delete=models.CASCADE, related_name="envelope")
+    env_type = models.CharField(max_length=50)
+    multiplier = models.IntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.product.sku} -> {self.multiplier} x {self.env_type}"
+
 class LastSelected(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     variety = models.ForeignKey(Variety, on_delete=models.CASCADE, related_name="last_selected_for")
@@ -217,3 +303,28 @@ class LabelPrint(models.Model):
     date = models.DateField()
     qty = models.IntegerField()
     for_year = models.IntegerField()
+
+
+class InventorySnapshot(models.Model):
+    """
+    Metadata for a parsed Shopify inventory export.
+    The SKU-keyed columns (sku, title, tracker, qty) live in a compressed .npz file
+    in settings.INVENTORY_SNAPSHOT_DIR -- see products/snapshots.py
+    """
+    SOURCE_CHOICES = [
+        ("shopify_inventory", "Shopify inventory upload"),
+        ("pre_opening", "Pre-opening report"),
+    ]
+    source = models.CharField(max_length=30, choices=SOURCE_CHOICES)
+    file_name = models.CharField(max_length=255, unique=True)
+    original_name = models.CharField(max_length=255, blank=True, null=True)
+    uploaded_at = models.DateTimeField(default=timezone.now, db_index=True)
+    uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="inventory_snapshots")
+    sku_count = models.IntegerField(default=0)
+    tracked_qty = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-uploaded_at']
+
+    def __str__(self):
+        return f"{self.get_source_display()} snapshot ({self.uploaded_at:%Y-%m-%d %H:%M}, {self.sku_count} SKUs)"
@@ -0,0 +1,380 @@
+import csv
+import io
+from collections import defaultdict
+from functools import cached_property
+
+from django.db.models import Count, F, Max, Sum
+
+from lots.models import Germination, Lot, RetiredLot
+from products.models import Product, MiscProduct, LabelPrint, Sales, Variety
+
+
+def read_shopify_export(lines):
+    """
+    Read a Shopify product export row by row into {sku: {title, tracker, qty}}.
+    Blank titles are forward-filled from the previous row (same variety, different variant).
+    `lines` can be any iterable of text lines, so uploads and files are streamed rather than
+    decoded into one string.
+    """
+    csv_products = {}
+    last_title = ""
+
+    for row in csv.DictReader(lines):
+        sku = row.get('Variant SKU', '').strip()
+        title = row.get('Title', '').strip()
+
+        if title:
+            last_title = title
+        elif last_title:
+            title = last_title
+
+        if sku:
+            csv_products[sku] = {
+                'title': title,
+                'tracker': row.get('Variant Inventory Tracker', '').strip(),
+                'qty': int(row.get('Variant Inventory Qty', '0').strip() or 0)
+            }
+
+    return csv_products
+
+
+def stream_uploaded_csv(uploaded_file, encoding='utf-8'):
+    """
+    Wrap an uploaded file so csv can read it line by line.
+    """
+    return io.TextIOWrapper(uploaded_file.file, encoding=encoding, newline='')
+
+
+def load_pre_opening_sets(current_order_year):
+    """
+    Preload everything the pre-opening checks need (3 queries):
+    - misc_skus: every MiscProduct sku
+    - product_keys: every (sku_prefix, sku_suffix) pair in Product
+    - active_germ: {sku_prefix: var_name} for varieties with an active germination this year
+    """
+    misc_skus = set(MiscProduct.objects.values_list('sku', flat=True))
+    product_keys = set(Product.objects.values_list('variety_id', 'sku_suffix'))
+    active_germ = dict(
+        Germination.objects.filter(status='active', for_year=current_order_year)
+        .order_by('lot__variety_id')
+        .values_list('lot__variety_id', 'lot__variety__var_name')
+        .distinct()
+    )
+    return misc_skus, product_keys, active_germ
+
+
+def sku_in_db(sku, misc_skus, product_keys):
+    """
+    Check if a SKU exists in either the MiscProduct or Product table, using preloaded sets.
+    SKU format: PREFIX-SUFFIX (e.g., "PEA-SP-pkt")
+    """
+    if sku in misc_skus:
+        return True
+    parts = sku.rsplit('-', 1)
+    return len(parts) == 2 and (parts[0], parts[1]) in product_keys
+
+
+def build_pre_opening_report(csv_products, current_order_year):
+    """
+    Build the pre-opening readiness report for a parsed Shopify export:
+    1. products in the CSV that are not in the database
+    2. products with stock but no active germination for the year
+    3. varieties with active germ whose pkt product has no inventory
+    """
+    misc_skus, product_keys, active_germ = load_pre_opening_sets(current_order_year)
+
+    # Check 1: Products in CSV not in database
+    in_db = {sku: sku_in_db(sku, misc_skus, product_keys) for sku in csv_products}
+    products_not_in_db = [
+        {'sku': sku, 'title': data['title'], 'tracker': data['tracker'], 'qty': data['qty']}
+        for sku, data in csv_products.items() if not in_db[sku]
+    ]
+
+    # Check 2: Products without active germinations (tracked or untracked)
+    products_without_germ = []
+    for sku, data in csv_products.items():
+        if data['qty'] == 0 or not in_db[sku]:
+            continue
+
+        parts = sku.rsplit('-', 1)
+        if len(parts) == 2 and parts[0] in active_germ:
+            continue
+
+        tracker_value = data['tracker'].strip()
+        is_tracked = tracker_value.lower() == 'shopify'
+        is_untracked = tracker_value == '' or tracker_value.lower() == 'none'
+
+        if is_tracked or is_untracked:
+            products_without_germ.append({
+                'sku': sku,
+                'title': data['title'],
+                'qty': 'untracked' if is_untracked else data['qty']
+            })
+
+    # Check 3: Varieties with active germ but pkt product inventory <=0
+    varieties_with_germ_but_no_inventory = []
+    for sku_prefix, var_name in active_germ.items():
+        pkt_sku = f"{sku_prefix}-pkt"
+        csv_data = csv_products.get(pkt_sku)
+
+        if csv_data and csv_data['tracker'].lower() == 'shopify' and csv_data['qty'] <= 0:
+            varieties_with_germ_but_no_inventory.append({
+                'variety': sku_prefix,
+                'var_name': var_name or '',
+                'sku': pkt_sku,
+                'qty': csv_data['qty'],
+                'title': csv_data['title']
+            })
+
+    return {
+        'current_order_year': current_order_year,
+        'products_not_in_db': products_not_in_db,
+        'products_without_germ': products_without_germ,
+        'varieties_with_germ_but_no_inventory': varieties_with_germ_but_no_inventory,
+        'summary': {
+            'total_not_in_db': len(products_not_in_db),
+            'total_without_germ': len(products_without_germ),
+            'total_germ_but_no_inv': len(varieties_with_germ_but_no_inventory),
+            'total_csv_products': len(csv_products)
+        }
+    }
+
+
+# Read-only reports for run_reports: name -> function(context, year) returning a list of row dicts
+REPORTS = {
+    'lots_without_germ': 'lots.reports.lots_without_germ',
+    'lots_with_pending_germs': 'lots.reports.lots_with_pending_germs',
+    'low_label_prints': 'products.reports.low_label_prints',
+    'below_sales_percentage': 'products.reports.below_sales_percentage',
+    'varieties_without_photo': 'products.reports.varieties_without_photo',
+    'missing_product_attributes': 'products.reports.missing_product_attributes',
+    'pkt_print_back_mismatch': 'products.reports.pkt_print_back_mismatch',
+    'bullets_in_pkg_size': 'products.reports.bullets_in_pkg_size',
+    'hybrid_orders': 'orders.reports.hybrid_orders',
+    'orphaned_includes': 'orders.reports.orphaned_includes',
+    'unfulfilled_store_orders': 'stores.reports.unfulfilled_store_orders',
+}
+
+
+class ReportContext:
+    """
+    Data shared by every report in one run, each loaded on first use with one query
+    (per year for the yearly totals) and then reused by the reports that follow.
+    """
+
+    def __init__(self):
+        self._printed = {}
+        self._sales = {}
+        self._germ_lots = {}
+
+    @cached_property
+    def varieties(self):
+        return list(Variety.objects.order_by('sku_prefix'))
+
+    @cached_property
+    def products(self):
+        return list(Product.objects.select_related('variety').order_by('variety__sku_prefix', 'sku_suffix'))
+
+    @cached_property
+    def pkt_products(self):
+        return [product for product in self.products if product.sku_suffix == 'pkt' and product.variety_id]
+
+    @cached_property
+    def lots(self):
+        return list(Lot.objects.select_related('variety', 'grower').order_by('variety__sku_prefix', 'year'))
+
+    @cached_property
+    def retired_lot_ids(self):
+        return set(RetiredLot.objects.values_list('lot_id', flat=True))
+
+    @cached_property
+    def germinations(self):
+        """
+        {lot_id: [germinations, most recently tested first]}
+        """
+        by_lot = defaultdict(list)
+        for germination in Germination.objects.order_by('lot_id', F('test_date').desc(nulls_last=True), '-id'):
+            by_lot[germination.lot_id].append(germination)
+        return by_lot
+
+    def lot_status(self, lot):
+        """
+        Lot.get_lot_status() from the preloaded retired lots and germinations
+        """
+        if lot.id in self.retired_lot_ids:
+            return "retired"
+        tested = [germination for germination in self.germinations.get(lot.id, []) if germination.test_date]
+        return tested[0].status if tested else "unknown"
+
+    def printed(self, year):
+        """
+        {product_id: labels printed for the year}
+        """
+        if year not in self._printed:
+            self._printed[year] = dict(
+                LabelPrint.objects.filter(for_year=year)
+                .values('product_id')
+                .annotate(total=Sum('qty'))
+                .order_by()
+                .values_list('product_id', 'total')
+            )
+        return self._printed[year]
+
+    def sales(self, year):
+        """
+        {product_id: quantity sold in the Sales year}
+        """
+        if year not in self._sales:
+            self._sales[year] = dict(
+                Sales.objects.filter(year=year)
+                .values('product_id')
+                .annotate(total=Sum('quantity'))
+                .order_by()
+                .values_list('product_id', 'total')
+            )
+        return self._sales[year]
+
+    def germ_lots(self, year):
+        """
+        {sku_prefix: lots with a germination > 0 for the year}
+        """
+        if year not in self._germ_lots:
+            self._germ_lots[year] = dict(
+                Germination.objects.filter(for_year=year, germination_rate__gt=0)
+                .values('lot__variety_id')
+                .annotate(lots=Count('lot', distinct=True))
+                .order_by()
+                .values_list('lot__variety_id', 'lots')
+            )
+        return self._germ_lots[year]
+
+    @cached_property
+    def latest_sales_year(self):
+        return Sales.objects.aggregate(max_year=Max('year'))['max_year']
+
+
+def low_label_print_report(year, threshold, context=None):
+    """
+    Pkt products with at most `threshold` labels printed for the year whose variety has
+    lots with a germination > 0 for the year, fewest printed first.
+    """
+    context = context or ReportContext()
+    printed, germ_lots = context.printed(year), context.germ_lots(year)
+
+    results = []
+    for product in context.pkt_products:
+        total_printed = printed.get(product.id) or 0
+        lot_count = germ_lots.get(product.variety_id, 0)
+        if total_printed <= threshold and lot_count > 0:
+            results.append({
+                'sku_prefix': product.variety.sku_prefix,
+                'variety_name': product.variety.var_name or '--',
+                'pkg_size': product.pkg_size or '--',
+                'total_printed': total_printed,
+                'lot_count': lot_count
+            })
+
+    results.sort(key=lambda item: item['total_printed'])
+    return results
+
+
+def below_sales_percentage_report(year, threshold_pct, sales_year=None, context=None):
+    """
+    Pkt products with labels printed for the year, but fewer than threshold_pct % of what
+    they sold in sales_year (default: the latest Sales year), lowest percentage first.
+    Returns (sales_year, results); sales_year is None when there is no sales data.
+    """
+    context = context or ReportContext()
+    if sales_year is None:
+        sales_year = context.latest_sales_year
+        if not sales_year:
+            return None, []
+
+    printed, sales, germ_lots = context.printed(year), context.sales(sales_year), context.germ_lots(year)
+
+    results = []
+    for product in context.pkt_products:
+        total_printed = printed.get(product.id) or 0
+        prev_year_sales = sales.get(product.id) or 0
+        if total_printed <= 0 or prev_year_sales <= 0:
+            continue
+
+        threshold_qty = (threshold_pct / 100) * prev_year_sales
+        if total_printed < threshold_qty:
+            results.append({
+                'sku_prefix': product.variety.sku_prefix,
+                'variety_name': product.variety.var_name or '--',
+                'pkg_size': product.pkg_size or '--',
+                'total_printed': total_printed,
+                'prev_year_sales': prev_year_sales,
+                'percentage': (total_printed / prev_year_sales) * 100,
+                'threshold_qty': int(threshold_qty),
+                'lot_count': germ_lots.get(product.variety_id, 0)
+            })
+
+    results.sort(key=lambda item: item['percentage'])
+    return sales_year, results
+
+
+def low_label_prints(context, year):
+    """
+    Pkt products with 30 or fewer labels printed whose variety has germinated lots
+    """
+    return low_label_print_report(year, 30, context)
+
+
+def below_sales_percentage(context, year):
+    """
+    Pkt products printed below 50% of the latest Sales year
+    """
+    return below_sales_percentage_report(year, 50, context=context)[1]
+
+
+def varieties_without_photo(context, year):
+    """
+    Varieties with a NULL or empty photo_path
+    """
+    return [
+        {'sku_prefix': variety.sku_prefix, 'var_name': variety.var_name or '--',
+         'photo_path': "NULL" if variety.photo_path is None else "empty string"}
+        for variety in context.varieties if not variety.photo_path
+    ]
+
+
+MISSING_PRODUCT_FIELDS = ['rack_location', 'lineitem_name', 'pkg_size', 'sku_suffix', 'env_type']
+
+
+def missing_product_attributes(context, year):
+    """
+    Products missing a rack location, line item name, pkg size, SKU suffix or envelope type
+    """
+    products = sorted(context.products, key=lambda product: ((product.variety.var_name or '') if product.variety else '', product.sku_suffix or ''))
+    return [
+        {'field': field, 'variety': product.variety.var_name if product.variety else "(no variety)",
+         'sku_suffix': product.sku_suffix or "(no SKU)"}
+        for field in MISSING_PRODUCT_FIELDS
+        for product in products if not getattr(product, field)
+    ]
+
+
+def pkt_print_back_mismatch(context, year):
+    """
+    Pkt products with print_back=True but an env_type other than Herb/Veg/Flower
+    """
+    return [
+        {'sku_prefix': product.variety.sku_prefix, 'sku_suffix': product.sku_suffix,
+         'env_type': product.env_type or '--', 'lineitem_name': product.lineitem_name or '--'}
+        for product in context.pkt_products
+        if product.print_back and product.env_type not in ('Herb', 'Veg', 'Flower')
+    ]
+
+
+def bullets_in_pkg_size(context, year):
+    """
+    Products with a bullet (•) in pkg_size and what it would be without it
+    """
+    return [
+        {'sku_prefix': product.variety.sku_prefix if product.variety else '--', 'sku_suffix': product.sku_suffix or '--',
+         'pkg_size': product.pkg_size, 'fixed_pkg_size': product.pkg_size.replace("•", "").strip()}
+        for product in context.products if product.pkg_size and "•" in product.pkg_size
+    ]
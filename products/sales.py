@@ -0,0 +1,291 @@
+"""
+Year totals for the Sales / MiscSales tables.
+
+- collect_*: set-based GROUP BY totals from the order tables (online OOIncludes / OOIncludesMisc
+  by order date, fulfilled wholesale SOIncludes by order year)
+- upsert_*: bring one year of Sales / MiscSales in line with a {key: quantity} dict with a
+  constant number of queries (read the year once, then bulk create / update / delete).
+  Re-running with the same totals changes nothing. Duplicate rows for a key are removed;
+  rows with no total this year are only removed with prune.
+- read_sales_csv: resolve a SKU,QTY sales export against preloaded product / misc SKU maps
+  (the import_sales command upserts the result)
+- refresh_product_sales / rebuild_product_sales: keep the ProductSalesYear rollup
+  (product, year, channel -> qty, revenue) in line with the order tables.
+
+Online years are filtered as a date range rather than order__date__year, so the
+order date index can be used.
+"""
+import csv
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import DecimalField, F, Sum
+from django.utils import timezone
+
+from orders.models import OnlineOrder, OOIncludes, OOIncludesMisc
+from products.models import MiscProduct, MiscSales, Product, ProductSalesYear, Sales
+from uprising.utils.cache import invalidate
+
+# SKU prefixes of products imported into MiscSales
+MISC_PRODUCT_PREFIXES = ["TOO", "BEA-MF", "GIF", "TOM-CH-pkts", "gift", "SFA", "MER", "SGB", "PEA-SP-pkts"]
+
+
+def online_year_range(year):
+    """
+    (start, end) datetimes of 20YY for filtering online order dates
+    """
+    year = 2000 + int(year) % 100
+    return timezone.make_aware(datetime(year, 1, 1)), timezone.make_aware(datetime(year + 1, 1, 1))
+
+
+def _online_lines(model, year):
+    start, end = online_year_range(year)
+    return model.objects.filter(order__date__gte=start, order__date__lt=end)
+
+
+def _wholesale_lines(year):
+    from stores.models import SOIncludes
+
+    return SOIncludes.objects.filter(store_order__order_year=int(year) % 100, store_order__fulfilled_date__isnull=False)
+
+
+def collect_retail_sales(year):
+    """
+    {product_id: qty} sold online in 20YY
+    """
+    return dict(
+        _online_lines(OOIncludes, year)
+        .values('product_id')
+        .annotate(total=Sum('qty'))
+        .order_by()
+        .values_list('product_id', 'total')
+    )
+
+
+def collect_wholesale_sales(year):
+    """
+    {product_id: qty} on fulfilled store orders of order year YY
+    """
+    return dict(
+        _wholesale_lines(year)
+        .values('product_id')
+        .annotate(total=Sum('quantity'))
+        .order_by()
+        .values_list('product_id', 'total')
+    )
+
+
+def collect_misc_sales(year):
+    """
+    Returns ({misc_product_id: qty}, {unknown sku: qty}) for online misc lines in 20YY
+    """
+    by_sku = dict(
+        _online_lines(OOIncludesMisc, year)
+        .values('sku')
+        .annotate(total=Sum('qty'))
+        .order_by()
+        .values_list('sku', 'total')
+    )
+    product_ids = dict(MiscProduct.objects.filter(sku__in=list(by_sku)).values_list('sku', 'id'))
+
+    totals, unknown = {}, {}
+    for sku, qty in by_sku.items():
+        if sku in product_ids:
+            totals[product_ids[sku]] = qty
+        else:
+            unknown[sku] = qty
+    return totals, unknown
+
+
+def _upsert(model, rows, key, make, totals, dry_run, prune):
+    """
+    rows: the year's existing rows; key(row) -> totals key; make(key, qty) -> unsaved row
+    Returns {created: [(key, qty)], updated: [(key, old, new)], unchanged: n,
+             stale: [(key, qty)] rows not in the totals, duplicates: n extra rows for a key}
+    """
+    result = {'created': [], 'updated': [], 'unchanged': 0, 'stale': [], 'duplicates': 0}
+    existing, extras = {}, []
+    for row in rows:
+        if key(row) in existing:
+            extras.append(row)
+        else:
+            existing[key(row)] = row
+    result['duplicates'] = len(extras)
+
+    to_create, to_update = [], []
+    for row_key, qty in totals.items():
+        row = existing.pop(row_key, None)
+        if row is None:
+            result['created'].append((row_key, qty))
+            to_create.append(make(row_key, qty))
+        elif row.quantity != qty:
+            result['updated'].append((row_key, row.quantity, qty))
+            row.quantity = qty
+            to_update.append(row)
+        else:
+            result['unchanged'] += 1
+    result['stale'] = [(row_key, row.quantity) for row_key, row in existing.items()]
+
+    if not dry_run:
+        to_delete = [row.pk for row in extras] + ([row.pk for row in existing.values()] if prune else [])
+        with transaction.atomic():
+            if to_delete:
+                model.objects.filter(pk__in=to_delete).delete()
+            if to_update:
+                model.objects.bulk_update(to_update, ['quantity'], batch_size=1000)
+            if to_create:
+                model.objects.bulk_create(to_create, batch_size=1000)
+            invalidate('sales')
+
+    return result
+
+
+def upsert_sales(year, totals, dry_run=False, prune=False, wholesale=None):
+    """
+    totals: {(product_id, wholesale): qty} for one (2-digit) year.
+    With wholesale=True/False only that channel's rows are compared (and pruned).
+    """
+    rows = Sales.objects.filter(year=year)
+    if wholesale is not None:
+        rows = rows.filter(wholesale=wholesale)
+    return _upsert(
+        Sales,
+        rows.order_by('id'),
+        lambda row: (row.product_id, row.wholesale),
+        lambda row_key, qty: Sales(product_id=row_key[0], wholesale=row_key[1], quantity=qty, year=year),
+        totals, dry_run, prune
+    )
+
+
+def upsert_misc_sales(year, totals, dry_run=False, prune=False):
+    """
+    totals: {misc_product_id: qty} for one (2-digit) year
+    """
+    return _upsert(
+        MiscSales,
+        MiscSales.objects.filter(year=year).order_by('id'),
+        lambda row: row.product_id,
+        lambda product_id, qty: MiscSales(product_id=product_id, quantity=qty, year=year),
+        totals, dry_run, prune
+    )
+
+
+def read_sales_csv(lines, wholesale=False):
+    """
+    Read a SKU,QTY sales export (e.g. sales_2025.csv) into
+    ({(product_id, wholesale): qty}, {misc_product_id: qty}, zero_rows, problems [(row number, message)]).
+    Product and misc SKUs are resolved from maps loaded once; a SKU listed twice keeps its last quantity.
+    SKUs starting with one of MISC_PRODUCT_PREFIXES go to MiscSales, everything else is
+    XXX-XX-suffix (sku_prefix XXX-XX) for Sales.
+    """
+    product_ids = {
+        (sku_prefix, sku_suffix): product_id
+        for sku_prefix, sku_suffix, product_id in Product.objects.values_list('variety_id', 'sku_suffix', 'id')
+    }
+    misc_ids = dict(MiscProduct.objects.values_list('sku', 'id'))
+
+    totals, misc_totals, problems = {}, {}, []
+    zero_rows = 0
+    for row_num, row in enumerate(csv.DictReader(lines), start=2):  # row 1 is the header
+        sku = (row.get("SKU") or "").strip()
+        qty_str = (row.get("QTY") or "").strip()
+        if not sku or not qty_str:
+            problems.append((row_num, f"missing required fields: {row}"))
+            continue
+        try:
+            qty = int(qty_str)
+        except ValueError:
+            problems.append((row_num, f"invalid quantity '{qty_str}' for {sku}"))
+            continue
+        if qty == 0:
+            zero_rows += 1
+            continue
+
+        if any(sku.startswith(prefix) for prefix in MISC_PRODUCT_PREFIXES):
+            if sku not in misc_ids:
+                problems.append((row_num, f"misc product not found for SKU '{sku}'"))
+                continue
+            misc_totals[misc_ids[sku]] = qty
+        else:
+            sku_parts = sku.split("-")
+            if len(sku_parts) < 3:
+                problems.append((row_num, f"invalid SKU format '{sku}' (expected XXX-XX-suffix)"))
+                continue
+            key = ("-".join(sku_parts[:2]), "-".join(sku_parts[2:]))
+            if key not in product_ids:
+                problems.append((row_num, f"product not found for SKU '{sku}'"))
+                continue
+            totals[(product_ids[key], wholesale)] = qty
+
+    return totals, misc_totals, zero_rows, problems
+
+
+def _channel_lines(year, channel):
+    """
+    (order lines, quantity field) counted for a channel/year
+    """
+    if channel == ProductSalesYear.ONLINE:
+        return _online_lines(OOIncludes, year), 'qty'
+    return _wholesale_lines(year), 'quantity'
+
+
+def refresh_product_sales(year, channel, product_ids=None):
+    """
+    Recompute the ProductSalesYear rows for one year/channel (optionally only some products)
+    from the order lines: one GROUP BY, one delete, one insert. The rows are replaced rather
+    than upserted because MySQL can't target the unique fields of an upsert.
+    """
+    if year is None:
+        return
+    year = int(year) % 100
+
+    lines, qty_field = _channel_lines(year, channel)
+    existing = ProductSalesYear.objects.filter(year=year, channel=channel)
+    if product_ids is not None:
+        product_ids = list(set(product_ids))
+        lines = lines.filter(product_id__in=product_ids)
+        existing = existing.filter(product_id__in=product_ids)
+
+    money = DecimalField(max_digits=12, decimal_places=2)
+    rows = [
+        ProductSalesYear(product_id=product_id, year=year, channel=channel, qty=qty or 0, revenue=revenue or 0)
+        for product_id, qty, revenue in lines.values('product_id')
+        .annotate(total=Sum(qty_field), revenue=Sum(F(qty_field) * F('price'), output_field=money))
+        .order_by()
+        .values_list('product_id', 'total', 'revenue')
+    ]
+
+    with transaction.atomic():
+        existing.delete()
+        ProductSalesYear.objects.bulk_create(rows, batch_size=1000)
+        invalidate('sales')
+
+    return len(rows)
+
+
+def sales_years():
+    """
+    2-digit years that have online orders or store orders
+    """
+    from stores.models import StoreOrder
+
+    years = {date.year % 100 for date in OnlineOrder.objects.dates('date', 'year')}
+    years.update(StoreOrder.objects.filter(order_year__isnull=False).values_list('order_year', flat=True).distinct())
+    return sorted(years)
+
+
+def rebuild_product_sales(years=None):
+    """
+    Recompute ProductSalesYear for the given 2-digit years (default: every year with orders,
+    dropping rows for any other year). Returns the number of rows written.
+    """
+    with transaction.atomic():
+        if years is None:
+            years = sales_years()
+            ProductSalesYear.objects.exclude(year__in=years).delete()
+
+        count = 0
+        for year in years:
+            for channel in (ProductSalesYear.ONLINE, ProductSalesYear.WHOLESALE):
+                count += refresh_product_sales(year, channel)
+    return count
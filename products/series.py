@@ -0,0 +1,231 @@
+"""
+Pre-binned sales time series for the analytics charts.
+
+sales_series buckets packets and revenue by day, week or month with DB-side date truncation
+(online order lines by order date, wholesale from the StoreSalesDaily rollup by fulfilled day),
+optionally split per variety category or crop, and returns parallel arrays aligned to one list
+of bins. Comparison years re-run the same range shifted back a whole number of years (52
+weeks per year for weekly bins), so series from different years line up by bin index.
+
+sales_matrix is the year x SKU x channel quantity matrix of a variety, crop or group from the
+Sales table, built from one grouped query.
+"""
+from datetime import date, datetime, timedelta
+
+from django.db.models import DateField, DecimalField, F, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from orders.models import OOIncludes
+from products.models import ProductSalesYear, Sales, Variety
+from uprising.utils.cache import versioned_cache
+
+SERIES_BINS = ('day', 'week', 'month')
+SERIES_CHANNELS = (ProductSalesYear.ONLINE, ProductSalesYear.WHOLESALE)
+SERIES_GROUPS = {
+    None: None,
+    'category': 'product__variety__category',
+    'crop': 'product__variety__crop',
+}
+MAX_BINS = 1000
+MAX_COMPARE_YEARS = 5
+MATRIX_SELECTORS = {
+    'variety': 'sku_prefix',
+    'crop': 'crop',
+    'group': 'group',
+}
+MAX_MATRIX_YEARS = 10
+
+
+def bin_start(day, unit):
+    """
+    First day of the day/week (Monday)/month bin containing day
+    """
+    if unit == 'week':
+        return day - timedelta(days=day.weekday())
+    if unit == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def bin_dates(start, end, unit):
+    """
+    Start dates of every bin touching start..end (inclusive)
+    """
+    bins = []
+    current = bin_start(start, unit)
+    while current <= end:
+        bins.append(current)
+        if unit == 'month':
+            current = date(current.year + current.month // 12, current.month % 12 + 1, 1)
+        else:
+            current += timedelta(days=7 if unit == 'week' else 1)
+    return bins
+
+
+def shift_years(day, years, unit='day'):
+    """
+    day moved back a number of years (Feb 29 becomes Feb 28). Weekly series move back
+    52 weeks per year instead, so the comparison weeks start on the same weekday.
+    """
+    if unit == 'week':
+        return day - timedelta(weeks=52 * years)
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        return day.replace(year=day.year - years, day=28)
+
+
+def _online_rows(start, end, unit):
+    start_dt = timezone.make_aware(datetime.combine(start, datetime.min.time()))
+    end_dt = timezone.make_aware(datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    money = DecimalField(max_digits=12, decimal_places=2)
+    return (
+        OOIncludes.objects.filter(order__date__gte=start_dt, order__date__lt=end_dt),
+        Trunc('order__date', unit, output_field=DateField()),
+        Sum('qty'),
+        Sum(F('qty') * F('price'), output_field=money),
+    )
+
+
+def _wholesale_rows(start, end, unit):
+    from stores.models import StoreSalesDaily
+
+    return (
+        StoreSalesDaily.objects.filter(date__gte=start, date__lte=end),
+        Trunc('date', unit, output_field=DateField()),
+        Sum('packets'),
+        Sum('sales'),
+    )
+
+
+def _binned(channel, start, end, unit, group_field):
+    """
+    {(group, bin date): (packets, revenue)} for one channel and date range (one GROUP BY)
+    """
+    source = _online_rows if channel == ProductSalesYear.ONLINE else _wholesale_rows
+    lines, bucket, packets, revenue = source(start, end, unit)
+
+    fields = ['bucket'] + ([group_field] if group_field else [])
+    rows = (
+        lines.annotate(bucket=bucket)
+        .values(*fields)
+        .annotate(packets=packets, revenue=revenue)
+        .order_by()
+        .values_list(*fields, 'packets', 'revenue')
+    )
+
+    binned = {}
+    for row in rows:
+        if group_field:
+            bucket_date, group, total, money = row
+        else:
+            (bucket_date, total, money), group = row, None
+        binned[(group, bucket_date)] = (total or 0, money or 0)
+    return binned
+
+
+@versioned_cache('online_orders', 'store_orders', 'products')
+def sales_series(start, end, unit='week', channels=SERIES_CHANNELS, group=None, compare=0):
+    """
+    Packets and revenue per bin for start..end (dates, inclusive), one series per
+    (year, channel, group), plus the same range in each of the `compare` previous years.
+    Returns {'bin', 'group', 'bins': [iso dates], 'series': [{'year', 'channel', 'group',
+    'packets': [...], 'revenue': [...]}]} with every array the length of 'bins'.
+    Raises ValueError for an invalid bin/channel/group/range.
+    """
+    if unit not in SERIES_BINS:
+        raise ValueError(f"Invalid bin: {unit}")
+    if group not in SERIES_GROUPS:
+        raise ValueError(f"Invalid group: {group}")
+    for channel in channels:
+        if channel not in SERIES_CHANNELS:
+            raise ValueError(f"Invalid channel: {channel}")
+    if end < start:
+        raise ValueError("End date is before start date")
+    if not 0 <= compare <= MAX_COMPARE_YEARS:
+        raise ValueError(f"Compare must be between 0 and {MAX_COMPARE_YEARS} years")
+
+    bins = bin_dates(start, end, unit)
+    if len(bins) > MAX_BINS:
+        raise ValueError(f"Too many {unit} bins ({len(bins)}), use a shorter range or a larger bin")
+
+    group_field = SERIES_GROUPS[group]
+    series = []
+    for years_back in range(compare + 1):
+        range_start, range_end = shift_years(start, years_back, unit), shift_years(end, years_back, unit)
+        positions = {day: i for i, day in enumerate(bin_dates(range_start, range_end, unit)[:len(bins)])}
+
+        for channel in channels:
+            by_group = {}
+            for (group_name, bucket_date), (packets, revenue) in _binned(channel, range_start, range_end, unit, group_field).items():
+                if bucket_date not in positions:
+                    continue
+                arrays = by_group.setdefault(group_name, ([0] * len(bins), [0.0] * len(bins)))
+                arrays[0][positions[bucket_date]] += packets
+                arrays[1][positions[bucket_date]] += float(revenue)
+
+            if not by_group and not group_field:
+                by_group[None] = ([0] * len(bins), [0.0] * len(bins))
+
+            for group_name in sorted(by_group, key=lambda name: (name is None, name or '')):
+                packets, revenue = by_group[group_name]
+                series.append({
+                    'year': range_start.year,
+                    'channel': channel,
+                    'group': group_name,
+                    'packets': packets,
+                    'revenue': [round(value, 2) for value in revenue],
+                })
+
+    return {
+        'bin': unit,
+        'group': group,
+        'bins': [day.isoformat() for day in bins],
+        'series': series,
+    }
+
+
+@versioned_cache('sales', 'products')
+def sales_matrix(selector, value, years=5):
+    """
+    Sales quantities of the varieties matching selector ('variety', 'crop' or 'group') = value
+    for the latest Sales year and the years - 1 before it.
+    Returns {'years': [2-digit, oldest first], 'skus': [...], 'channels': ['online', 'wholesale'],
+    'qty': [year][sku][channel]}, or None if no variety matches.
+    """
+    if selector not in MATRIX_SELECTORS:
+        raise ValueError(f"Invalid selector: {selector}")
+    if not 1 <= years <= MAX_MATRIX_YEARS:
+        raise ValueError(f"Years must be between 1 and {MAX_MATRIX_YEARS}")
+
+    variety_filter = {MATRIX_SELECTORS[selector]: value}
+    rows = list(
+        Sales.objects.filter(**{f"product__variety__{field}": match for field, match in variety_filter.items()})
+        .values('year', 'product__variety__sku_prefix', 'product__sku_suffix', 'wholesale')
+        .annotate(total=Sum('quantity'))
+        .order_by()
+        .values_list('year', 'product__variety__sku_prefix', 'product__sku_suffix', 'wholesale', 'total')
+    )
+    if not rows and not Variety.objects.filter(**variety_filter).exists():
+        return None
+
+    latest_year = max((row[0] for row in rows), default=None)
+    matrix_years = list(range(latest_year - years + 1, latest_year + 1)) if latest_year else []
+    rows = [row for row in rows if row[0] in matrix_years]
+
+    skus = sorted({f"{prefix}-{suffix}" if suffix else prefix for _, prefix, suffix, _, _ in rows})
+    year_index = {year: i for i, year in enumerate(matrix_years)}
+    sku_index = {sku: i for i, sku in enumerate(skus)}
+
+    qty = [[[0, 0] for _ in skus] for _ in matrix_years]
+    for year, prefix, suffix, wholesale, total in rows:
+        sku = f"{prefix}-{suffix}" if suffix else prefix
+        qty[year_index[year]][sku_index[sku]][int(wholesale)] += total or 0
+
+    return {
+        'years': matrix_years,
+        'skus': skus,
+        'channels': [ProductSalesYear.ONLINE, ProductSalesYear.WHOLESALE],
+        'qty': qty,
+    }
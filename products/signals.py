@@ -0,0 +1,27 @@
+from django.apps import apps
+from django.db.models.signals import post_save, post_delete
+
+from uprising.utils.cache import DOMAIN_MODELS, invalidate
+
+
+def _domain_receiver(domain):
+    def data_changed(sender, **kwargs):
+        invalidate(domain)
+    return data_changed
+
+
+def connect_cache_domains():
+    """
+    Bump a domain's cache version whenever one of its models is saved or deleted
+    """
+    for domain, labels in DOMAIN_MODELS.items():
+        receiver = _domain_receiver(domain)
+        for label in labels:
+            if '.' in label:
+                models = [apps.get_model(label)]
+            else:
+                models = apps.get_app_config(label).get_models()
+
+            for model in models:
+                for signal in (post_save, post_delete):
+                    signal.connect(receiver, sender=model, weak=False, dispatch_uid=f"cache_domain:{domain}:{model._meta.label}:{signal is post_save}")
@@ -0,0 +1,159 @@
+import logging
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+from products.models import InventorySnapshot
+
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_COLUMNS = ['sku', 'title', 'tracker', 'qty']
+
+
+def frame_from_shopify_df(df):
+    """
+    Normalize a raw Shopify export (read with dtype=str) into the snapshot columns.
+    Titles are forward-filled and the last row wins for a repeated SKU, same as the pre-opening parser.
+    """
+    frame = pd.DataFrame({
+        'sku': df["Variant SKU"].str.strip(),
+        'title': df["Title"].ffill() if "Title" in df else "",
+        'tracker': df["Variant Inventory Tracker"],
+        'qty': pd.to_numeric(df["Variant Inventory Qty"], errors="coerce"),
+    })
+    frame = frame[frame['sku'].notna() & (frame['sku'] != "")]
+    return frame.drop_duplicates('sku', keep='last')
+
+
+def frame_from_csv_products(csv_products):
+    """
+    Normalize the {sku: {title, tracker, qty}} dict built by products.reports.read_shopify_export
+    """
+    return pd.DataFrame({
+        'sku': list(csv_products),
+        'title': [data['title'] for data in csv_products.values()],
+        'tracker': [data['tracker'] for data in csv_products.values()],
+        'qty': [data['qty'] for data in csv_products.values()],
+    })
+
+
+def save_inventory_snapshot(frame, source, original_name=None, user=None):
+    """
+    Write the SKU-keyed columns to a compressed .npz file and record it in InventorySnapshot.
+    """
+    frame = frame.sort_values('sku')
+    sku = frame['sku'].astype(str).to_numpy(dtype=str)
+    title = frame['title'].fillna("").astype(str).str.strip().to_numpy(dtype=str)
+    tracker = frame['tracker'].fillna("").astype(str).str.strip().to_numpy(dtype=str)
+    qty = frame['qty'].fillna(0).astype(np.int64).to_numpy()
+
+    uploaded_at = timezone.now()
+    file_name = f"{source}_{uploaded_at:%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:8]}.npz"
+    os.makedirs(settings.INVENTORY_SNAPSHOT_DIR, exist_ok=True)
+    np.savez_compressed(
+        os.path.join(settings.INVENTORY_SNAPSHOT_DIR, file_name),
+        sku=sku, title=title, tracker=tracker, qty=qty,
+    )
+
+    return InventorySnapshot.objects.create(
+        source=source,
+        file_name=file_name,
+        original_name=original_name,
+        uploaded_at=uploaded_at,
+        uploaded_by=user if user is not None and user.is_authenticated else None,
+        sku_count=len(sku),
+        tracked_qty=int(qty[np.char.lower(tracker) == 'shopify'].sum()),
+    )
+
+
+def try_save_inventory_snapshot(frame, source, original_name=None, user=None):
+    """
+    Save a snapshot without letting a disk/DB problem break the upload that produced it
+    """
+    try:
+        return save_inventory_snapshot(frame, source, original_name, user)
+    except (OSError, DatabaseError):
+        logger.exception("Could not save %s inventory snapshot", source)
+        return None
+
+
+def prune_inventory_snapshots(keep, dry_run=False):
+    """
+    Delete every snapshot but the `keep` newest, with their files, plus any .npz file in
+    the snapshot dir that no snapshot points to (left behind when the row failed to save).
+    Returns (snapshots deleted, files deleted).
+    """
+    old = list(InventorySnapshot.objects.order_by('-uploaded_at', '-id').values_list('id', 'file_name')[keep:])
+    kept = set(InventorySnapshot.objects.exclude(pk__in=[pk for pk, file_name in old]).values_list('file_name', flat=True))
+
+    try:
+        files = [name for name in os.listdir(settings.INVENTORY_SNAPSHOT_DIR) if name.endswith('.npz')]
+    except FileNotFoundError:
+        files = []
+    stale = [name for name in files if name not in kept]
+
+    if not dry_run:
+        InventorySnapshot.objects.filter(pk__in=[pk for pk, file_name in old]).delete()
+        for name in stale:
+            try:
+                os.remove(os.path.join(settings.INVENTORY_SNAPSHOT_DIR, name))
+            except FileNotFoundError:
+                pass
+
+    return len(old), len(stale)
+
+
+def load_inventory_snapshot(snapshot):
+    """
+    Load a snapshot back into a DataFrame indexed by sku
+    """
+    with np.load(os.path.join(settings.INVENTORY_SNAPSHOT_DIR, snapshot.file_name)) as data:
+        frame = pd.DataFrame({column: data[column] for column in SNAPSHOT_COLUMNS})
+    return frame.set_index('sku')
+
+
+def compute_snapshot_delta(older, newer, tracked_only=True):
+    """
+    Per-SKU change between two snapshots.
+    - delta: qty_to - qty_from
+    - sold: units that went out (restocks count as 0 sold)
+    - velocity: sold per day between the two uploads
+    - sell_through: sold / qty_from
+    - days_of_stock: qty_to at the current velocity
+    Returns (DataFrame indexed by sku with the fastest sellers first, days between the uploads)
+    """
+    before = load_inventory_snapshot(older)
+    after = load_inventory_snapshot(newer)
+
+    joined = before[['qty', 'tracker']].join(
+        after[['title', 'qty', 'tracker']], how='outer', lsuffix='_from', rsuffix='_to'
+    )
+    joined['title'] = joined['title'].fillna(before['title'].reindex(joined.index))
+    joined['tracker'] = joined['tracker_to'].fillna(joined['tracker_from']).fillna("")
+    joined = joined.drop(columns=['tracker_from', 'tracker_to'])
+
+    if tracked_only:
+        joined = joined[joined['tracker'].str.lower() == 'shopify']
+
+    days = max((newer.uploaded_at - older.uploaded_at).total_seconds() / 86400, 1 / 24)
+    qty_from = joined['qty_from'].fillna(0)
+    qty_to = joined['qty_to'].fillna(0)
+
+    joined['delta'] = qty_to - qty_from
+    joined['sold'] = (qty_from - qty_to).clip(lower=0)
+    joined['velocity'] = (joined['sold'] / days).round(2)
+    joined['sell_through'] = (joined['sold'] / qty_from.where(qty_from > 0)).round(3)
+    joined['days_of_stock'] = (qty_to / joined['velocity'].where(joined['velocity'] > 0)).round(1)
+    joined.index.name = 'sku'
+
+    for column in ['qty_from', 'qty_to', 'delta', 'sold']:
+        joined[column] = joined[column].astype('Int64')
+    joined = joined[['title', 'tracker', 'qty_from', 'qty_to', 'delta', 'sold', 'velocity', 'sell_through', 'days_of_stock']]
+
+    return joined.sort_values(['velocity', 'delta'], ascending=[False, True]), days
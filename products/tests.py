@@ -1,3 +1,633 @@
-from django.test import TestCase
+import json
+import os
+import random
+import tempfile
+from datetime import date, timedelta, datetime
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import pandas as pd
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models.deletion import Collector
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from lots.models import Lot, Germination
+from orders.models import OOIncludes, OOIncludesMisc, OnlineOrder
+from products.envelopes import envelope_forecast, envelope_report
+from products.models import InventorySnapshot, MiscProduct, Product, Variety, MiscSales, Sales, LabelPrint, MiscEnvelopeMap, ProductSalesYear
+from products.reports import build_pre_opening_report, read_shopify_export, below_sales_percentage_report, low_label_print_report
+from products.sales import rebuild_product_sales, refresh_product_sales
+from products.series import sales_series, sales_matrix
+from products.snapshots import save_inventory_snapshot, try_save_inventory_snapshot
+from products.views import find_bulk_splits, match_export_rows
+from stores.models import SOIncludes, Store, StoreOrder, StoreSalesDaily
+from stores.order_lines import resolve_order_products, sync_order_lines
+
+
+class ShopifyInventoryMatchTests(TestCase):
+    """
+    The vectorized helpers against the per-row loops they replaced
+    """
+
+    def loop_match(self, export_skus, product_skus):
+        # old: df[df["Variant SKU"].str.startswith(sku, na=False)], first row
+        return [
+            next((row for row, export_sku in enumerate(export_skus) if isinstance(export_sku, str) and export_sku.startswith(sku)), -1)
+            for sku in product_skus
+        ]
+
+    def loop_splits(self, bulk):
+        # old: per prefix group, a zero with stock in a later size
+        splits = []
+        for prefix, group in bulk.groupby("prefix", sort=False):
+            qtys = group["Variant Inventory Qty"].tolist()
+            if any(q == 0 and any(later > 0 for later in qtys[i + 1:]) for i, q in enumerate(qtys[:-1])):
+                splits.append(prefix)
+        return splits
+
+    def test_match_export_rows_matches_loop(self):
+        export_skus = ["BEA-T0-1oz", None, "BEA-T0-1lb", "BEA-T0-1oz", "BEA-T0-1ozX", "BEA-T1-pkt", "", "BEA-T0-pkt"]
+        product_skus = ["BEA-T0-1oz", "BEA-T0-1lb", "BEA-T0-1", "BEA-T1-pkt", "BEA-T2-pkt", "BEA-T0-pkt", "BEA"]
+        self.assertEqual(list(match_export_rows(export_skus, product_skus)), self.loop_match(export_skus, product_skus))
+
+        rng = random.Random(0)
+        sizes = ["pkt", "1oz", "4oz", "1lb", "5lb", "1oz-b"]
+        export_skus = [
+            None if rng.random() < 0.05 else f"{rng.choice('ABC')}{rng.choice('ABC')}-T{rng.randint(0, 9)}-{rng.choice(sizes)}"
+            for _ in range(500)
+        ]
+        product_skus = [f"{a}{b}-T{n}-{size}" for a in "ABC" for b in "ABC" for n in range(10) for size in sizes[:5]]
+        self.assertEqual(list(match_export_rows(export_skus, product_skus)), self.loop_match(export_skus, product_skus))
+        self.assertEqual(list(match_export_rows(export_skus, [])), [])
+
+    def test_find_bulk_splits_matches_loop(self):
+        rng = random.Random(1)
+        rows = [(f"BEA-T{rng.randint(0, 30)}", rng.choice([0, 0, 1, 5])) for _ in range(400)]
+        bulk = pd.DataFrame(rows, columns=["prefix", "Variant Inventory Qty"])
+        self.assertEqual(find_bulk_splits(bulk), self.loop_splits(bulk))
+
+        bulk = pd.DataFrame(
+            [("CAR-T0", 0), ("CAR-T0", 3), ("BEE-T0", 3), ("BEE-T0", 0), ("PEA-T0", 0), ("ONI-T0", 0), ("ONI-T0", 0), ("ONI-T0", 2)],
+            columns=["prefix", "Variant Inventory Qty"]
+        )
+        self.assertEqual(find_bulk_splits(bulk), ["CAR-T0", "ONI-T0"])
+        self.assertEqual(find_bulk_splits(bulk), self.loop_splits(bulk))
+
+
+class InventorySnapshotTests(TestCase):
+
+    def setUp(self):
+        self.snapshot_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.snapshot_dir.cleanup)
+        settings_override = override_settings(INVENTORY_SNAPSHOT_DIR=self.snapshot_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        user = User.objects.create_user(username="office", password="pw")
+        user.groups.create(name="employees")
+        self.client.force_login(user)
+
+        self.older = self.snapshot({'BEA-T0-pkt': 10, 'CAR-T0-pkt': 4, 'TOO-1': 7})
+        self.newer = self.snapshot({'BEA-T0-pkt': 4, 'CAR-T0-pkt': 4, 'TOO-1': 2})
+        self.older.uploaded_at = self.newer.uploaded_at - timedelta(days=2)
+        self.older.save()
+
+    def snapshot_frame(self, quantities):
+        return pd.DataFrame({
+            'sku': list(quantities),
+            'title': [sku[:3] for sku in quantities],
+            'tracker': ["" if sku.startswith("TOO") else "shopify" for sku in quantities],
+            'qty': list(quantities.values()),
+        })
+
+    def snapshot(self, quantities):
+        return save_inventory_snapshot(self.snapshot_frame(quantities), "shopify_inventory", "export.csv")
+
+    def test_list_newest_first(self):
+        response = self.client.get("/products/inventory-snapshots/", {'limit': 1})
+        self.assertEqual([snapshot['id'] for snapshot in response.json()['snapshots']], [self.newer.id])
+        self.assertEqual(response.json()['snapshots'][0]['tracked_qty'], 8)
+
+        for limit in ("ten", "0"):
+            response = self.client.get("/products/inventory-snapshots/", {'limit': limit})
+            self.assertEqual(response.status_code, 400)
+
+    def test_delta_between_latest_snapshots(self):
+        response = self.client.get("/products/inventory-snapshots/delta/")
+        data = response.json()
+        self.assertEqual(data['days'], 2)
+        self.assertEqual(
+            [(row['sku'], row['delta'], row['sold'], row['velocity']) for row in data['deltas']],
+            [("BEA-T0-pkt", -6, 6, 3.0), ("CAR-T0-pkt", 0, 0, 0.0)]
+        )
+
+        response = self.client.get("/products/inventory-snapshots/delta/", {'all': '1', 'changed': '1'})
+        self.assertEqual({row['sku'] for row in response.json()['deltas']}, {"BEA-T0-pkt", "TOO-1"})
+
+        InventorySnapshot.objects.filter(pk=self.older.pk).delete()
+        response = self.client.get("/products/inventory-snapshots/delta/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_failed_save_is_logged(self):
+        with mock.patch('products.snapshots.np.savez_compressed', side_effect=OSError("disk full")):
+            with self.assertLogs('products.snapshots', 'ERROR'):
+                self.assertIsNone(try_save_inventory_snapshot(self.snapshot_frame({'BEA-T0-pkt': 1}), "shopify_inventory"))
+
+        with mock.patch('products.snapshots.np.savez_compressed', side_effect=ValueError):
+            with self.assertRaises(ValueError):
+                try_save_inventory_snapshot(self.snapshot_frame({'BEA-T0-pkt': 1}), "shopify_inventory")
+
+    def test_prune_keeps_newest(self):
+        orphan = os.path.join(self.snapshot_dir.name, "orphan.npz")
+        open(orphan, 'wb').close()
+
+        out = StringIO()
+        call_command('prune_inventory_snapshots', '--keep', '1', '--dry-run', stdout=out)
+        self.assertIn("Would delete 1 snapshots and 2 files", out.getvalue())
+        self.assertEqual(InventorySnapshot.objects.count(), 2)
+
+        call_command('prune_inventory_snapshots', '--keep', '1', stdout=StringIO())
+        self.assertEqual(list(InventorySnapshot.objects.all()), [self.newer])
+        self.assertEqual(os.listdir(self.snapshot_dir.name), [self.newer.file_name])
+
+
+PRE_OPENING_EXPORT = """Title,Variant SKU,Variant Inventory Tracker,Variant Inventory Qty
+Bean,BEA-T0-pkt,shopify,0
+,BEA-T0-1oz,shopify,4
+Carrot,CAR-T0-pkt,shopify,5
+Seed Tape,TOO-1,,3
+Mystery,UNK-T0-pkt,shopify,2
+"""
+
+
+class PreOpeningReportTests(TestCase):
+
+    def setUp(self):
+        bean = Variety.objects.create(sku_prefix="BEA-T0", var_name="Bean")
+        carrot = Variety.objects.create(sku_prefix="CAR-T0", var_name="Carrot")
+        for variety, suffix in ((bean, "pkt"), (bean, "1oz"), (carrot, "pkt")):
+            Product.objects.create(variety=variety, sku_suffix=suffix)
+        MiscProduct.objects.create(lineitem_name="Seed Tape", sku="TOO-1")
+        lot = Lot.objects.create(variety=bean, year=25)
+        Germination.objects.create(lot=lot, status="active", germination_rate=90, for_year=26, test_date=date(2026, 1, 5))
+
+    def test_report_sections(self):
+        csv_products = read_shopify_export(StringIO(PRE_OPENING_EXPORT))
+        self.assertEqual(csv_products["BEA-T0-1oz"]['title'], "Bean")
+
+        with self.assertNumQueries(3):
+            report = build_pre_opening_report(csv_products, 26)
+        self.assertEqual([item['sku'] for item in report['products_not_in_db']], ["UNK-T0-pkt"])
+        self.assertEqual(
+            [(item['sku'], item['qty']) for item in report['products_without_germ']],
+            [("CAR-T0-pkt", 5), ("TOO-1", "untracked")]
+        )
+        self.assertEqual(
+            [(item['sku'], item['var_name']) for item in report['varieties_with_germ_but_no_inventory']],
+            [("BEA-T0-pkt", "Bean")]
+        )
+        self.assertEqual(report['summary']['total_csv_products'], 5)
+
+        # another year has no active germination, so the bean packets count as without germ too
+        report = build_pre_opening_report(csv_products, 25)
+        self.assertEqual([item['sku'] for item in report['products_without_germ']], ["BEA-T0-1oz", "CAR-T0-pkt", "TOO-1"])
+        self.assertEqual(report['varieties_with_germ_but_no_inventory'], [])
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as export:
+            export.write(PRE_OPENING_EXPORT)
+        self.addCleanup(os.remove, export.name)
+
+        out = StringIO()
+        call_command('pre_opening_report', export.name, '--year', '26', stdout=out)
+        self.assertEqual(json.loads(out.getvalue()), build_pre_opening_report(read_shopify_export(StringIO(PRE_OPENING_EXPORT)), 26))
+
+        out = StringIO()
+        call_command('pre_opening_report', export.name, '--year', '26', '--format', 'text', stdout=out)
+        self.assertIn("UNK-T0-pkt", out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('pre_opening_report', export.name + ".missing", stdout=StringIO())
+
+
+class AggregateSalesTests(TestCase):
+
+    def setUp(self):
+        self.store = Store.objects.create(store_num=10, store_name="Store 10")
+        varieties = [Variety.objects.create(sku_prefix=f"PEA-T{i}", var_name=f"Pea {i}") for i in range(2)]
+        self.products = [Product.objects.create(variety=variety, sku_suffix="pkt") for variety in varieties]
+        self.misc = MiscProduct.objects.create(lineitem_name="Seed Tape", sku="TAPE-1")
+
+        order = OnlineOrder.objects.create(order_number="1001", customer_name="A", date=timezone.now().replace(year=2026))
+        OOIncludes.objects.create(order=order, product=self.products[0], qty=3, price=Decimal("2.55"))
+        OOIncludesMisc.objects.create(order=order, sku="TAPE-1", qty=2, price=Decimal("4.00"))
+        OOIncludesMisc.objects.create(order=order, sku="GONE-1", qty=1, price=Decimal("4.00"))
+
+        store_order = StoreOrder.objects.create(store=self.store, order_number="W1001-26", fulfilled_date=timezone.now())
+        SOIncludes.objects.create(store_order=store_order, product=self.products[0], quantity=10, price=Decimal("2.00"))
+        SOIncludes.objects.create(store_order=store_order, product=self.products[1], quantity=4, price=Decimal("2.00"))
+
+    def sales(self):
+        return set(Sales.objects.values_list('product_id', 'wholesale', 'quantity', 'year'))
+
+    def test_aggregate_is_idempotent(self):
+        stale = Sales.objects.create(product=self.products[1], quantity=99, year=26)
+        Sales.objects.create(product=self.products[0], quantity=1, year=26, wholesale=True)
+        Sales.objects.create(product=self.products[0], quantity=5, year=25)
+
+        call_command("aggregate_sales", "--year", "26", "--dry-run", stdout=StringIO())
+        self.assertEqual(Sales.objects.count(), 3)
+
+        out = StringIO()
+        call_command("aggregate_sales", "--year", "2026", "--prune", stdout=out)
+        expected = {
+            (self.products[0].id, False, 3, 26), (self.products[0].id, True, 10, 26),
+            (self.products[1].id, True, 4, 26), (self.products[0].id, False, 5, 25),
+        }
+        self.assertEqual(self.sales(), expected)
+        self.assertFalse(Sales.objects.filter(pk=stale.pk).exists())
+        self.assertEqual(list(MiscSales.objects.values_list('product_id', 'quantity', 'year')), [(self.misc.id, 2, 26)])
+        self.assertIn("GONE-1", out.getvalue())
+
+        ids = set(Sales.objects.values_list('id', flat=True))
+        out = StringIO()
+        call_command("aggregate_sales", "--year", "26", stdout=out)
+        self.assertEqual(set(Sales.objects.values_list('id', flat=True)), ids)
+        self.assertIn("Unchanged: 3", out.getvalue())
+
+
+class ProductStatsTests(TestCase):
+
+    def setUp(self):
+        variety = Variety.objects.create(sku_prefix="BEA-T0", var_name="Bean")
+        self.pkt = Product.objects.create(variety=variety, sku_suffix="pkt")
+        self.bulk = Product.objects.create(variety=variety, sku_suffix="1/4lb")
+        store = Store.objects.create(store_num=11, store_name="Store 11")
+        year = settings.CURRENT_ORDER_YEAR
+
+        order = OnlineOrder.objects.create(order_number="2001", customer_name="A", date=timezone.now())
+        OOIncludes.objects.create(order=order, product=self.pkt, qty=3, price=Decimal("2.55"))
+        OOIncludes.objects.create(order=order, product=self.bulk, qty=1, price=Decimal("9.00"))
+        store_order = StoreOrder.objects.create(store=store, order_number=f"W1101-{year}", date=timezone.now(), fulfilled_date=timezone.now())
+        SOIncludes.objects.create(store_order=store_order, product=self.pkt, quantity=12, price=Decimal("2.00"))
+
+        Sales.objects.create(product=self.pkt, quantity=40, year=year - 1)
+        Sales.objects.create(product=self.pkt, quantity=6, year=year - 1, wholesale=True)
+        LabelPrint.objects.create(product=self.pkt, date=timezone.now().date().replace(month=1, day=5), qty=100, for_year=year)
+        LabelPrint.objects.create(product=self.pkt, date=timezone.now().date().replace(month=2, day=7), qty=50, for_year=year)
+        LabelPrint.objects.create(product=self.pkt, date=timezone.now().date().replace(month=3, day=1), qty=999, for_year=year - 1)
+
+    def stats(self, product):
+        return (product.get_ytd_sales(), product.get_last_year_sales(), product.get_total_printed(), product.get_last_print_date())
+
+    def test_annotated_stats_match_fallback(self):
+        with self.assertNumQueries(1):
+            annotated = {product.pk: self.stats(product) for product in Product.objects.with_stats()}
+
+        this_year = timezone.now().year
+        self.assertEqual(annotated[self.pkt.pk], ("3 (12)", "40 (6)", 150, f"02/07/{this_year}"))
+        self.assertEqual(annotated[self.bulk.pk], ("1", "0", 0, "--"))
+
+        product = Product.objects.get(pk=self.pkt.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.stats(product), annotated[self.pkt.pk])
+
+
+class EnvelopeUsageTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        variety = Variety.objects.create(sku_prefix="TOM-T0", var_name="Tomato")
+        pkt = Product.objects.create(variety=variety, sku_suffix="pkt", env_type="Tomato")
+        bulk = Product.objects.create(variety=variety, sku_suffix="1oz", env_type="Small", env_multiplier=2)
+        Product.objects.create(variety=variety, sku_suffix="tape")
+        misc = MiscProduct.objects.create(lineitem_name="Cherry Pack", sku="TOM-CH-pkts")
+        MiscEnvelopeMap.objects.create(product=misc, env_type="Tomato", multiplier=7)
+        MiscProduct.objects.create(lineitem_name="Unmapped", sku="GIFT")
+
+        for year, qty in [(23, 100), (24, 200), (25, 300)]:
+            Sales.objects.create(product=pkt, quantity=qty, year=year)
+            Sales.objects.create(product=pkt, quantity=10, year=year, wholesale=True)
+        Sales.objects.create(product=bulk, quantity=5, year=25)
+        MiscSales.objects.create(product=misc, quantity=2, year=25)
+        LabelPrint.objects.create(product=pkt, date=timezone.now().date(), qty=150, for_year=26)
+
+    def test_report(self):
+        with self.assertNumQueries(4):
+            report = envelope_report(years_back=3)
+
+        self.assertEqual(report['years'], [25, 24, 23])
+        self.assertEqual(report['usage'][25], {"Tomato": 324, "Small": 10})
+        self.assertEqual(report['usage'][23], {"Tomato": 110})
+        self.assertEqual(report['forecast_year'], 26)
+        # Tomato: 110, 210, 324 -> least squares line gives 429 for 26, 150 already printed
+        self.assertEqual(report['forecast']["Tomato"], {'projected': 429, 'printed': 150, 'remaining': 279})
+        self.assertEqual(report['forecast']["Small"]['projected'], 13)
+
+    def test_forecast_never_negative(self):
+        forecast = envelope_forecast({24: {"Pea": 100}, 25: {"Pea": 10}}, 26, {"Pea": 50})
+        self.assertEqual(forecast, {"Pea": {'projected': 0, 'printed': 50, 'remaining': 0}})
+
+
+class ProductSalesYearTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="office", password="pw")
+        self.user.groups.create(name="employees")
+        self.store = Store.objects.create(store_num=12, store_name="Store 12")
+        self.products = []
+        for i in range(2):
+            variety = Variety.objects.create(sku_prefix=f"SQU-T{i}", var_name=f"Squash {i}")
+            self.products.append(Product.objects.create(variety=variety, sku_suffix="pkt"))
+
+        year = 2000 + settings.CURRENT_ORDER_YEAR
+        order = OnlineOrder.objects.create(order_number="3001", customer_name="A", date=timezone.now().replace(year=year))
+        OOIncludes.objects.create(order=order, product=self.products[0], qty=3, price=Decimal("3.00"))
+        OOIncludes.objects.create(order=order, product=self.products[1], qty=1, price=Decimal("3.00"))
+        refresh_product_sales(year, ProductSalesYear.ONLINE, [product.id for product in self.products])
+
+    def rollup(self):
+        return set(ProductSalesYear.objects.values_list('product__variety__sku_prefix', 'channel', 'qty', 'revenue'))
+
+    def test_rollup_follows_orders(self):
+        order = StoreOrder.objects.create(store=self.store, order_number=f"W1201-{settings.CURRENT_ORDER_YEAR}", fulfilled_date=timezone.now())
+        items = [{'sku_prefix': "SQU-T1", 'quantity': 8}]
+        sync_order_lines(order, items, resolve_order_products(items), Decimal("2.00"))
+
+        expected = {
+            ("SQU-T0", "online", 3, Decimal("9.00")), ("SQU-T1", "online", 1, Decimal("3.00")),
+            ("SQU-T1", "wholesale", 8, Decimal("16.00")),
+        }
+        self.assertEqual(self.rollup(), expected)
+
+        sync_order_lines(order, [], {}, Decimal("2.00"))
+        self.assertEqual(self.rollup(), expected - {("SQU-T1", "wholesale", 8, Decimal("16.00"))})
+
+        sync_order_lines(order, items, resolve_order_products(items), Decimal("2.00"))
+        ProductSalesYear.objects.all().delete()
+        self.assertEqual(rebuild_product_sales(), 3)
+        self.assertEqual(self.rollup(), expected)
+
+    def test_rollup_without_upsert_target(self):
+        # MySQL can't name the unique fields of an upsert (bulk_create would raise NotSupportedError)
+        OOIncludes.objects.filter(product=self.products[1]).update(qty=4)
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False):
+            refresh_product_sales(settings.CURRENT_ORDER_YEAR, ProductSalesYear.ONLINE)
+        self.assertEqual(self.rollup(), {("SQU-T0", "online", 3, Decimal("9.00")), ("SQU-T1", "online", 4, Decimal("12.00"))})
+
+    def test_rollups_keep_fast_delete(self):
+        # a cache receiver on a rollup would make every refresh load and signal each row
+        for model in (ProductSalesYear, StoreSalesDaily, OOIncludes, OOIncludesMisc):
+            self.assertTrue(Collector(using='default').can_fast_delete(model.objects.all()), model.__name__)
+
+    def test_top_sellers_by_channel(self):
+        order = StoreOrder.objects.create(store=self.store, order_number=f"W1201-{settings.CURRENT_ORDER_YEAR}", fulfilled_date=timezone.now())
+        items = [{'sku_prefix': "SQU-T1", 'quantity': 8}]
+        sync_order_lines(order, items, resolve_order_products(items), Decimal("2.00"))
+
+        self.client.force_login(self.user)
+        names = lambda response: [(seller['name'], seller['packets']) for seller in response.json()['top_sellers']]
+        with self.assertNumQueries(3 + 1):  # session, user, is_employee + the leaderboard
+            response = self.client.get("/office/top-sellers-details/")
+        self.assertEqual(names(response), [("Squash 0 (pkt)", 3), ("Squash 1 (pkt)", 1)])
+        response = self.client.get("/office/top-sellers-details/", {'channel': 'all'})
+        self.assertEqual(names(response), [("Squash 1 (pkt)", 9), ("Squash 0 (pkt)", 3)])
+        response = self.client.get("/office/top-sellers-details/", {'channel': 'store'})
+        self.assertEqual(response.status_code, 400)
+
+
+class SalesSeriesTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="office", password="pw")
+        self.user.groups.create(name="employees")
+        store = Store.objects.create(store_num=14, store_name="Store 14")
+        beans = Product.objects.create(variety=Variety.objects.create(sku_prefix="BEA-T0", crop="Bean"), sku_suffix="pkt")
+        peas = Product.objects.create(variety=Variety.objects.create(sku_prefix="PEA-T0", crop="Pea"), sku_suffix="pkt")
+
+        for number, day, product, qty in [
+            ("4001", (2026, 3, 2), beans, 2), ("4002", (2026, 3, 4), peas, 1),
+            ("4003", (2026, 3, 10), beans, 5), ("4004", (2025, 3, 3), beans, 7),
+        ]:
+            order = OnlineOrder.objects.create(order_number=number, customer_name="A", date=timezone.make_aware(datetime(*day, 12)))
+            OOIncludes.objects.create(order=order, product=product, qty=qty, price=Decimal("3.00"))
+        StoreSalesDaily.objects.create(store=store, product=peas, year=26, date=date(2026, 3, 11), packets=10, sales=Decimal("25.00"))
+
+    def test_weekly_bins_with_comparison_year(self):
+        start, end = date(2026, 3, 2), date(2026, 3, 15)
+        result = sales_series(start, end, unit='week', compare=1)
+
+        self.assertEqual(result['bins'], ["2026-03-02", "2026-03-09"])
+        series = {(row['year'], row['channel']): (row['packets'], row['revenue']) for row in result['series']}
+        self.assertEqual(series, {
+            (2026, 'online'): ([3, 5], [9.0, 15.0]),
+            (2026, 'wholesale'): ([0, 10], [0.0, 25.0]),
+            (2025, 'online'): ([7, 0], [21.0, 0.0]),
+            (2025, 'wholesale'): ([0, 0], [0.0, 0.0]),
+        })
+
+    def test_grouped_by_crop_and_cached(self):
+        start, end = date(2026, 3, 1), date(2026, 3, 31)
+        result = sales_series(start, end, unit='month', channels=('online',), group='crop')
+        self.assertEqual([(row['group'], row['packets']) for row in result['series']], [("Bean", [7]), ("Pea", [1])])
+        with self.assertNumQueries(0):
+            sales_series(start, end, unit='month', channels=('online',), group='crop')
+
+    def test_endpoint(self):
+        self.client.force_login(self.user)
+        response = self.client.get("/office/api/sales-series/", {'start': "2026-03-01", 'end': "2026-03-07", 'bin': "day", 'channel': "online"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['bins']), 7)
+        self.assertEqual(response.json()['series'][0]['packets'][:4], [0, 2, 0, 1])
+
+        for params in ({'bin': "hour"}, {'channel': "store"}, {'start': "March"}, {'start': "2026-03-07", 'end': "2026-03-01"}):
+            self.assertEqual(self.client.get("/office/api/sales-series/", params).status_code, 400)
+
+
+class SalesMatrixTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="office", password="pw")
+        self.user.groups.create(name="employees")
+        for prefix in ("TOM-T0", "TOM-T1"):
+            variety = Variety.objects.create(sku_prefix=prefix, crop="Tomato", group="Nightshades")
+            pkt = Product.objects.create(variety=variety, sku_suffix="pkt")
+            bulk = Product.objects.create(variety=variety, sku_suffix="1oz")
+            for year, quantity in ((23, 4), (25, 6), (26, 8)):
+                Sales.objects.create(product=pkt, year=year, quantity=quantity, wholesale=False)
+                Sales.objects.create(product=pkt, year=year, quantity=quantity * 10, wholesale=True)
+            Sales.objects.create(product=bulk, year=26, quantity=1, wholesale=False)
+
+    def test_variety_matrix_in_one_query(self):
+        with self.assertNumQueries(1):
+            matrix = sales_matrix('variety', "TOM-T0", years=3)
+
+        self.assertEqual(matrix['years'], [24, 25, 26])
+        self.assertEqual(matrix['skus'], ["TOM-T0-1oz", "TOM-T0-pkt"])
+        self.assertEqual(matrix['qty'], [
+            [[0, 0], [0, 0]],
+            [[0, 0], [6, 60]],
+            [[1, 0], [8, 80]],
+        ])
+        with self.assertNumQueries(0):
+            sales_matrix('variety', "TOM-T0", years=3)
+
+    def test_endpoint(self):
+        self.client.force_login(self.user)
+        response = self.client.get("/office/api/sales-matrix/", {'crop': "Tomato"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['years'], [22, 23, 24, 25, 26])
+        self.assertEqual(len(response.json()['skus']), 4)
+
+        self.assertEqual(self.client.get("/office/api/sales-matrix/", {'group': "Brassicas"}).status_code, 404)
+        self.assertEqual(self.client.get("/office/api/sales-matrix/").status_code, 400)
+        self.assertEqual(self.client.get("/office/api/sales-matrix/", {'crop': "Tomato", 'group': "Nightshades"}).status_code, 400)
+        self.assertEqual(self.client.get("/office/api/sales-matrix/", {'crop': "Tomato", 'years': "0"}).status_code, 400)
+
+
+class LabelPrintReportTests(TestCase):
+
+    def setUp(self):
+        self.products = {}
+        for prefix, printed, sold, germ_rates in [
+            ("CUC-T0", 10, 100, [90, 85]),   # low prints, 2 germinated lots
+            ("CUC-T1", 20, 30, [0]),         # no germinated lot
+            ("CUC-T2", 60, 200, [80]),       # above the print threshold, 30% of sales
+            ("CUC-T3", 0, 50, [70]),         # nothing printed
+        ]:
+            variety = Variety.objects.create(sku_prefix=prefix, var_name=prefix)
+            product = Product.objects.create(variety=variety, sku_suffix="pkt")
+            self.products[prefix] = product
+            if printed:
+                LabelPrint.objects.create(product=product, date=timezone.now().date(), qty=printed, for_year=26)
+            Sales.objects.create(product=product, year=25, quantity=sold)
+            for i, rate in enumerate(germ_rates):
+                lot = Lot.objects.create(variety=variety, year=24, harvest=str(i))
+                Germination.objects.create(lot=lot, status="active", germination_rate=rate, for_year=26)
+
+    def test_low_label_prints(self):
+        with self.assertNumQueries(3):
+            results = low_label_print_report(26, 30)
+        self.assertEqual([(item['sku_prefix'], item['total_printed'], item['lot_count']) for item in results], [
+            ("CUC-T3", 0, 1), ("CUC-T0", 10, 2),
+        ])
+
+    def test_below_sales_percentage(self):
+        with self.assertNumQueries(5):  # latest sales year, 3 grouped queries, products
+            sales_year, results = below_sales_percentage_report(26, 50)
+        self.assertEqual(sales_year, 25)
+        self.assertEqual([(item['sku_prefix'], item['percentage'], item['lot_count']) for item in results], [
+            ("CUC-T0", 10.0, 2), ("CUC-T2", 30.0, 1),
+        ])
+
+    def test_commands(self):
+        out = StringIO()
+        call_command('low_label_prints', '--year', '26', '--format', 'csv', stdout=out)
+        self.assertEqual(out.getvalue().splitlines()[0], "sku_prefix,variety_name,pkg_size,total_printed,lot_count")
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+
+        out = StringIO()
+        call_command('below_sales_percentage', '--year', '26', '--threshold', '20', '--format', 'json', stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual((report['sales_year'], [item['sku_prefix'] for item in report['products']]), (25, ["CUC-T0"]))
+
+        out = StringIO()
+        call_command('below_sales_percentage', '--year', '26', stdout=out)
+        self.assertIn("Total: 2 products below threshold", out.getvalue())
+
+
+class ImportSalesTests(TestCase):
+
+    def setUp(self):
+        self.products = [
+            Product.objects.create(variety=Variety.objects.create(sku_prefix=f"BEA-T{i}", var_name=f"Bean {i}"), sku_suffix="pkt")
+            for i in range(3)
+        ]
+        self.misc = MiscProduct.objects.create(lineitem_name="Gift Card", sku="GIF-25")
+        Sales.objects.create(product=self.products[0], year=25, quantity=5, wholesale=False)
+        Sales.objects.create(product=self.products[2], year=25, quantity=9, wholesale=False)
+        Sales.objects.create(product=self.products[0], year=25, quantity=40, wholesale=True)
+
+        handle, self.csv_path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(handle, "w") as f:
+            f.write("SKU,QTY\nBEA-T0-pkt,7\nBEA-T1-pkt,3\nGIF-25,2\nBEA-T2-pkt,0\nBEA-ZZ-pkt,4\nBEA-T1-pkt,x\n")
+        self.addCleanup(os.remove, self.csv_path)
+
+    def sales(self):
+        return set(Sales.objects.values_list('product__variety__sku_prefix', 'wholesale', 'quantity'))
+
+    def test_dry_run_then_import(self):
+        before = self.sales()
+        out = StringIO()
+        call_command('import_sales', self.csv_path, '--year', '25', '--dry-run', stdout=out)
+        self.assertEqual(self.sales(), before)
+        self.assertIn("Would Create: 1", out.getvalue())
+        self.assertIn("Would Update: 1", out.getvalue())
+        self.assertIn("Row 6: product not found for SKU 'BEA-ZZ-pkt'", out.getvalue())
+
+        with self.assertNumQueries(11):  # 2 SKU maps, then read + savepoint + bulk writes per table
+            call_command('import_sales', self.csv_path, '--year', '25', stdout=StringIO())
+        self.assertEqual(self.sales(), {
+            ("BEA-T0", False, 7), ("BEA-T1", False, 3), ("BEA-T2", False, 9), ("BEA-T0", True, 40),
+        })
+        self.assertEqual(list(MiscSales.objects.values_list('product__sku', 'year', 'quantity')), [("GIF-25", 25, 2)])
+
+        # retail prune leaves the wholesale rows alone
+        call_command('import_sales', self.csv_path, '--year', '25', '--prune', stdout=StringIO())
+        self.assertEqual(self.sales(), {("BEA-T0", False, 7), ("BEA-T1", False, 3), ("BEA-T0", True, 40)})
+
+
+class RunReportsTests(TestCase):
+
+    def setUp(self):
+        store = Store.objects.create(store_num=15, store_name="Store 15")
+        variety = Variety.objects.create(sku_prefix="LET-T0", var_name="Lettuce", photo_path="")
+        product = Product.objects.create(variety=variety, sku_suffix="pkt", pkg_size="• 1g", print_back=True, env_type="Misc")
+        Sales.objects.create(product=product, year=25, quantity=100)
+        LabelPrint.objects.create(product=product, date=timezone.now().date(), qty=10, for_year=26)
+
+        tested = Lot.objects.create(variety=variety, year=24)
+        Germination.objects.create(lot=tested, status="pending", germination_rate=88, for_year=26, test_date=date(2026, 1, 5))
+        Lot.objects.create(variety=variety, year=23)  # no germination for 26
+
+        order = OnlineOrder.objects.create(order_number="5001", customer_name="A", date=timezone.now(), misc=True, bulk=True)
+        OOIncludes.objects.create(order=order, product=product, qty=1, price=Decimal("3.00"))
+        store_order = StoreOrder.objects.create(store=store, order_number="W1501-26")
+        SOIncludes.objects.create(store_order=store_order, product=product, quantity=6, price=Decimal("2.00"))
+
+    def test_all_reports_share_one_context(self):
+        out = StringIO()
+        with self.assertNumQueries(13):  # each table is read once across all eleven reports
+            call_command('run_reports', '--year', '26', '--format', 'json', stdout=out)
+        reports = json.loads(out.getvalue())['reports']
+
+        self.assertEqual([(row['lot'], row['status']) for row in reports['lots_without_germ']], [("None23", "unknown")])
+        self.assertEqual(reports['lots_with_pending_germs'][0]['pending_germs'], 1)
+        self.assertEqual([row['total_printed'] for row in reports['low_label_prints']], [10])
+        self.assertEqual([row['percentage'] for row in reports['below_sales_percentage']], [10.0])
+        self.assertEqual(len(reports['varieties_without_photo']), 1)
+        self.assertEqual({row['field'] for row in reports['missing_product_attributes']}, {'rack_location', 'lineitem_name'})
+        self.assertEqual(len(reports['pkt_print_back_mismatch']), 1)
+        self.assertEqual(reports['bullets_in_pkg_size'][0]['fixed_pkg_size'], "1g")
+        self.assertEqual(reports['hybrid_orders'], [{'order_number': "5001", 'pkt_items': 1, 'misc_items': 0}])
+        self.assertEqual(reports['unfulfilled_store_orders'][0]['packets'], 6)
+        self.assertEqual(reports['orphaned_includes'], [])
+
+    def test_single_report_as_csv(self):
+        out = StringIO()
+        call_command('run_reports', 'unfulfilled_store_orders', '--year', '26', '--format', 'csv', stdout=out)
+        self.assertEqual(out.getvalue().splitlines(), ["order_number,store,date,packets", "W1501-26,Store 15,--,6"])
+
+        with self.assertRaises(CommandError):
+            call_command('run_reports', 'nightly', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('run_reports', '--format', 'csv', stdout=StringIO())
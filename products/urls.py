@@ -6,4 +6,6 @@ urlpatterns = [
     path('shopify-inventory/', views.shopify_inventory, name='shopify_inventory'),
     path('save-wholesale-availability/', views.save_wholesale_availability, name='save_wholesale_availability'),
     path('apply-store-template/', views.apply_store_template, name='apply_store_template'),
+    path('inventory-snapshots/', views.inventory_snapshots, name='inventory_snapshots'),
+    path('inventory-snapshots/delta/', views.inventory_snapshot_delta, name='inventory_snapshot_delta'),
 ]
\ No newline at end of file
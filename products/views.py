@@ -7,14 +7,18 @@ from django.contrib.admin.views.decorators import user_passes_test
 from django.http import JsonResponse
 import json
 from stores.models import StoreOrder
-from products.models import Product, Variety
+from stores.availability import resolve_pkt_products, set_products_availability, replace_store_availability, all_store_nums
+from products.models import Variety, InventorySnapshot
+from products.snapshots import try_save_inventory_snapshot, frame_from_shopify_df, compute_snapshot_delta
 from uprising.utils.auth import is_employee
+from uprising.utils.cache import invalidate
 import os
 from datetime import datetime
 import io
 from django.http import JsonResponse
 from django.conf import settings
 from django.views.decorators.http import require_http_methods, require_POST
+import numpy as np
 import pandas as pd
 
 # Handles requests from the admin user to edit the available products for a store
@@ -57,24 +61,11 @@ def edit_products(request):
             new_sku_prefixes = json.loads(request.POST.get('varieties'))  # list of sku_prefixes
             print(f"New SKU prefixes for store {store_handle}: {new_sku_prefixes}")
         
-            # set all products for this store to not available
-            StoreProduct.objects.filter(store=store).update(is_available=False)
-            
-            # Then set selected products to available
-            for sku_prefix in new_sku_prefixes:
-                product = Product.objects.get(
-                    variety__sku_prefix=sku_prefix,
-                    sku_suffix__endswith="pkt"
-                )
-
-                store_product, created = StoreProduct.objects.get_or_create(
-                    store=store, 
-                    product=product,
-                    defaults={'is_available': True}
-                )
-                if not created:
-                    store_product.is_available = True
-                    store_product.save()
+            # Selected products become available, everything else unavailable
+            product_ids = resolve_pkt_products(new_sku_prefixes)
+            for sku_prefix in set(new_sku_prefixes) - set(product_ids):
+                print(f"No 'pkt' product found for variety {sku_prefix}")
+            replace_store_availability(store, product_ids.values())
             
             return JsonResponse({'success': True})
         
@@ -82,28 +73,11 @@ def edit_products(request):
         elif "varieties_to_add" in request.POST:
             varieties_to_add = json.loads(request.POST.get('varieties_to_add'))  # list of sku_prefixes
 
-            for store in Store.objects.all():
-                for sku_prefix in varieties_to_add:
-                    try:
-                        # Get the 'pkt' product for this variety
-                        product = Product.objects.get(
-                            variety__sku_prefix=sku_prefix,
-                            sku_suffix__endswith="pkt"
-                        )
-
-                        store_product, created = StoreProduct.objects.get_or_create(
-                            store=store,
-                            product=product,
-                            defaults={'is_available': True}
-                        )
-                        if not created:
-                            store_product.is_available = True
-                            store_product.save()
-
-                    except Product.DoesNotExist:
-                        # optional: log or skip varieties without a 'pkt' product
-                        print(f"No 'pkt' product found for variety {sku_prefix}")
-                        continue
+            product_ids = resolve_pkt_products(varieties_to_add)
+            for sku_prefix in set(varieties_to_add) - set(product_ids):
+                # optional: log or skip varieties without a 'pkt' product
+                print(f"No 'pkt' product found for variety {sku_prefix}")
+            set_products_availability(all_store_nums(), product_ids.values(), True)
 
             return JsonResponse({'success': True})
 
@@ -111,23 +85,10 @@ def edit_products(request):
         elif "varieties_to_remove" in request.POST:
             varieties_to_remove = json.loads(request.POST.get('varieties_to_remove'))  # list of sku_prefixes
 
-            for store in Store.objects.all():
-                for sku_prefix in varieties_to_remove:
-                    try:
-                        # Find the 'pkt' product for this variety
-                        product = Product.objects.get(
-                            variety__sku_prefix=sku_prefix,
-                            sku_suffix__endswith="pkt"
-                        )
-
-                        StoreProduct.objects.filter(
-                            store=store,
-                            product=product
-                        ).update(is_available=False)
-
-                    except Product.DoesNotExist:
-                        print(f"No 'pkt' product found for variety {sku_prefix}")
-                        continue
+            product_ids = resolve_pkt_products(varieties_to_remove)
+            for sku_prefix in set(varieties_to_remove) - set(product_ids):
+                print(f"No 'pkt' product found for variety {sku_prefix}")
+            set_products_availability(all_store_nums(), product_ids.values(), False)
 
             return JsonResponse({'success': True})
      
@@ -147,6 +108,49 @@ def edit_products(request):
         }
         return render(request, 'products/edit_products.html', context)
 
+def match_export_rows(export_skus, product_skus):
+    """
+    For each product SKU, return the position of the first export row whose
+    Variant SKU starts with it (-1 when nothing matches).
+    Uses a sorted SKU index + searchsorted instead of scanning the frame per product.
+    """
+    export_skus = pd.Series(export_skus, dtype=object).reset_index(drop=True)
+    valid = export_skus.notna()
+    sku_index = pd.DataFrame({
+        'sku': export_skus[valid].astype(str),
+        'row': np.flatnonzero(valid.to_numpy()),
+    }).sort_values('sku', kind='stable')
+
+    sorted_skus = sku_index['sku'].to_numpy(dtype=object)
+    # sentinel on the end so `hi` can always be used as a reduceat index
+    sorted_rows = np.append(sku_index['row'].to_numpy(dtype=np.int64), -1)
+
+    targets = np.asarray(product_skus, dtype=object)
+    upper = np.array([sku + '\U0010ffff' for sku in targets], dtype=object)
+    lo = np.searchsorted(sorted_skus, targets, side='left')
+    hi = np.searchsorted(sorted_skus, upper, side='left')
+
+    first_row = np.full(len(targets), -1, dtype=np.int64)
+    hit = hi > lo
+    if hit.any():
+        bounds = np.column_stack([lo[hit], hi[hit]]).ravel()
+        first_row[hit] = np.minimum.reduceat(sorted_rows, bounds)[::2]
+    return first_row
+
+
+def find_bulk_splits(bulk):
+    """
+    Return the prefixes (in order of first appearance) where a bulk size sits at 0
+    while a later size in the same prefix group still has stock.
+    """
+    in_stock = bulk["Variant Inventory Qty"].gt(0).astype(int)
+    grouped = in_stock.groupby(bulk["prefix"], sort=False)
+    in_stock_after = grouped.transform("sum") - grouped.cumsum()
+
+    needs_split = set(bulk.loc[(bulk["Variant Inventory Qty"] == 0) & (in_stock_after > 0), "prefix"])
+    return [prefix for prefix in bulk["prefix"].drop_duplicates() if prefix in needs_split]
+
+
 @login_required(login_url='/office/login/')
 @user_passes_test(is_employee)
 @require_http_methods(["POST"])
@@ -163,42 +167,50 @@ def shopify_inventory(request):
             return JsonResponse({'success': False, 'error': 'Only CSV files are allowed'})
         
         df = pd.read_csv(uploaded_file, dtype=str)
+        try_save_inventory_snapshot(frame_from_shopify_df(df), 'shopify_inventory', uploaded_file.name, request.user)
 
         # Check if bulk inventory was requested
         prefix = request.POST.get('sku_prefix')
         if prefix:
-            # TODO: Implement bulk inventory processing logic her
-
-            active_varieties = Variety.objects.filter(sku_prefix__startswith=prefix, active=True)
-            print(f"Active varieties: {active_varieties}")
+            # One query for the varieties and their products (left join keeps varieties with no products)
+            catalog = pd.DataFrame(
+                list(
+                    Variety.objects.filter(sku_prefix__startswith=prefix, active=True)
+                    .order_by('sku_prefix', 'products__id')
+                    .values('sku_prefix', 'var_name', 'products__id', 'products__sku_suffix')
+                ),
+                columns=['sku_prefix', 'var_name', 'products__id', 'products__sku_suffix'],
+                dtype=object,
+            )
 
-            if not active_varieties.exists():
+            if catalog.empty:
                 return JsonResponse({
                     'message': f"No products found with SKU prefix '{prefix}'",
                     'type_inventory': {}
                 })
 
-            inventory_dict = {}
-
-            for variety in active_varieties:
-                sku_prefix = variety.sku_prefix
-                inventory_dict[sku_prefix] = {"variety": variety.var_name}
+            inventory_dict = {
+                sku_prefix: {"variety": var_name}
+                for sku_prefix, var_name in catalog[['sku_prefix', 'var_name']].drop_duplicates('sku_prefix').itertuples(index=False)
+            }
 
-                for product in variety.products.all():  # assuming reverse FK is `products`
-                    sku = f"{sku_prefix}-{product.sku_suffix}"
+            products = catalog[catalog['products__id'].notna()].copy()
+            products['sku'] = [
+                f"{sku_prefix}-{sku_suffix}"
+                for sku_prefix, sku_suffix in zip(products['sku_prefix'], products['products__sku_suffix'])
+            ]
+            products['row'] = match_export_rows(df["Variant SKU"], products['sku'])
 
-                    # safely look up the product in the DataFrame
-                    product_row = df[df["Variant SKU"].str.startswith(sku, na=False)]
-                    if product_row.empty:
-                        continue
+            export = df[["Variant Inventory Tracker", "Variant Inventory Qty"]].reset_index(drop=True)
+            matched = products[products['row'] >= 0].merge(export, left_on='row', right_index=True, how='left')
 
-                    # check if product is tracked by Shopify
-                    if product_row["Variant Inventory Tracker"].values[0] != "shopify":
-                        inv_qty = "NOT TRACKED"
-                    else:
-                        inv_qty = product_row["Variant Inventory Qty"].values[0]
+            # check if product is tracked by Shopify
+            matched['inv_qty'] = matched["Variant Inventory Qty"].astype(object).where(
+                matched["Variant Inventory Tracker"] == "shopify", "NOT TRACKED"
+            )
 
-                    inventory_dict[sku_prefix][sku] = inv_qty
+            for sku_prefix, sku, inv_qty in matched[['sku_prefix', 'sku', 'inv_qty']].itertuples(index=False):
+                inventory_dict[sku_prefix][sku] = inv_qty
 
             return JsonResponse({
                 'message': 'Bulk inventory processed successfully',
@@ -227,17 +239,15 @@ def shopify_inventory(request):
 
             low_pkts = pkts[(pkts["Variant Inventory Qty"] <= pkt_threshold) & (pkts["Variant Inventory Qty"] >= 0)]
 
-            prefix_to_variety = {
-                v.sku_prefix: v.var_name for v in Variety.objects.all()
+            varieties = {
+                sku_prefix: (var_name, crop)
+                for sku_prefix, var_name, crop in Variety.objects.values_list('sku_prefix', 'var_name', 'crop')
             }
-            
-            variety_inventory = {}
-            for _, row in low_pkts.iterrows():
-                prefix = row["prefix"]
-                qty = row["Variant Inventory Qty"]
-                variety_name = prefix_to_variety.get(prefix, f"Unknown ({prefix})")
 
-                variety_inventory[variety_name] = qty
+            variety_names = [
+                varieties[p][0] if p in varieties else f"Unknown ({p})" for p in low_pkts["prefix"]
+            ]
+            variety_inventory = dict(zip(variety_names, (int(q) for q in low_pkts["Variant Inventory Qty"])))
 
             # ============ BULK INVENTORY SPLIT CHECK ============ #
             # Filter bulk SKUs (non-packets)
@@ -248,21 +258,12 @@ def shopify_inventory(request):
 
             # Build a simple dict of bulk SKUs needing split
             split_dict = {}
-
-            for prefix, grp in bulk.groupby("prefix", sort=False):
-                qtys = grp["Variant Inventory Qty"].tolist()
-                
-                # Check if any non-final zero needs splitting
-                for idx, q in enumerate(qtys[:-1]):
-                    if q == 0 and any(q2 > 0 for q2 in qtys[idx + 1 :]):
-                        # lookup variety
-                        variety = Variety.objects.filter(sku_prefix=prefix).first()
-                        if variety:
-                            split_dict[variety.var_name] = variety.crop
-                        else:
-                            split_dict[f"Unknown ({prefix})"] = "Unknown"
-                        break
-            print(f"Bulk SKUs needing splitting: {split_dict}")
+            for prefix in find_bulk_splits(bulk):
+                if prefix in varieties:
+                    var_name, crop = varieties[prefix]
+                    split_dict[var_name] = crop
+                else:
+                    split_dict[f"Unknown ({prefix})"] = "Unknown"
 
             return JsonResponse({
                 'message': 'Packet inventory processed successfully',
@@ -279,6 +280,81 @@ def shopify_inventory(request):
         print(traceback.format_exc())
         return JsonResponse({'error': f"Unexpected error: {str(e)}"}, status=500)
 
+def snapshot_json(snapshot):
+    return {
+        'id': snapshot.id,
+        'source': snapshot.source,
+        'source_display': snapshot.get_source_display(),
+        'original_name': snapshot.original_name,
+        'uploaded_at': snapshot.uploaded_at.isoformat(),
+        'uploaded_by': snapshot.uploaded_by.username if snapshot.uploaded_by else None,
+        'sku_count': snapshot.sku_count,
+        'tracked_qty': snapshot.tracked_qty,
+    }
+
+
+@login_required(login_url='/office/login/')
+@user_passes_test(is_employee)
+@require_http_methods(["GET"])
+def inventory_snapshots(request):
+    """
+    List saved Shopify inventory snapshots, newest first
+    """
+    try:
+        limit = int(request.GET.get('limit', 50))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid limit'}, status=400)
+    if limit < 1:
+        return JsonResponse({'success': False, 'error': 'Limit must be at least 1'}, status=400)
+
+    snapshots = InventorySnapshot.objects.select_related('uploaded_by')[:limit]
+    return JsonResponse({'success': True, 'snapshots': [snapshot_json(s) for s in snapshots]})
+
+
+@login_required(login_url='/office/login/')
+@user_passes_test(is_employee)
+@require_http_methods(["GET"])
+def inventory_snapshot_delta(request):
+    """
+    Per-SKU deltas and sell-through velocity between two snapshots.
+    ?from=<id>&to=<id> (defaults to the two most recent snapshots)
+    ?all=1 includes untracked SKUs, ?changed=1 drops SKUs whose qty did not move
+    """
+    try:
+        from_id = request.GET.get('from')
+        to_id = request.GET.get('to')
+
+        if from_id and to_id:
+            snapshots = list(InventorySnapshot.objects.filter(id__in=[from_id, to_id]))
+        else:
+            snapshots = list(InventorySnapshot.objects.all()[:2])
+
+        if len(snapshots) != 2:
+            return JsonResponse({'success': False, 'error': 'Two snapshots are needed to compare'}, status=404)
+
+        older, newer = sorted(snapshots, key=lambda s: s.uploaded_at)
+        deltas, days = compute_snapshot_delta(older, newer, tracked_only=request.GET.get('all') != '1')
+
+        if request.GET.get('changed') == '1':
+            deltas = deltas[deltas['delta'] != 0]
+
+        deltas = deltas.reset_index()
+        deltas = deltas.astype(object).where(deltas.notna(), None)
+
+        return JsonResponse({
+            'success': True,
+            'from': snapshot_json(older),
+            'to': snapshot_json(newer),
+            'days': round(days, 2),
+            'deltas': deltas.to_dict('records'),
+        })
+
+    except FileNotFoundError as e:
+        return JsonResponse({'success': False, 'error': f"Snapshot file missing: {e.filename}"}, status=404)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
 # View to display wholesale availability of products  
 @login_required(login_url='/office/login/')
 @user_passes_test(is_employee)
@@ -319,6 +395,7 @@ def save_wholesale_availability(request):
                 wholesale_rack_designation=change['wholesale_rack_designation'] if change['wholesale_rack_designation'] else None
             )
             updated_count += 1
+        invalidate('products')
         
         return JsonResponse({'success': True, 'updated_count': updated_count})
     except Exception as e:
@@ -341,33 +418,16 @@ def apply_store_template(request):
         # Get the store
         store = Store.objects.get(store_num=store_num)
         
-        # Step 1: Reset all products for this store
-        StoreProduct.objects.filter(store=store).update(is_available=False)
-        print(f"Reset all products for store {store.store_name}")  # DEBUG
-        
-        # Step 2: Get all varieties matching the selected racks
-        matching_varieties = Variety.objects.filter(
+        # Step 1: Get the pkt products of all varieties matching the selected racks
+        matching_prefixes = Variety.objects.filter(
             wholesale=True,
             wholesale_rack_designation__in=selected_racks
-        )
-        print(f"Found {matching_varieties.count()} matching varieties")  # DEBUG
+        ).values_list('sku_prefix', flat=True)
+        product_ids = resolve_pkt_products(matching_prefixes)
+        print(f"Found {len(product_ids)} matching varieties with a pkt product")  # DEBUG
         
-        # Step 3: For each variety, find the 'pkt' product and set availability
-        products_added = 0
-        for variety in matching_varieties:
-            try:
-                pkt_product = Product.objects.get(variety=variety, sku_suffix='pkt')
-                store_product, created = StoreProduct.objects.get_or_create(
-                    store=store,
-                    product=pkt_product
-                )
-                store_product.is_available = True
-                store_product.save()
-                products_added += 1
-                print(f"Added: {variety.sku_prefix}-pkt")  # DEBUG
-            except Product.DoesNotExist:
-                print(f"No pkt product for {variety.sku_prefix}")  # DEBUG
-                continue
+        # Step 2: Make exactly those products available for this store
+        products_added = replace_store_availability(store, product_ids.values())
         
         print(f"Total products added: {products_added}")  # DEBUG
         
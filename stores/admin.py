@@ -7,3 +7,5 @@ admin.site.register(StoreNote)
 admin.site.register(StoreOrder)
 admin.site.register(SOIncludes)
 admin.site.register(LastSelectedStore)
+admin.site.register(StoreProductHistory)
+admin.site.register(StoreSalesDaily)
@@ -0,0 +1,72 @@
+"""
+Bulk StoreProduct availability updates.
+
+Every path that turns products on or off for stores (edit_products, apply_store_template,
+manage_stores) goes through here, so the number of queries stays the same no matter how
+many stores or varieties are involved. These use update()/bulk_create(), which skip the
+StoreProduct signals, so the affected store catalogs are invalidated here.
+"""
+from django.db import transaction
+
+from products.models import Product
+from stores.catalog import invalidate_store_catalog
+from stores.models import Store, StoreProduct
+
+
+def resolve_pkt_products(sku_prefixes):
+    """
+    {sku_prefix: pkt product id} for the given sku_prefixes in one query.
+    Prefixes without a pkt product are left out.
+    """
+    return dict(
+        Product.objects.filter(variety__sku_prefix__in=list(sku_prefixes), sku_suffix='pkt')
+        .values_list('variety__sku_prefix', 'id')
+    )
+
+
+def set_products_availability(store_nums, product_ids, available=True, create_missing=True):
+    """
+    Set is_available for every (store, product) pair and return the number of StoreProduct
+    rows updated. Making products available first inserts the missing rows (one INSERT that
+    ignores existing pairs, which MySQL supports unlike an upsert on named unique fields),
+    unless create_missing is False; making them unavailable only updates rows that exist.
+    """
+    store_nums = list(store_nums)
+    product_ids = list(product_ids)
+    if not store_nums or not product_ids:
+        return 0
+
+    with transaction.atomic():
+        if available and create_missing:
+            StoreProduct.objects.bulk_create(
+                [
+                    StoreProduct(store_id=store_num, product_id=product_id, is_available=True)
+                    for store_num in store_nums
+                    for product_id in product_ids
+                ],
+                ignore_conflicts=True,
+                batch_size=1000
+            )
+        count = StoreProduct.objects.filter(
+            store_id__in=store_nums,
+            product_id__in=product_ids
+        ).update(is_available=available)
+
+        for store_num in store_nums:
+            invalidate_store_catalog(store_num)
+
+    return count
+
+
+def replace_store_availability(store, product_ids):
+    """
+    Make exactly product_ids available for the store (everything else unavailable)
+    """
+    with transaction.atomic():
+        StoreProduct.objects.filter(store=store).exclude(product_id__in=list(product_ids)).update(is_available=False)
+        invalidate_store_catalog(store.store_num)
+        return set_products_availability([store.store_num], product_ids, True)
+
+
+def all_store_nums():
+    return list(Store.objects.values_list('store_num', flat=True))
@@ -0,0 +1,116 @@
+"""
+Cached per-store data for the wholesale dashboard.
+
+- catalog: the store's available pkt products (with varieties) + the product dict JSON.
+  Invalidated per store when its StoreProduct rows change, and for every store when a
+  variety or pkt product changes (a generation number in the key is bumped).
+- order history: total packets ever ordered per sku_prefix, summed from StoreProductHistory.
+  Invalidated per store when its orders or order items change.
+
+Signal receivers live in stores/signals.py. Code that changes these rows with update(),
+bulk_create() or raw deletes bypasses the signals and must call the invalidate_* helpers.
+"""
+import json
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+
+from products.models import Product
+
+CATALOG_TIMEOUT = 60 * 60 * 24
+GENERATION_KEY = "stores:catalog_generation"
+
+
+def _catalog_generation():
+    """
+    Current catalog generation. A missing one (never set, or culled) starts at the current
+    time, so it can't come back to a generation whose catalogs are still cached.
+    """
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, time.time_ns(), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def _catalog_key(store_num):
+    return f"stores:catalog:{_catalog_generation()}:{store_num}"
+
+
+def _history_key(store_num):
+    return f"stores:order_history:{store_num}"
+
+
+def get_store_catalog(store):
+    """
+    Returns (products, product_dict_json) for the store's available pkt products,
+    ordered by category, crop, var_name.
+    """
+    key = _catalog_key(store.store_num)
+    catalog = cache.get(key)
+
+    if catalog is None:
+        products = list(
+            Product.objects.filter(
+                storeproduct__store=store,
+                storeproduct__is_available=True,
+                sku_suffix='pkt'
+            ).select_related('variety').order_by('variety__category', 'variety__crop', 'variety__var_name')
+        )
+
+        product_dict = {}
+        for product in products:
+            variety = product.variety
+            if variety and variety.sku_prefix:
+                product_dict[variety.sku_prefix] = [variety.var_name, variety.crop]
+
+        catalog = (products, json.dumps(product_dict))
+        cache.set(key, catalog, CATALOG_TIMEOUT)
+
+    return catalog
+
+
+def get_store_order_history(store):
+    """
+    Returns {sku_prefix: total packets the store has ever ordered}
+    """
+    key = _history_key(store.store_num)
+    history = cache.get(key)
+
+    if history is None:
+        from stores.models import StoreProductHistory
+
+        history = {
+            sku_prefix: total_qty
+            for sku_prefix, total_qty in StoreProductHistory.objects.filter(store=store)
+            .values('product__variety__sku_prefix')
+            .annotate(total_qty=Sum('total_quantity'))
+            .values_list('product__variety__sku_prefix', 'total_qty')
+            if sku_prefix
+        }
+        cache.set(key, history, CATALOG_TIMEOUT)
+
+    return history
+
+
+def invalidate_store_catalog(store_num=None):
+    """
+    Drop the cached catalog for one store, or for every store when store_num is None.
+    Runs after the current transaction commits so a reader can't re-cache old rows.
+    """
+    def invalidate():
+        if store_num is None:
+            try:
+                cache.incr(GENERATION_KEY)
+            except ValueError:
+                cache.set(GENERATION_KEY, time.time_ns(), None)
+        else:
+            cache.delete(_catalog_key(store_num))
+
+    transaction.on_commit(invalidate)
+
+
+def invalidate_store_order_history(store_num):
+    transaction.on_commit(lambda: cache.delete(_history_key(store_num)))
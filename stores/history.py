@@ -0,0 +1,87 @@
+"""
+Incremental maintenance of StoreProductHistory (store, product, year -> first order,
+total quantity).
+
+Whenever order lines change, the touched (store, year) pairs are recomputed from their
+SOIncludes -- limited to the affected products where the caller knows them -- and
+replaced. Callers: the store dashboard (new orders), stores.order_lines (finalize, save
+changes, combine) and manage_stores (deletes). The rebuild_product_history command
+recomputes everything.
+"""
+from django.db import transaction
+
+from stores.models import SOIncludes, StoreProductHistory
+
+
+def _history_rows(lines):
+    """
+    Build unsaved StoreProductHistory rows, keyed by (store_num, year, product_id),
+    from a SOIncludes queryset
+    """
+    history = {}
+    for store_num, year, product_id, order_number, order_date, quantity in lines.order_by(
+        'store_order__order_number', 'id'
+    ).values_list(
+        'store_order__store_id', 'store_order__order_year', 'product_id',
+        'store_order__order_number', 'store_order__date', 'quantity'
+    ).iterator(chunk_size=5000):
+        row = history.get((store_num, year, product_id))
+        if row is None:
+            history[(store_num, year, product_id)] = StoreProductHistory(
+                store_id=store_num,
+                product_id=product_id,
+                year=year,
+                first_order_number=order_number,
+                first_order_date=order_date,
+                total_quantity=quantity
+            )
+        else:
+            row.total_quantity += quantity
+    return history
+
+
+def refresh_product_history(store_num, year, product_ids=None):
+    """
+    Recompute the history rows for one store/year (optionally only some products)
+    from the order lines: one read, one delete, one insert. Replacing the rows instead of
+    upserting them keeps this working on MySQL, which can't target the unique fields of
+    an upsert.
+    """
+    if year is None:
+        return
+
+    lines = SOIncludes.objects.filter(store_order__store_id=store_num, store_order__order_year=year)
+    existing = StoreProductHistory.objects.filter(store_id=store_num, year=year)
+    if product_ids is not None:
+        product_ids = list(set(product_ids))
+        lines = lines.filter(product_id__in=product_ids)
+        existing = existing.filter(product_id__in=product_ids)
+
+    history = _history_rows(lines)
+
+    with transaction.atomic():
+        existing.delete()
+        StoreProductHistory.objects.bulk_create(list(history.values()), batch_size=500)
+
+
+def rebuild_product_history(store_nums=None, years=None):
+    """
+    Recompute StoreProductHistory from scratch (optionally only some stores/years).
+    Returns the number of rows written.
+    """
+    lines = SOIncludes.objects.filter(store_order__order_year__isnull=False)
+    existing = StoreProductHistory.objects.all()
+    if store_nums:
+        lines = lines.filter(store_order__store_id__in=store_nums)
+        existing = existing.filter(store_id__in=store_nums)
+    if years:
+        lines = lines.filter(store_order__order_year__in=years)
+        existing = existing.filter(year__in=years)
+
+    history = _history_rows(lines)
+
+    with transaction.atomic():
+        existing.delete()
+        StoreProductHistory.objects.bulk_create(list(history.values()), batch_size=1000)
+
+    return len(history)
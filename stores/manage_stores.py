@@ -19,8 +19,14 @@ sys.path.append(project_path)
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "uprising.settings")
 django.setup()
 
-from stores.models import SOIncludes, Store, StoreOrder, StoreProduct
-from products.models import Product
+from stores.models import SOIncludes, Store, StoreOrder, StoreProduct, StoreOrderSequence, StoreProductHistory, StoreSalesDaily
+from stores.history import refresh_product_history
+from stores.reports import refresh_store_sales_daily
+from stores.catalog import invalidate_store_catalog
+from stores.availability import set_products_availability as set_availability
+from uprising.utils.cache import invalidate
+from products.models import Product, ProductSalesYear
+from products.sales import refresh_product_sales
 from django.contrib.auth.models import User
 from django.db.models import Count
 from django.db import connection
@@ -339,6 +345,7 @@ def set_all_packet_prices():
 
     with transaction.atomic():
         SOIncludes.objects.update(price=new_price)
+        invalidate('store_orders')
 
     print(f"✅ Updated {count} SOIncludes records to price {new_price}")
 
@@ -410,9 +417,15 @@ def delete_store_order():
         print("Deletion cancelled.")
         return
     
-    # Perform deletion
+    # Perform deletion (seed the store's order counter first so the number is never handed out again)
     order_number = order.order_number
+    if order_number[-2:].isdigit():
+        StoreOrderSequence.seed(order.store, int(order_number[-2:]))
     order.delete()  # This cascades to SOIncludes and PickListPrinted
+    refresh_product_history(order.store_id, order.order_year)
+    if order.fulfilled_date is not None:
+        refresh_store_sales_daily(order.store_id, order.order_year)
+        refresh_product_sales(order.order_year, ProductSalesYear.WHOLESALE)
     
     print(f"\n✅ Order '{order_number}' and all related records have been deleted.")
 
@@ -462,6 +475,8 @@ def set_to_pending():
     order.fulfilled_date = None
     order.shipping = Decimal("0.00")
     order.save(update_fields=["fulfilled_date", "shipping"])
+    refresh_store_sales_daily(order.store_id, order.order_year)
+    refresh_product_sales(order.order_year, ProductSalesYear.WHOLESALE, order.items.values_list('product_id', flat=True))
 
     print(f"✅ Order {order.order_number} is now PENDING")
 
@@ -636,12 +651,13 @@ def _set_items_availability_helper(store_nums, item_nums=None, availability=True
     
     print(f"✓ Found {products.count()} product(s)")
     
-    # Perform update
-    matching_storeproducts = StoreProduct.objects.filter(
-        store__in=stores,
-        product__in=products
+    # Perform update (existing StoreProduct records only)
+    updated_count = set_availability(
+        found_store_nums,
+        products.values_list('id', flat=True),
+        availability,
+        create_missing=False
     )
-    updated_count = matching_storeproducts.update(is_available=availability)
     
     print(f"\n✅ Updated {updated_count} StoreProduct records to is_available={availability}")
     
@@ -739,6 +755,7 @@ def reset_storeproduct_table():
             )
     
     StoreProduct.objects.bulk_create(to_create)
+    invalidate_store_catalog()
     print(f"✓ Created {len(to_create)} StoreProduct entries")
     print(f"\n✅ StoreProduct table reset complete")
 
@@ -789,7 +806,11 @@ def reset_store_order_table():
     if confirm == 'DELETE':
         StoreOrder.objects.all().delete()
         SOIncludes.objects.all().delete()
-        print("\n✅ Store order tables reset")
+        StoreOrderSequence.objects.all().delete()
+        StoreProductHistory.objects.all().delete()
+        StoreSalesDaily.objects.all().delete()
+        invalidate('store_orders')
+        print("\n✅ Store order tables reset (order numbers start over at 01)")
     else:
         print("Reset cancelled")
 
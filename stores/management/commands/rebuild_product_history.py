@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from stores.catalog import invalidate_store_order_history
+from stores.history import rebuild_product_history
+from stores.models import Store
+
+
+class Command(BaseCommand):
+
+    help = 'Rebuild the StoreProductHistory table (first order + total quantity per store/product/year) from SOIncludes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--store', type=int, action='append', dest='stores',
+                            help='Only rebuild this store number (repeatable)')
+        parser.add_argument('--year', type=int, action='append', dest='years',
+                            help='Only rebuild this order year, 2 or 4 digits (repeatable)')
+
+    def handle(self, *args, **options):
+        years = [year % 100 for year in options['years']] if options['years'] else None
+        count = rebuild_product_history(options['stores'], years)
+
+        # the dashboard's previously-ordered counts are cached from this table
+        for store_num in options['stores'] or Store.objects.values_list('store_num', flat=True):
+            invalidate_store_order_history(store_num)
+
+        self.stdout.write(f"✅ Wrote {count} store product history rows")
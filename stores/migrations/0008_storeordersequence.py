@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0007_storeorder_quickbooks_invoice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoreOrderSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('last_number', models.IntegerField(default=0)),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_sequences', to='stores.store')),
+            ],
+            options={
+                'unique_together': {('store', 'year')},
+            },
+        ),
+    ]
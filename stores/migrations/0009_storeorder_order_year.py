@@ -0,0 +1,41 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:51
+
+from django.db import migrations, models
+
+
+def backfill_order_year(apps, schema_editor):
+    """
+    Fill order_year from the order number suffix (W0503-26 -> 26)
+    """
+    StoreOrder = apps.get_model('stores', 'StoreOrder')
+    orders = []
+    for order in StoreOrder.objects.only('id', 'order_number').iterator():
+        year_suffix = order.order_number.rsplit('-', 1)[-1]
+        if '-' in order.order_number and year_suffix.isdigit():
+            order.order_year = int(year_suffix)
+            orders.append(order)
+    StoreOrder.objects.bulk_update(orders, ['order_year'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0008_storeordersequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storeorder',
+            name='order_year',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_order_year, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='storeorder',
+            index=models.Index(fields=['store', 'order_year', 'fulfilled_date'], name='storeorder_store_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='storeorder',
+            index=models.Index(fields=['order_year', 'fulfilled_date'], name='storeorder_year_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_history(apps, schema_editor):
+    """
+    Initial fill from the existing order lines (same as manage.py rebuild_product_history)
+    """
+    SOIncludes = apps.get_model('stores', 'SOIncludes')
+    StoreProductHistory = apps.get_model('stores', 'StoreProductHistory')
+
+    history = {}
+    lines = SOIncludes.objects.filter(store_order__order_year__isnull=False).order_by('store_order__order_number', 'id')
+    for store_num, year, product_id, order_number, order_date, quantity in lines.values_list(
+        'store_order__store_id', 'store_order__order_year', 'product_id',
+        'store_order__order_number', 'store_order__date', 'quantity'
+    ).iterator(chunk_size=5000):
+        row = history.get((store_num, year, product_id))
+        if row is None:
+            history[(store_num, year, product_id)] = StoreProductHistory(
+                store_id=store_num,
+                product_id=product_id,
+                year=year,
+                first_order_number=order_number,
+                first_order_date=order_date,
+                total_quantity=quantity
+            )
+        else:
+            row.total_quantity += quantity
+    StoreProductHistory.objects.bulk_create(list(history.values()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0013_inventorysnapshot'),
+        ('stores', '0009_storeorder_order_year'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoreProductHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('first_order_number', models.CharField(max_length=100)),
+                ('first_order_date', models.DateTimeField(blank=True, null=True)),
+                ('total_quantity', models.IntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='store_history', to='products.product')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_history', to='stores.store')),
+            ],
+            options={
+                'verbose_name': 'Store Product History',
+                'verbose_name_plural': 'Store Product History',
+                'unique_together': {('store', 'year', 'product')},
+            },
+        ),
+        migrations.RunPython(build_history, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def build_daily_sales(apps, schema_editor):
+    """
+    Initial fill from the fulfilled order lines (same grouping as stores.reports.daily_sales_rows)
+    """
+    SOIncludes = apps.get_model('stores', 'SOIncludes')
+    StoreSalesDaily = apps.get_model('stores', 'StoreSalesDaily')
+
+    grouped = (
+        SOIncludes.objects.filter(store_order__fulfilled_date__isnull=False, store_order__order_year__isnull=False)
+        .annotate(date=TruncDate('store_order__fulfilled_date'))
+        .values('store_order__store_id', 'store_order__order_year', 'date', 'product_id')
+        .annotate(packets=Sum('quantity'), sales=Sum(F('price') * F('quantity'), output_field=DecimalField(max_digits=12, decimal_places=2)))
+        .order_by()
+    )
+    StoreSalesDaily.objects.bulk_create([
+        StoreSalesDaily(
+            store_id=row['store_order__store_id'],
+            year=row['store_order__order_year'],
+            date=row['date'],
+            product_id=row['product_id'],
+            packets=row['packets'] or 0,
+            sales=row['sales'] or 0
+        )
+        for row in grouped
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0013_inventorysnapshot'),
+        ('stores', '0010_storeproducthistory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoreSalesDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('date', models.DateField()),
+                ('packets', models.IntegerField(default=0)),
+                ('sales', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='store_daily_sales', to='products.product')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='stores.store')),
+            ],
+            options={
+                'verbose_name': 'Store Sales Daily',
+                'verbose_name_plural': 'Store Sales Daily',
+                'indexes': [models.Index(fields=['year', 'date'], name='storesalesdaily_year_date_idx')],
+                'unique_together': {('store', 'year', 'date', 'product')},
+            },
+        ),
+        migrations.RunPython(build_daily_sales, migrations.RunPython.noop),
+    ]
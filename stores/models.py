@@ -1,8 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 from products.models import Product
 from django.contrib.auth.models import User
 # import PKT_PRICE from settings
 from django.conf import settings
+from uprising.utils.cache import versioned_cache
 
 
 class Store(models.Model):
@@ -35,47 +36,34 @@ class Store(models.Model):
         return self.store_name
 
     
+    @staticmethod
+    @versioned_cache('store_orders')
+    def get_store_totals(year):
+        """
+        Fulfilled and pending wholesale dollars and packets for an order year, in one query:
+        {fulfilled_sales, pending_sales, fulfilled_packets, pending_packets}
+        """
+        from django.db.models import Sum, F, Q
+        fulfilled = Q(store_order__fulfilled_date__isnull=False)
+        pending = Q(store_order__fulfilled_date__isnull=True)
+
+        totals = SOIncludes.objects.filter(store_order__order_year=int(year) % 100).aggregate(
+            fulfilled_sales=Sum(F('price') * F('quantity'), filter=fulfilled),
+            pending_sales=Sum(F('price') * F('quantity'), filter=pending),
+            fulfilled_packets=Sum('quantity', filter=fulfilled),
+            pending_packets=Sum('quantity', filter=pending),
+        )
+        return {key: value or 0 for key, value in totals.items()}
+
     @staticmethod
     def get_total_store_sales(year):
-        from django.db.models import Sum, F
-        year_suffix = str(year)[-2:]
-        
-        # Fulfilled orders (have fulfilled_date)
-        fulfilled_sales = StoreOrder.objects.filter(
-            order_number__endswith=f'-{year_suffix}',
-            fulfilled_date__isnull=False
-        ).aggregate(
-            total=Sum(F('items__price') * F('items__quantity'))
-        )['total']
-        
-        # Pending orders (no fulfilled_date)
-        pending_sales = StoreOrder.objects.filter(
-            order_number__endswith=f'-{year_suffix}',
-            fulfilled_date__isnull=True
-        ).aggregate(
-            total=Sum(F('items__price') * F('items__quantity'))
-        )['total']
-        
-        return fulfilled_sales if fulfilled_sales else 0, pending_sales if pending_sales else 0
+        totals = Store.get_store_totals(year)
+        return totals['fulfilled_sales'], totals['pending_sales']
     
     @staticmethod
     def get_total_store_packets(year):
-        from django.db.models import Sum
-        year_suffix = str(year)[-2:]
-        
-        # Fulfilled orders (have fulfilled_date)
-        fulfilled_packets = StoreOrder.objects.filter(
-            order_number__endswith=f'-{year_suffix}',
-            fulfilled_date__isnull=False
-        ).aggregate(total=Sum('items__quantity'))['total']
-        
-        # Pending orders (no fulfilled_date)
-        pending_packets = StoreOrder.objects.filter(
-            order_number__endswith=f'-{year_suffix}',
-            fulfilled_date__isnull=True
-        ).aggregate(total=Sum('items__quantity'))['total']
-        
-        return fulfilled_packets if fulfilled_packets else 0, pending_packets if pending_packets else 0
+        totals = Store.get_store_totals(year)
+        return totals['fulfilled_packets'], totals['pending_packets']
         
 
 
@@ -98,18 +86,128 @@ class StoreNote(models.Model):
         return f"Note for {self.store.store_name} ({self.date:%Y-%m-%d})"
 
 
+class StoreOrderQuerySet(models.QuerySet):
+    """
+    Year-scoped StoreOrder filters. Use these instead of order_number__endswith='-YY',
+    which becomes LIKE '%-YY' and can't use an index.
+    """
+
+    def for_year(self, year):
+        # accepts 2 or 4 digit years (25, '25', 2025)
+        return self.filter(order_year=int(year) % 100)
+
+    def fulfilled(self):
+        return self.filter(fulfilled_date__isnull=False)
+
+    def pending(self):
+        return self.filter(fulfilled_date__isnull=True)
+
+
 class StoreOrder(models.Model):
     store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name="orders", to_field='store_num')
     order_number = models.CharField(max_length=100, unique=True, default="XXXXX-XX")
+    # 2-digit year from the order number suffix (W0503-26 -> 26), kept in sync on save
+    order_year = models.IntegerField(null=True, blank=True, editable=False)
     date = models.DateTimeField(null=True, blank=True)
     fulfilled_date = models.DateTimeField(blank=True, null=True)
     notes = models.TextField(blank=True, null=True)
     shipping = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     quickbooks_invoice = models.BooleanField(default=False, blank=True, null=True)
 
+    objects = StoreOrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['store', 'order_year', 'fulfilled_date'], name='storeorder_store_year_idx'),
+            # all-store reports filter on the year without a store
+            models.Index(fields=['order_year', 'fulfilled_date'], name='storeorder_year_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.order_number} for {self.store.store_name}" 
 
+    @staticmethod
+    def parse_order_year(order_number):
+        """
+        2-digit year from an order number like W0503-26, or None if it doesn't have one
+        """
+        year_suffix = (order_number or '').rsplit('-', 1)[-1]
+        return int(year_suffix) if '-' in (order_number or '') and year_suffix.isdigit() else None
+
+    def save(self, *args, **kwargs):
+        self.order_year = self.parse_order_year(self.order_number)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'order_number' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'order_year'}
+        super().save(*args, **kwargs)
+
+
+class StoreOrderSequence(models.Model):
+    """
+    Last order number handed out to a store for an order year (2-digit, e.g. 26).
+    Order numbers must come from next_order_number() -- counting existing orders
+    breaks as soon as two orders are submitted at once or an order is deleted/combined.
+    """
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name="order_sequences", to_field='store_num')
+    year = models.IntegerField()
+    last_number = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('store', 'year')
+
+    def __str__(self):
+        return f"{self.store.store_name} 20{self.year:02d}: {self.last_number}"
+
+    @staticmethod
+    def format_order_number(store_num, number, year):
+        return f"W{store_num:02d}{number:02d}-{year % 100:02d}"
+
+    @staticmethod
+    def highest_existing_number(store, year):
+        """
+        Highest order number already used by the store for the year, parsed from
+        order numbers like W0503-26. Used to start a counter that doesn't exist yet.
+        """
+        year = year % 100
+        prefix_len = len(f"W{store.store_num:02d}")
+        order_numbers = StoreOrder.objects.filter(store=store).for_year(year).values_list('order_number', flat=True)
+
+        numbers = [int(n[prefix_len:-3]) for n in order_numbers if n[prefix_len:-3].isdigit()]
+        return max(numbers, default=0)
+
+    @classmethod
+    def seed(cls, store, year):
+        """
+        Make sure the counter row exists (starting from the orders already placed),
+        so deleting or combining orders can never make a number available again.
+        """
+        year = year % 100
+        sequence, _ = cls.objects.get_or_create(
+            store=store,
+            year=year,
+            defaults={'last_number': lambda: cls.highest_existing_number(store, year)}
+        )
+        return sequence
+
+    @classmethod
+    def next_order_number(cls, store, year):
+        """
+        Allocate the next order number for a store/year. The counter row is locked with
+        select_for_update, so concurrent submissions get distinct numbers. Call it inside
+        the transaction that creates the order so a failed order doesn't burn the number.
+        The row is created first, without the lock: locking a missing row on MySQL takes a
+        gap lock, and two submissions inserting into the same gap deadlock.
+        """
+        year = year % 100
+        # get_or_create falls back to a get when a concurrent insert wins (IntegrityError)
+        seeded = cls.seed(store, year)
+        with transaction.atomic():
+            sequence = cls.objects.select_for_update().get(pk=seeded.pk)
+            sequence.last_number += 1
+            sequence.save(update_fields=['last_number'])
+
+        return cls.format_order_number(store.store_num, sequence.last_number, year)
+
 
 class SOIncludes(models.Model):
     store_order = models.ForeignKey(StoreOrder, on_delete=models.CASCADE, related_name="items")
@@ -125,6 +223,54 @@ class SOIncludes(models.Model):
         return f"{self.quantity} × {self.product} in Order {self.store_order}"
 
 
+class StoreProductHistory(models.Model):
+    """
+    Per store/product/order year (2-digit) ordering history: the first order the product
+    appeared on and the total quantity ordered across the year's orders (pending included).
+    Maintained by stores.history.refresh_product_history whenever order lines change;
+    `manage.py rebuild_product_history` recomputes it from SOIncludes.
+    """
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name="product_history", to_field='store_num')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="store_history")
+    year = models.IntegerField()
+    first_order_number = models.CharField(max_length=100)
+    first_order_date = models.DateTimeField(null=True, blank=True)
+    total_quantity = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Store Product History"
+        verbose_name_plural = "Store Product History"
+        unique_together = ('store', 'year', 'product')
+
+    def __str__(self):
+        return f"{self.store.store_name} 20{self.year:02d}: {self.product} x {self.total_quantity}"
+
+
+class StoreSalesDaily(models.Model):
+    """
+    Fulfilled wholesale sales rolled up per store/product/fulfilled day (order year is 2-digit).
+    Refreshed for a store/year by stores.reports.refresh_store_sales_daily when orders are
+    finalized, edited or deleted; the store sales charts read from here.
+    """
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name="daily_sales", to_field='store_num')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="store_daily_sales")
+    year = models.IntegerField()
+    date = models.DateField()
+    packets = models.IntegerField(default=0)
+    sales = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Store Sales Daily"
+        verbose_name_plural = "Store Sales Daily"
+        unique_together = ('store', 'year', 'date', 'product')
+        indexes = [
+            models.Index(fields=['year', 'date'], name='storesalesdaily_year_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.store.store_name} {self.date}: {self.product} x {self.packets}"
+
+
 class LastSelectedStore(models.Model):
     id = models.AutoField(primary_key=True)
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="last_selected_store")
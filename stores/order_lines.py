@@ -0,0 +1,165 @@
+"""
+Set-based updates of store order lines (SOIncludes).
+
+- finalize_order / save_order_changes: submitted items ({sku_prefix, quantity, has_photo})
+  are resolved to pkt products in one query and diffed against the order's existing lines:
+  unchanged lines are left alone, changed lines are bulk updated, new lines bulk created
+  and leftovers deleted.
+- combine_store_orders: merge_order_groups() folds groups of pending orders into their
+  lowest order number from one query over all involved lines.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+
+from products.models import Product, ProductSalesYear, Variety
+from products.sales import refresh_product_sales
+from stores.catalog import invalidate_store_order_history
+from stores.history import refresh_product_history
+from stores.models import SOIncludes, StoreOrder, StoreOrderSequence
+from stores.reports import refresh_store_sales_daily
+from uprising.utils.cache import invalidate
+
+
+def resolve_order_products(items, skip_missing_pkt=False):
+    """
+    {sku_prefix: pkt Product (with variety loaded)} for the submitted items.
+    Raises Variety.DoesNotExist for an unknown sku_prefix and Product.DoesNotExist for a
+    variety without a pkt product (unless skip_missing_pkt, which only warns).
+    """
+    sku_prefixes = list(dict.fromkeys(item['sku_prefix'] for item in items))
+    products = {
+        product.variety.sku_prefix: product
+        for product in Product.objects.filter(
+            variety__sku_prefix__in=sku_prefixes,
+            sku_suffix='pkt'
+        ).select_related('variety')
+    }
+
+    missing = [sku_prefix for sku_prefix in sku_prefixes if sku_prefix not in products]
+    if missing:
+        known = set(Variety.objects.filter(sku_prefix__in=missing).values_list('sku_prefix', flat=True))
+        for sku_prefix in missing:
+            if sku_prefix not in known:
+                raise Variety.DoesNotExist(f'Variety with sku_prefix {sku_prefix} not found')
+            if not skip_missing_pkt:
+                raise Product.DoesNotExist(f'Packet product not found for variety {sku_prefix}')
+            print(f"Warning: No 'pkt' product found for variety {sku_prefix}")
+
+    return products
+
+
+def sync_order_lines(order, items, products, price):
+    """
+    Make the order's SOIncludes match the submitted items (one line per item, in order).
+    Items whose sku_prefix isn't in `products` are skipped.
+    Returns the resulting SOIncludes (product and variety loaded) in submitted order.
+    """
+    price = Decimal(str(price))
+
+    # order.items sets store_order on each row, so the delete signals don't query for it
+    existing = {}
+    for include in order.items.order_by('id'):
+        existing.setdefault(include.product_id, []).append(include)
+
+    lines, to_create, to_update = [], [], []
+    for item in items:
+        product = products.get(item['sku_prefix'])
+        if product is None:
+            continue
+
+        quantity = int(item['quantity'])
+        photo = bool(item.get('has_photo', False))
+
+        matches = existing.get(product.id)
+        if matches:
+            include = matches.pop(0)
+            if (include.quantity, include.price, include.photo) != (quantity, price, photo):
+                include.quantity, include.price, include.photo = quantity, price, photo
+                to_update.append(include)
+        else:
+            include = SOIncludes(store_order=order, quantity=quantity, price=price, photo=photo)
+            to_create.append(include)
+
+        include.product = product
+        lines.append(include)
+
+    to_delete = [include for leftovers in existing.values() for include in leftovers]
+    affected_products = set(existing) | {line.product_id for line in lines}
+
+    with transaction.atomic():
+        if to_delete:
+            # through order.items, so the deleted rows come back with store_order set as well
+            order.items.filter(pk__in=[include.pk for include in to_delete]).delete()
+        if to_update:
+            SOIncludes.objects.bulk_update(to_update, ['quantity', 'price', 'photo'], batch_size=500)
+        if to_create:
+            SOIncludes.objects.bulk_create(to_create, batch_size=500)
+
+        refresh_product_history(order.store_id, order.order_year, affected_products)
+        invalidate_store_order_history(order.store_id)
+        invalidate('store_orders')
+        if order.fulfilled_date is not None:
+            refresh_store_sales_daily(order.store_id, order.order_year)
+            refresh_product_sales(order.order_year, ProductSalesYear.WHOLESALE, affected_products)
+
+    return lines
+
+
+def merge_order_groups(groups):
+    """
+    Combine each group of orders (same store) into the order with the lowest order number.
+    For a product in several orders the larger quantity wins and photo is kept if any
+    order had it. The other orders are deleted, after seeding their store's order number
+    counters so the numbers are never handed out again.
+    Returns [(target_order, [deleted order numbers])], one per group.
+    """
+    plans = []
+    for orders in groups:
+        orders = sorted(orders, key=lambda order: order.order_number)
+        plans.append((orders[0], orders[1:]))
+
+    lines = {}
+    order_ids = [order.id for target, sources in plans for order in [target, *sources]]
+    for include in SOIncludes.objects.filter(store_order_id__in=order_ids).order_by('id'):
+        lines.setdefault(include.store_order_id, []).append(include)
+
+    to_update = {}
+    for target, sources in plans:
+        # the target's line for a product, else the first source line for it (which moves over)
+        keepers = {}
+        for include in lines.get(target.id, []):
+            keepers.setdefault(include.product_id, include)
+
+        for source in sources:
+            for include in lines.get(source.id, []):
+                keeper = keepers.get(include.product_id)
+                if keeper is None:
+                    include.store_order = target
+                    keepers[include.product_id] = include
+                    to_update[include.id] = include
+                elif include.quantity > keeper.quantity or (include.photo and not keeper.photo):
+                    keeper.quantity = max(keeper.quantity, include.quantity)
+                    keeper.photo = keeper.photo or include.photo
+                    to_update[keeper.id] = keeper
+
+    sources = [source for target, group_sources in plans for source in group_sources]
+
+    with transaction.atomic():
+        if to_update:
+            SOIncludes.objects.bulk_update(list(to_update.values()), ['store_order', 'quantity', 'photo'], batch_size=500)
+
+        counters = {(source.store_id, source.order_year): source.store for source in sources if source.order_year is not None}
+        for (store_num, year), store in counters.items():
+            StoreOrderSequence.seed(store, year)
+
+        # lines that weren't moved go with their orders
+        StoreOrder.objects.filter(id__in=[source.id for source in sources]).delete()
+
+        for store_num, year in {(order.store_id, order.order_year) for target, group_sources in plans for order in [target, *group_sources]}:
+            refresh_product_history(store_num, year)
+        for store_num in {target.store_id for target, group_sources in plans}:
+            invalidate_store_order_history(store_num)
+        invalidate('store_orders')
+
+    return [(target, [source.order_number for source in group_sources]) for target, group_sources in plans]
@@ -0,0 +1,168 @@
+"""
+Per-year store sales and returns reports for the analytics modal.
+
+Each report is one GROUP BY store query (conditional sums over the store's fulfilled
+orders for the year, left joined to that year's returns), cached per 2-digit year until
+the store_orders cache domain changes (orders, items, returns or wholesale prices).
+
+StoreSalesDaily (fulfilled sales per store/product/day) is refreshed per store/year by
+refresh_store_sales_daily() and feeds the store sales charts.
+
+unfulfilled_store_orders is a read-only check for run_reports (see products.reports.REPORTS).
+"""
+import math
+
+from django.db import transaction
+from django.db.models import DecimalField, F, FilteredRelation, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from stores.models import SOIncludes, Store, StoreOrder, StoreSalesDaily, WholesalePktPrice
+from uprising.utils.cache import invalidate, versioned_cache
+
+
+def _packets_sold(year):
+    """
+    Conditional SUM of the store's packets on fulfilled orders for the year
+    """
+    return Coalesce(
+        Sum(
+            'orders__items__quantity',
+            filter=Q(orders__order_year=int(year) % 100, orders__fulfilled_date__isnull=False)
+        ),
+        0
+    )
+
+
+@versioned_cache('store_orders')
+def get_store_sales_report(year):
+    """
+    [{store_num, store_name, total_packets, subtotal, total_shipping, total}] for every store,
+    counting only fulfilled orders of the given 2-digit year.
+    """
+    money = DecimalField(max_digits=12, decimal_places=2)
+    in_year = Q(orders__order_year=int(year) % 100, orders__fulfilled_date__isnull=False)
+    # Shipping is per order, so it can't be summed across the order-items join
+    shipping = (
+        StoreOrder.objects.filter(store=OuterRef('pk')).for_year(year).fulfilled()
+        .order_by()
+        .values('store')
+        .annotate(total=Sum('shipping'))
+        .values('total')
+    )
+
+    stores = (
+        Store.objects.order_by('store_num')
+        .annotate(
+            total_packets=_packets_sold(year),
+            subtotal=Coalesce(
+                Sum(F('orders__items__quantity') * F('orders__items__price'), filter=in_year, output_field=money),
+                Value(0),
+                output_field=money
+            ),
+            total_shipping=Coalesce(Subquery(shipping, output_field=money), Value(0), output_field=money),
+        )
+        .values('store_num', 'store_name', 'total_packets', 'subtotal', 'total_shipping')
+    )
+
+    return [
+        {
+            'store_num': store['store_num'],
+            'store_name': store['store_name'],
+            'total_packets': store['total_packets'],
+            'subtotal': float(store['subtotal']),
+            'total_shipping': float(store['total_shipping']),
+            'total': float(store['subtotal']) + float(store['total_shipping'])
+        }
+        for store in stores
+    ]
+
+
+@versioned_cache('store_orders')
+def get_store_returns_report(year):
+    """
+    Returns (price_per_packet or None, [{store_num, store_name, total_packets_sold,
+    packets_allowed, packets_returned, credit}]) for the given 2-digit year.
+    packets_allowed is 5% of fulfilled packets sold, rounded up ('--' when nothing sold).
+    """
+    price = WholesalePktPrice.objects.filter(year=year).values_list('price_per_packet', flat=True).first()
+
+    stores = (
+        Store.objects.order_by('store_num')
+        .annotate(
+            year_returns=FilteredRelation('returns', condition=Q(returns__return_year=year)),
+            total_packets_sold=_packets_sold(year),
+            packets_returned=Coalesce(F('year_returns__packets_returned'), 0),
+        )
+        .values('store_num', 'store_name', 'total_packets_sold', 'packets_returned')
+    )
+
+    stores_data = []
+    for store in stores:
+        total_packets_sold = store['total_packets_sold']
+        packets_returned = store['packets_returned']
+        stores_data.append({
+            'store_num': store['store_num'],
+            'store_name': store['store_name'],
+            'total_packets_sold': total_packets_sold,
+            'packets_allowed': math.ceil(total_packets_sold * 0.05) if total_packets_sold > 0 else '--',
+            'packets_returned': packets_returned,
+            'credit': float(packets_returned * price) if (price and packets_returned > 0) else 0
+        })
+
+    return price, stores_data
+
+
+def daily_sales_rows(lines):
+    """
+    Unsaved StoreSalesDaily rows from a SOIncludes queryset (fulfilled lines only), in one GROUP BY
+    """
+    money = DecimalField(max_digits=12, decimal_places=2)
+    grouped = (
+        lines.filter(store_order__fulfilled_date__isnull=False, store_order__order_year__isnull=False)
+        .annotate(date=TruncDate('store_order__fulfilled_date'))
+        .values('store_order__store_id', 'store_order__order_year', 'date', 'product_id')
+        .annotate(packets=Sum('quantity'), sales=Sum(F('price') * F('quantity'), output_field=money))
+        .order_by()
+    )
+    return [
+        StoreSalesDaily(
+            store_id=row['store_order__store_id'],
+            year=row['store_order__order_year'],
+            date=row['date'],
+            product_id=row['product_id'],
+            packets=row['packets'] or 0,
+            sales=row['sales'] or 0
+        )
+        for row in grouped
+    ]
+
+
+def refresh_store_sales_daily(store_num, year):
+    """
+    Recompute one store's daily sales rollup for a 2-digit order year
+    """
+    if year is None:
+        return
+
+    rows = daily_sales_rows(SOIncludes.objects.filter(store_order__store_id=store_num, store_order__order_year=year))
+    with transaction.atomic():
+        StoreSalesDaily.objects.filter(store_id=store_num, year=year).delete()
+        StoreSalesDaily.objects.bulk_create(rows, batch_size=1000)
+        invalidate('store_orders')
+
+
+def unfulfilled_store_orders(context, year):
+    """
+    Store orders of the (2-digit) order year that haven't been fulfilled, with their packet counts
+    """
+    orders = (
+        StoreOrder.objects.filter(order_year=year, fulfilled_date__isnull=True)
+        .annotate(packets=Coalesce(Sum('items__quantity'), 0))
+        .order_by('date', 'order_number')
+        .values_list('order_number', 'store__store_name', 'date', 'packets')
+    )
+    return [
+        {'order_number': order_number, 'store': store_name, 'date': timezone.localtime(date).date().isoformat() if date else '--', 'packets': packets}
+        for order_number, store_name, date, packets in orders
+    ]
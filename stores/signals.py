@@ -0,0 +1,41 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from products.models import Variety, Product
+from stores.models import StoreProduct, StoreOrder, SOIncludes
+from stores.catalog import invalidate_store_catalog, invalidate_store_order_history
+
+
+@receiver([post_save, post_delete], sender=StoreProduct)
+def storeproduct_changed(sender, instance, **kwargs):
+    invalidate_store_catalog(instance.store_id)
+
+
+@receiver([post_save, post_delete], sender=Variety)
+def variety_changed(sender, instance, **kwargs):
+    invalidate_store_catalog()
+
+
+@receiver([post_save, post_delete], sender=Product)
+def product_changed(sender, instance, **kwargs):
+    # only pkt products are shown on the wholesale dashboard
+    if instance.sku_suffix == 'pkt':
+        invalidate_store_catalog()
+
+
+@receiver([post_save, post_delete], sender=SOIncludes)
+def order_item_changed(sender, instance, origin=None, **kwargs):
+    # items deleted along with their order are covered by order_deleted
+    if isinstance(origin, StoreOrder) or getattr(origin, 'model', None) is StoreOrder:
+        return
+    if SOIncludes.store_order.is_cached(instance):
+        store_num = instance.store_order.store_id
+    else:
+        store_num = StoreOrder.objects.filter(pk=instance.store_order_id).values_list('store_id', flat=True).first()
+    if store_num is not None:
+        invalidate_store_order_history(store_num)
+
+
+@receiver(post_delete, sender=StoreOrder)
+def order_deleted(sender, instance, **kwargs):
+    invalidate_store_order_history(instance.store_id)
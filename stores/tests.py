@@ -1,3 +1,481 @@
-#from django.test import TestCase
 import json
-# Create your tests here.
+import threading
+
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, Client
+from django.utils import timezone
+
+from products.models import Variety, Product
+from stores.models import Store, StoreProduct, StoreOrder, StoreOrderSequence, SOIncludes, StoreReturns, WholesalePktPrice, StoreProductHistory, StoreSalesDaily
+from stores.catalog import GENERATION_KEY, invalidate_store_catalog
+from stores.history import rebuild_product_history
+from stores.availability import resolve_pkt_products, set_products_availability, replace_store_availability
+from stores.order_lines import resolve_order_products, sync_order_lines, merge_order_groups
+from stores.reports import get_store_sales_report, get_store_returns_report
+
+
+class StoreOrderSequenceTests(TestCase):
+
+    def setUp(self):
+        self.store = Store.objects.create(store_num=7, store_name="Test Store")
+
+    def test_numbers_continue_after_existing_orders(self):
+        StoreOrder.objects.create(store=self.store, order_number="W0701-26")
+        StoreOrder.objects.create(store=self.store, order_number="W0703-26")
+        StoreOrder.objects.create(store=self.store, order_number="W0709-25")
+
+        self.assertEqual(StoreOrderSequence.next_order_number(self.store, 26), "W0704-26")
+        self.assertEqual(StoreOrderSequence.next_order_number(self.store, 2026), "W0705-26")
+
+    def test_deleted_order_number_is_not_reused(self):
+        StoreOrder.objects.create(store=self.store, order_number=StoreOrderSequence.next_order_number(self.store, 26))
+        last = StoreOrder.objects.create(store=self.store, order_number=StoreOrderSequence.next_order_number(self.store, 26))
+        last.delete()
+
+        self.assertEqual(StoreOrderSequence.next_order_number(self.store, 26), "W0703-26")
+
+
+class DashboardOrderTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="store09", password="pw")
+        self.store = Store.objects.create(store_num=9, store_name="Store 9", store_user=self.user)
+        for i in range(2):
+            variety = Variety.objects.create(sku_prefix=f"PEA-T{i}", var_name=f"Pea {i}")
+            product = Product.objects.create(variety=variety, sku_suffix="pkt")
+            StoreProduct.objects.create(store=self.store, product=product, is_available=True)
+        self.client.force_login(self.user)
+
+    def submit(self, data):
+        return self.client.post(f"/accounts/{self.user.username}/", data=json.dumps(data), content_type="application/json")
+
+    def test_order_lines(self):
+        response = self.submit({"quantity_PEA-T0": "3", "quantity_PEA-T1": 0})
+        self.assertEqual(response.json()['items_created'], 1)
+        self.assertEqual(list(SOIncludes.objects.values_list('product__variety__sku_prefix', 'quantity')), [("PEA-T0", 3)])
+
+    def test_bad_quantities_are_skipped(self):
+        for quantity in ("two", "", None, [1]):
+            response = self.submit({"quantity_PEA-T0": 2, "quantity_PEA-T1": quantity})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['items_created'], 1)
+        self.assertEqual(set(SOIncludes.objects.values_list('product__variety__sku_prefix', flat=True)), {"PEA-T0"})
+
+    def test_failure_after_the_inserts_writes_nothing(self):
+        with mock.patch('stores.views.refresh_product_history', side_effect=RuntimeError("disk full")):
+            response = self.submit({"quantity_PEA-T0": 2, "quantity_PEA-T1": 1})
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(StoreOrder.objects.exists())
+        self.assertFalse(SOIncludes.objects.exists())
+
+        # the order number handed out in the failed attempt is rolled back too
+        self.assertEqual(self.submit({"quantity_PEA-T0": 2}).json()['order_number'], f"W0901-{settings.CURRENT_ORDER_YEAR % 100:02d}")
+
+
+class StoreOrderYearTests(TestCase):
+
+    def setUp(self):
+        self.store = Store.objects.create(store_num=7, store_name="Test Store")
+
+    def test_order_year_follows_order_number(self):
+        order = StoreOrder.objects.create(store=self.store, order_number="W0701-25")
+        self.assertEqual(order.order_year, 25)
+
+        order.order_number = "W0701-26"
+        order.save(update_fields=['order_number'])
+        order.refresh_from_db()
+        self.assertEqual(order.order_year, 26)
+
+        self.assertIsNone(StoreOrder.objects.create(store=self.store).order_year)
+
+    def test_for_year_accepts_two_and_four_digit_years(self):
+        StoreOrder.objects.create(store=self.store, order_number="W0701-26", fulfilled_date=timezone.now())
+        StoreOrder.objects.create(store=self.store, order_number="W0702-26")
+        StoreOrder.objects.create(store=self.store, order_number="W0701-25")
+
+        self.assertEqual(StoreOrder.objects.for_year(2026).count(), 2)
+        self.assertEqual(StoreOrder.objects.for_year("26").fulfilled().count(), 1)
+        self.assertEqual(StoreOrder.objects.for_year(26).pending().get().order_number, "W0702-26")
+
+
+class DashboardCacheTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="store07", password="pw")
+        self.store = Store.objects.create(store_num=7, store_name="Test Store", store_user=self.user)
+        self.client.force_login(self.user)
+        self.products = []
+        for i in range(3):
+            variety = Variety.objects.create(sku_prefix=f"CAR-T{i}", var_name=f"Carrot {i}")
+            self.products.append(Product.objects.create(variety=variety, sku_suffix="pkt"))
+        StoreProduct.objects.create(store=self.store, product=self.products[0], is_available=True)
+
+    def get_dashboard(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get(f"/accounts/{self.user.username}/")
+
+    def test_catalog_follows_store_products_and_varieties(self):
+        self.assertEqual(json.loads(self.get_dashboard().context['product_dict_json']), {"CAR-T0": ["Carrot 0", None]})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            StoreProduct.objects.create(store=self.store, product=self.products[1], is_available=True)
+            variety = self.products[0].variety
+            variety.var_name = "Renamed"
+            variety.save()
+
+        self.assertEqual(
+            json.loads(self.get_dashboard().context['product_dict_json']),
+            {"CAR-T0": ["Renamed", None], "CAR-T1": ["Carrot 1", None]}
+        )
+
+    def test_culled_generation_doesnt_serve_old_catalog(self):
+        cache.clear()
+        self.get_dashboard()
+        # not committed, so only the generation bump below drops the cached catalog
+        StoreProduct.objects.create(store=self.store, product=self.products[1], is_available=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_store_catalog()
+
+        # the generation is evicted; the catalog cached under the first one must not come back
+        cache.delete(GENERATION_KEY)
+        self.assertEqual(set(json.loads(self.get_dashboard().context['product_dict_json'])), {"CAR-T0", "CAR-T1"})
+
+    def test_previously_ordered_counts_include_new_orders(self):
+        self.get_dashboard()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f"/accounts/{self.user.username}/",
+                data=json.dumps({"quantity_CAR-T0": 4}),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(json.loads(self.get_dashboard().context['previous_items']), {"CAR-T0": 4})
+
+
+class StoreReportTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        product = Product.objects.create(variety=Variety.objects.create(sku_prefix="PEA-SP", var_name="Pea"), sku_suffix="pkt")
+        self.stores = [Store.objects.create(store_num=num, store_name=f"Store {num}") for num in (1, 2, 3)]
+        WholesalePktPrice.objects.create(year=25, price_per_packet=Decimal("2.50"))
+        StoreReturns.objects.create(store=self.stores[0], return_year=25, packets_returned=3)
+
+        fulfilled = timezone.now()
+        orders = [
+            StoreOrder.objects.create(store=self.stores[0], order_number="W0101-25", fulfilled_date=fulfilled, shipping=Decimal("4")),
+            StoreOrder.objects.create(store=self.stores[0], order_number="W0102-25", fulfilled_date=fulfilled, shipping=Decimal("6")),
+            StoreOrder.objects.create(store=self.stores[0], order_number="W0103-25"),
+            StoreOrder.objects.create(store=self.stores[1], order_number="W0201-24", fulfilled_date=fulfilled),
+        ]
+        for order, quantity in zip(orders, (10, 30, 50, 70)):
+            SOIncludes.objects.create(store_order=order, product=product, quantity=quantity, price=Decimal("2.00"))
+            SOIncludes.objects.create(store_order=order, product=product, quantity=1, price=Decimal("2.00"))
+
+    def test_sales_report(self):
+        with self.assertNumQueries(1):
+            report = get_store_sales_report(25)
+
+        self.assertEqual(report[0], {
+            'store_num': 1, 'store_name': "Store 1", 'total_packets': 42,
+            'subtotal': 84.0, 'total_shipping': 10.0, 'total': 94.0
+        })
+        self.assertEqual([row['total'] for row in report[1:]], [0, 0])
+
+    def test_returns_report(self):
+        with self.assertNumQueries(2):
+            price, report = get_store_returns_report(25)
+
+        self.assertEqual(price, Decimal("2.50"))
+        self.assertEqual(report[0], {
+            'store_num': 1, 'store_name': "Store 1", 'total_packets_sold': 42,
+            'packets_allowed': 3, 'packets_returned': 3, 'credit': 7.5
+        })
+        self.assertEqual(report[1]['packets_allowed'], '--')
+        self.assertEqual(report[1]['packets_returned'], 0)
+
+    def test_reports_are_cached_until_store_orders_change(self):
+        get_store_sales_report(25)
+        get_store_returns_report(25)
+        # update() bypasses the cache receivers
+        StoreOrder.objects.filter(order_number="W0103-25").update(fulfilled_date=timezone.now())
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_store_sales_report(25)[0]['total_packets'], 42)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            StoreReturns.objects.filter(store=self.stores[0], return_year=25).get().delete()
+        self.assertEqual(get_store_sales_report(25)[0]['total_packets'], 93)
+        self.assertEqual(get_store_returns_report(25)[1][0]['packets_returned'], 0)
+
+
+class StoreAvailabilityTests(TestCase):
+
+    def setUp(self):
+        self.stores = [Store.objects.create(store_num=num, store_name=f"Store {num}") for num in range(1, 6)]
+        self.products = {}
+        for i in range(6):
+            variety = Variety.objects.create(sku_prefix=f"BEA-T{i}", var_name=f"Bean {i}")
+            self.products[variety.sku_prefix] = Product.objects.create(variety=variety, sku_suffix="pkt")
+        StoreProduct.objects.create(store=self.stores[0], product=self.products["BEA-T0"], is_available=False)
+
+    def available(self, store):
+        return set(
+            StoreProduct.objects.filter(store=store, is_available=True)
+            .values_list('product__variety__sku_prefix', flat=True)
+        )
+
+    def test_resolve_skips_prefixes_without_pkt_product(self):
+        self.assertEqual(set(resolve_pkt_products(["BEA-T1", "NOPE"])), {"BEA-T1"})
+
+    def test_query_count_does_not_grow_with_stores_or_products(self):
+        # one insert of the missing rows and one update inside a savepoint
+        with self.assertNumQueries(4):
+            set_products_availability([1], [self.products["BEA-T0"].id], True)
+        with self.assertNumQueries(4):
+            self.assertEqual(set_products_availability(range(1, 6), [product.id for product in self.products.values()], True), 30)
+
+        self.assertEqual(StoreProduct.objects.filter(is_available=True).count(), 30)
+
+        set_products_availability([1, 2], [self.products["BEA-T0"].id], False)
+        self.assertNotIn("BEA-T0", self.available(self.stores[0]))
+        self.assertIn("BEA-T0", self.available(self.stores[2]))
+
+    def test_replace_store_availability(self):
+        set_products_availability([1], [self.products["BEA-T1"].id, self.products["BEA-T2"].id], True)
+        replace_store_availability(self.stores[0], [self.products["BEA-T2"].id, self.products["BEA-T3"].id])
+
+        self.assertEqual(self.available(self.stores[0]), {"BEA-T2", "BEA-T3"})
+        self.assertEqual(StoreProduct.objects.filter(store=self.stores[0]).count(), 4)
+
+    def test_update_only_and_without_upsert_target(self):
+        self.assertEqual(set_products_availability([1, 2], [self.products["BEA-T0"].id], True, create_missing=False), 1)
+        self.assertEqual(StoreProduct.objects.count(), 1)
+
+        # MySQL can't name the unique fields of an upsert (bulk_create would raise NotSupportedError)
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False):
+            set_products_availability([1, 2], [self.products["BEA-T0"].id, self.products["BEA-T1"].id], True)
+        self.assertEqual(self.available(self.stores[1]), {"BEA-T0", "BEA-T1"})
+
+
+class OrderLinesTests(TestCase):
+
+    def setUp(self):
+        self.store = Store.objects.create(store_num=4, store_name="Store 4")
+        self.order = StoreOrder.objects.create(store=self.store, order_number="W0401-26")
+        self.products = {}
+        for i in range(4):
+            variety = Variety.objects.create(sku_prefix=f"SQU-T{i}", var_name=f"Squash {i}")
+            self.products[variety.sku_prefix] = Product.objects.create(variety=variety, sku_suffix="pkt")
+        Variety.objects.create(sku_prefix="SQU-BULK", var_name="Bulk only")
+        for sku_prefix, quantity in (("SQU-T0", 5), ("SQU-T1", 6), ("SQU-T2", 7)):
+            SOIncludes.objects.create(store_order=self.order, product=self.products[sku_prefix], quantity=quantity, price=Decimal("2.55"))
+
+    def test_resolve_errors(self):
+        with self.assertRaisesMessage(Variety.DoesNotExist, "NOPE"):
+            resolve_order_products([{'sku_prefix': "NOPE"}])
+        with self.assertRaisesMessage(Product.DoesNotExist, "SQU-BULK"):
+            resolve_order_products([{'sku_prefix': "SQU-BULK"}])
+        self.assertEqual(list(resolve_order_products([{'sku_prefix': "SQU-BULK"}], skip_missing_pkt=True)), [])
+
+    def test_sync_diffs_existing_lines(self):
+        items = [
+            {'sku_prefix': "SQU-T3", 'quantity': 9, 'has_photo': True},
+            {'sku_prefix': "SQU-T0", 'quantity': 5},
+            {'sku_prefix': "SQU-T1", 'quantity': 8},
+        ]
+        unchanged_id = SOIncludes.objects.get(product=self.products["SQU-T0"]).id
+        products = resolve_order_products(items)
+
+        # load lines, select + delete leftovers, update + insert, then refresh the product history (read + delete + insert)
+        with self.assertNumQueries(12):
+            lines = sync_order_lines(self.order, items, products, 2.55)
+
+        self.assertEqual([(line.product.variety.sku_prefix, line.quantity) for line in lines],
+                         [("SQU-T3", 9), ("SQU-T0", 5), ("SQU-T1", 8)])
+        self.assertEqual(
+            set(self.order.items.values_list('product__variety__sku_prefix', 'quantity', 'photo')),
+            {("SQU-T3", 9, True), ("SQU-T0", 5, False), ("SQU-T1", 8, False)}
+        )
+        self.assertTrue(self.order.items.filter(id=unchanged_id).exists())
+
+
+class MergeOrderGroupsTests(TestCase):
+
+    def setUp(self):
+        self.products = []
+        for i in range(3):
+            variety = Variety.objects.create(sku_prefix=f"KAL-T{i}", var_name=f"Kale {i}")
+            self.products.append(Product.objects.create(variety=variety, sku_suffix="pkt"))
+        self.stores = [Store.objects.create(store_num=num, store_name=f"Store {num}") for num in (5, 6)]
+
+    def make_order(self, store, order_number, lines):
+        order = StoreOrder.objects.create(store=store, order_number=order_number)
+        for product, quantity, photo in lines:
+            SOIncludes.objects.create(store_order=order, product=product, quantity=quantity, price=Decimal("2.55"), photo=photo)
+        return order
+
+    def test_merges_several_groups(self):
+        kale0, kale1, kale2 = self.products
+        first = [
+            self.make_order(self.stores[0], "W0502-26", [(kale0, 9, False), (kale1, 2, True)]),
+            self.make_order(self.stores[0], "W0501-26", [(kale0, 4, True)]),
+            self.make_order(self.stores[0], "W0503-26", [(kale1, 5, False), (kale2, 1, False)]),
+        ]
+        second = [
+            self.make_order(self.stores[1], "W0601-26", []),
+            self.make_order(self.stores[1], "W0602-26", [(kale2, 3, False)]),
+        ]
+
+        combined = merge_order_groups([first, second])
+
+        self.assertEqual([(target.order_number, deleted) for target, deleted in combined],
+                         [("W0501-26", ["W0502-26", "W0503-26"]), ("W0601-26", ["W0602-26"])])
+        self.assertEqual(StoreOrder.objects.count(), 2)
+        self.assertEqual(
+            set(SOIncludes.objects.values_list('store_order__order_number', 'product__variety__sku_prefix', 'quantity', 'photo')),
+            {
+                ("W0501-26", "KAL-T0", 9, True),
+                ("W0501-26", "KAL-T1", 5, True),
+                ("W0501-26", "KAL-T2", 1, False),
+                ("W0601-26", "KAL-T2", 3, False),
+            }
+        )
+        self.assertEqual(StoreOrderSequence.next_order_number(self.stores[0], 26), "W0504-26")
+
+
+class StoreProductHistoryTests(TestCase):
+
+    def setUp(self):
+        self.store = Store.objects.create(store_num=8, store_name="Store 8")
+        self.products = []
+        for i in range(3):
+            variety = Variety.objects.create(sku_prefix=f"LET-T{i}", var_name=f"Lettuce {i}")
+            self.products.append(Product.objects.create(variety=variety, sku_suffix="pkt"))
+
+    def history(self):
+        return set(StoreProductHistory.objects.values_list('product__variety__sku_prefix', 'year', 'first_order_number', 'total_quantity'))
+
+    def sync(self, order_number, lines):
+        order, _ = StoreOrder.objects.get_or_create(store=self.store, order_number=order_number)
+        items = [{'sku_prefix': f"LET-T{i}", 'quantity': quantity} for i, quantity in lines]
+        sync_order_lines(order, items, resolve_order_products(items), 2.55)
+        return order
+
+    def test_history_follows_order_changes(self):
+        self.sync("W0801-26", [(0, 5), (1, 2)])
+        second = self.sync("W0802-26", [(1, 3), (2, 4)])
+        self.sync("W0801-25", [(0, 1)])
+        self.assertEqual(self.history(), {
+            ("LET-T0", 26, "W0801-26", 5), ("LET-T1", 26, "W0801-26", 5),
+            ("LET-T2", 26, "W0802-26", 4), ("LET-T0", 25, "W0801-25", 1),
+        })
+
+        self.sync("W0801-26", [(0, 5)])
+        self.assertIn(("LET-T1", 26, "W0802-26", 3), self.history())
+
+        merge_order_groups([[StoreOrder.objects.get(order_number="W0801-26"), second]])
+        self.assertEqual(self.history(), {
+            ("LET-T0", 26, "W0801-26", 5), ("LET-T1", 26, "W0801-26", 3),
+            ("LET-T2", 26, "W0801-26", 4), ("LET-T0", 25, "W0801-25", 1),
+        })
+
+        expected = self.history()
+        StoreProductHistory.objects.all().delete()
+        self.assertEqual(rebuild_product_history(), 4)
+        self.assertEqual(self.history(), expected)
+
+    def test_history_without_upsert_target(self):
+        # MySQL can't name the unique fields of an upsert (bulk_create would raise NotSupportedError)
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False):
+            self.sync("W0801-26", [(0, 5), (1, 2)])
+            self.sync("W0801-26", [(0, 6)])
+        self.assertEqual(self.history(), {("LET-T0", 26, "W0801-26", 6)})
+
+
+class StoreSalesRollupTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.store = Store.objects.create(store_num=9, store_name="Store 9")
+        self.products = []
+        for i in range(2):
+            variety = Variety.objects.create(sku_prefix=f"ONI-T{i}", var_name=f"Onion {i}")
+            self.products.append(Product.objects.create(variety=variety, sku_suffix="pkt"))
+
+    def order(self, order_number, lines, fulfilled=True):
+        order = StoreOrder.objects.create(store=self.store, order_number=order_number, fulfilled_date=timezone.now() if fulfilled else None)
+        items = [{'sku_prefix': f"ONI-T{i}", 'quantity': quantity} for i, quantity in lines]
+        sync_order_lines(order, items, resolve_order_products(items), Decimal("2.00"))
+        return order
+
+    def test_store_totals(self):
+        self.order("W0901-26", [(0, 3), (1, 2)])
+        self.order("W0902-26", [(0, 10)], fulfilled=False)
+        self.order("W0901-25", [(0, 100)])
+
+        with self.assertNumQueries(1):
+            totals = Store.get_store_totals(2026)
+        self.assertEqual(totals, {'fulfilled_sales': 10, 'pending_sales': 20, 'fulfilled_packets': 5, 'pending_packets': 10})
+
+    def test_rollup_follows_finalized_orders(self):
+        first = self.order("W0901-26", [(0, 3), (1, 2)])
+        self.order("W0902-26", [(0, 4)])
+        self.order("W0903-26", [(1, 7)], fulfilled=False)
+
+        self.assertEqual(
+            set(StoreSalesDaily.objects.values_list('product__variety__sku_prefix', 'date', 'packets', 'sales')),
+            {("ONI-T0", timezone.now().date(), 7, Decimal("14.00")), ("ONI-T1", timezone.now().date(), 2, Decimal("4.00"))}
+        )
+
+        sync_order_lines(first, [], {}, Decimal("2.00"))
+        self.assertEqual(list(StoreSalesDaily.objects.values_list('packets', flat=True)), [4])
+
+
+class ConcurrentOrderSubmissionTests(TransactionTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="store07", password="pw")
+        self.store = Store.objects.create(store_num=7, store_name="Test Store", store_user=self.user)
+        for i in range(3):
+            variety = Variety.objects.create(sku_prefix=f"CAR-T{i}", var_name=f"Carrot {i}")
+            product = Product.objects.create(variety=variety, sku_suffix="pkt")
+            StoreProduct.objects.create(store=self.store, product=product, is_available=True)
+
+    def test_parallel_submissions_get_distinct_order_numbers(self):
+        submissions = 8
+        start = threading.Barrier(submissions)
+        responses = []
+
+        def submit():
+            client = Client()
+            client.force_login(self.user)
+            start.wait(timeout=30)
+            try:
+                responses.append(client.post(
+                    f"/accounts/{self.user.username}/",
+                    data=json.dumps({"quantity_CAR-T0": 2, "quantity_CAR-T1": 1}),
+                    content_type="application/json",
+                ))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=submit) for _ in range(submissions)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([r.status_code for r in responses], [200] * submissions)
+        order_numbers = sorted(r.json()['order_number'] for r in responses)
+        year = settings.CURRENT_ORDER_YEAR % 100
+        self.assertEqual(order_numbers, [f"W07{n:02d}-{year:02d}" for n in range(1, submissions + 1)])
+        self.assertEqual(StoreOrder.objects.filter(store=self.store).count(), submissions)
@@ -2,9 +2,11 @@ from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from .forms import LoginForm
 from .models import Store
-from products.models import Product, Variety
+from products.models import Variety
 import json
-from .models import StoreOrder, SOIncludes
+from .models import StoreOrder, SOIncludes, StoreOrderSequence
+from .catalog import get_store_catalog, get_store_order_history, invalidate_store_order_history
+from .history import refresh_product_history
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.views import LoginView, LogoutView
@@ -13,12 +15,13 @@ from django.http import JsonResponse, HttpResponseNotFound, HttpResponseForbidde
 from django.template.loader import render_to_string
 from django.utils import timezone
 from django.conf import settings
-from django.db.models import Sum
+from django.db import transaction
 import pytz
 from django.views.decorators.http import require_http_methods
 from django.shortcuts import get_object_or_404
 from django.http.request import RawPostDataException
 from uprising.utils.auth import is_employee
+from uprising.utils.cache import invalidate
 from django.contrib.admin.views.decorators import user_passes_test
 
 
@@ -51,26 +54,15 @@ def dashboard(request, store_name):
     # Replace the POST handling section in your dashboard view with this:
 
     if request.method == 'POST':
-        print("POST request received in dashboard view")
-        
         try:
             # Process the form submission - handle potential RawPostDataException
             try:
                 order_data = json.loads(request.body)
             except RawPostDataException:
                 # If body was already read, try to get data from request.POST
-                print("Request body already read, trying request.POST")
-                order_data = {}
-                for key, value in request.POST.items():
-                    if key != 'csrfmiddlewaretoken':
-                        try:
-                            order_data[key] = int(value)
-                        except ValueError:
-                            continue
-            
-            print("ORDER DATA:", order_data)
-            print("Order data type:", type(order_data))
-            print("Order data keys:", list(order_data.keys()) if order_data else "No keys")
+                order_data = {
+                    key: value for key, value in request.POST.items() if key != 'csrfmiddlewaretoken'
+                }
             
             if not order_data:
                 return JsonResponse({'error': 'No order data received'}, status=400)
@@ -86,108 +78,61 @@ def dashboard(request, store_name):
                     # If it doesn't start with quantity_, assume it's already a SKU prefix
                     processed_order_data[key] = quantity
             
-            print("PROCESSED ORDER DATA:", processed_order_data)
-            
-            invalid_products = []
-            
-            # Check for invalid products using the processed SKU prefixes
-            for sku_prefix in processed_order_data.keys():
-                print(f"Checking SKU prefix: {sku_prefix}")
+            # Form posts send quantities as strings; entries that aren't whole numbers
+            # (including blank fields) are skipped, like an empty quantity box
+            quantities = {}
+            for sku_prefix, quantity in processed_order_data.items():
                 try:
-                    # Check if a 'pkt' product with this SKU prefix exists in the store's available products
-                    exists = store.available_products.filter(
-                        variety__sku_prefix=sku_prefix,
-                        sku_suffix='pkt'
-                    ).exists()
-                    print(f"SKU {sku_prefix} exists: {exists}")
-                    
-                    if not exists:
-                        invalid_products.append(sku_prefix)
-                except Exception as e:
-                    print(f"Error checking SKU prefix {sku_prefix}: {e}")
-                    invalid_products.append(sku_prefix)
+                    quantities[sku_prefix] = int(quantity)
+                except (TypeError, ValueError):
+                    continue
+            processed_order_data = quantities
             
-            print(f"Invalid products: {invalid_products}")
+            # Resolve every 'pkt' product in the store's available products with one query
+            product_ids = dict(
+                store.available_products.filter(
+                    variety__sku_prefix__in=list(processed_order_data),
+                    sku_suffix='pkt'
+                ).values_list('variety__sku_prefix', 'id')
+            )
             
+            invalid_products = [
+                sku_prefix for sku_prefix in processed_order_data if sku_prefix not in product_ids
+            ]
             if invalid_products:
-                print("Invalid products found:", invalid_products)
                 return JsonResponse({'invalid_products': invalid_products}, status=400)
             
-            print("All products valid, creating order...")
+            # Skip if quantity is 0 or negative
+            order_lines = [
+                (product_ids[sku_prefix], quantity)
+                for sku_prefix, quantity in processed_order_data.items()
+                if quantity > 0
+            ]
             
-            # Create the order
+            # Create the order and its items together, so a failure never leaves a partial order
             try:
-                existing_orders = StoreOrder.objects.filter(store=store, order_number__endswith=f"-{year_suffix}")
-                this_year_order_count = existing_orders.count() + 1
-                print(f"This year order count: {this_year_order_count}")
-                
-                pacific_tz = pytz.timezone('US/Pacific')
-                pacific_now = timezone.now().astimezone(pacific_tz).date()
-                # print(f"Pacific now: {pacific_now}")
-                
-                order = StoreOrder.objects.create(
-                    store=store,
-                    order_number=f"W{store.store_num:02d}{this_year_order_count:02d}-{year_suffix}",
-                    date=pacific_now,
-                )
-                
-                print(f"Created order: {order.order_number}")
-            except Exception as e:
-                print(f"Error creating order: {e}")
-                return JsonResponse({'error': f'Error creating order: {str(e)}'}, status=500)
-            
-            # Create SOIncludes entries for each product in the order
-            items_created = 0
-            for sku_prefix, quantity in processed_order_data.items():  # Use processed_order_data here
-                print(f"Processing SKU: {sku_prefix}, Quantity: {quantity}")
-                
-                # Skip if quantity is 0 or negative
-                if not quantity or quantity <= 0:
-                    print(f"Skipping SKU {sku_prefix} - invalid quantity: {quantity}")
-                    continue
-                    
-                try:
-                    # Find the product by SKU prefix through the variety, specifically the 'pkt' product
-                    product = Product.objects.select_related('variety').get(
-                        variety__sku_prefix=sku_prefix,
-                        sku_suffix='pkt'
-                    )
-                    
-                    print(f"Found product: {product.variety.var_name} (ID: {product.id})")
-                    print(f"About to create SOIncludes with:")
-                    # print(f"  - store_order: {order} (ID: {order.id})")
-                    print(f"  - product: {product} (ID: {product.id})")
-                    print(f"  - quantity: {quantity}")
-                    print(f"  - price: {pkt_price}")
+                with transaction.atomic():
+                    pacific_tz = pytz.timezone('US/Pacific')
+                    pacific_now = timezone.now().astimezone(pacific_tz).date()
                     
-                    so_include = SOIncludes.objects.create(
-                        store_order=order,
-                        product=product,
-                        quantity=quantity,
-                        price=pkt_price,
+                    order = StoreOrder.objects.create(
+                        store=store,
+                        order_number=StoreOrderSequence.next_order_number(store, current_year),
+                        date=pacific_now,
                     )
                     
-                    items_created += 1
-                    print(f"Successfully created SOIncludes: ID={so_include.id}")
-                    
-                    # Verify it was actually saved
-                    verify_so_include = SOIncludes.objects.get(id=so_include.id)
-                    print(f"Verification - SOIncludes {verify_so_include.id} exists with quantity {verify_so_include.quantity}")
-                    
-                except Product.DoesNotExist:
-                    print(f"ERROR: Product with SKU prefix {sku_prefix} and sku_suffix='pkt' does not exist")
-                    # Let's see what products DO exist with this SKU prefix
-                    matching_products = Product.objects.filter(variety__sku_prefix=sku_prefix)
-                    print(f"Products found with SKU prefix {sku_prefix}: {list(matching_products.values('id', 'sku_suffix'))}")
-                    continue
-                except Exception as e:
-                    print(f"ERROR creating SOIncludes for SKU {sku_prefix}: {e}")
-                    print(f"Error type: {type(e)}")
-                    import traceback
-                    traceback.print_exc()
-                    continue
+                    SOIncludes.objects.bulk_create([
+                        SOIncludes(store_order=order, product_id=product_id, quantity=quantity, price=pkt_price)
+                        for product_id, quantity in order_lines
+                    ])
+                    # bulk_create skips the post_save signals
+                    invalidate_store_order_history(store.store_num)
+                    invalidate('store_orders')
+                    refresh_product_history(store.store_num, order.order_year, [product_id for product_id, quantity in order_lines])
+            except Exception as e:
+                return JsonResponse({'error': f'Error creating order: {str(e)}'}, status=500)
             
-            print(f"Order {order.order_number} created successfully with {items_created} items")
+            items_created = len(order_lines)
             
             # Return success response for AJAX
             return JsonResponse({
@@ -213,40 +158,13 @@ def dashboard(request, store_name):
     # Get all orders for the current year for this store
 
     # Get all orders for the current year for this store
-    current_year_orders = StoreOrder.objects.filter(
-        store=store,
-        order_number__endswith=f"-{year_suffix}"
-    ).prefetch_related('items__product__variety').order_by('-date')
-
-    # --- Previous Orders: total quantity per product sku_prefix ---
-    previous_orders = (
-        SOIncludes.objects
-        .filter(store_order__store=store)  # This might also need to be 'order__store' depending on your field name
-        .values('product__variety__sku_prefix')
-        .annotate(total_qty=Sum('quantity'))
-    )
+    current_year_orders = StoreOrder.objects.filter(store=store).for_year(current_year).prefetch_related('items__product__variety').order_by('-date')
 
-    # Convert to dictionary: { 'sku_prefix': total_qty }
-    previous_items_dict = {
-        entry['product__variety__sku_prefix']: entry['total_qty']
-        for entry in previous_orders
-        if entry['product__variety__sku_prefix']  # Skip None values
-    }
+    # --- Previous Orders: total quantity per product sku_prefix (cached per store) ---
+    previous_items_dict = get_store_order_history(store)
 
-    # --- Get all available products for the store ---
-    try:
-        # Try the relationship name you're using in your template/view
-        products = store.available_products.filter(
-            sku_suffix='pkt',
-            storeproduct__is_available=True
-        ).select_related('variety').order_by('variety__category', 'variety__crop', 'variety__var_name')
-    except AttributeError:
-        # Fallback if the relationship name is different
-        products = Product.objects.filter(
-            storeproduct__store=store,
-            storeproduct__is_available=True,
-            sku_suffix='pkt'
-        ).select_related('variety').order_by('variety__category', 'variety__crop', 'variety__var_name')
+    # --- Get all available products for the store (cached per store) ---
+    products, product_dict_json = get_store_catalog(store)
 
     # Attach previously ordered count using variety.sku_prefix
     for product in products:
@@ -289,16 +207,6 @@ def dashboard(request, store_name):
             'fulfilled_status': fulfilled_status
         })
 
-    # --- Prepare product dictionary for JS ---
-    product_dict = {}
-    for product in products:
-        variety = getattr(product, 'variety', None)
-        if variety and getattr(variety, 'sku_prefix', None):
-            product_dict[variety.sku_prefix] = [
-                getattr(variety, 'var_name', ''), 
-                getattr(variety, 'crop', '')
-            ]
-
     # --- Render context ---
     context = {
         'store': store,
@@ -310,7 +218,7 @@ def dashboard(request, store_name):
         'current_year': current_year,
         'year_suffix': year_suffix,
         'pkt_price': pkt_price,
-        'product_dict_json': json.dumps(product_dict),
+        'product_dict_json': product_dict_json,
     }
 
     return render(request, 'stores/dashboard.html', context)
@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 from pathlib import Path
 import os
+import sys
 from decouple import config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -50,6 +51,15 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            # take the write lock when a transaction starts, so concurrent atomic blocks
+            # (e.g. order number allocation) wait their turn instead of failing with "database is locked"
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+            },
+            # file backed so threaded tests see real locking (an in-memory db fails fast with "table is locked")
+            'TEST': {
+                'NAME': BASE_DIR / 'test_db.sqlite3',
+            },
         }
     }
 
@@ -103,6 +113,26 @@ TEMPLATES = [
     },
 ]
 
+# File based so every web worker shares the same cache (see uprising/utils/cache.py for the versioned analytics keys).
+# Old versions are never read again and age out; the default 300 entry cap is too low for them.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    }
+}
+
+# Tests clear and count cache hits, so they get a cache of their own instead of the shared files
+if len(sys.argv) > 1 and sys.argv[1] == 'test':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -203,6 +233,11 @@ WEBSITE_STOCK = False
 
 TRANSITION = False  # whether we are in the transition period between years (July - November)
 
+# Parsed Shopify inventory exports are kept here as compressed snapshots (see products/snapshots.py)
+INVENTORY_SNAPSHOT_DIR = os.path.join(BASE_DIR, 'inventory_snapshots')
+# How many of the newest snapshots prune_inventory_snapshots keeps
+INVENTORY_SNAPSHOT_KEEP = 100
+
 PKG_SIZES = ["Net wt. 1/8 oz", "Net wt. 1/4 oz", "Net wt. 1/2 oz", "Net wt. 1 oz", "Net wt. 2 oz", "Net wt. 1/4 lb", "Net wt. 1/2 lb", 
              "Net wt. 1 lb", "Net wt. 2½ lb", "Net wt. 5 lb", "Approx. 10 seeds", "Approx. 15 seeds", "Approx. 20 seeds", "Approx. 20-25 seeds", "Approx. 25 seeds", 
              "Approx. 25-30 seeds", "Approx. 30 seeds", "Approx. 30-35 seeds", "Approx. 35 seeds", "Approx. 40 seeds", "Approx. 50 seeds", 
@@ -0,0 +1,121 @@
+"""
+Versioned caching for the analytics endpoints.
+
+Cached values are keyed by the current version of each data domain they read from
+(online orders, store orders, sales, lots, products). A save or delete of any model in a
+domain bumps that domain's version once the transaction commits (receivers in
+products/signals.py), so every cached value built from the old data simply stops being
+looked up. Versions live in the shared cache (the file-based backend in settings), so
+all web workers see the same ones.
+
+Code that writes a domain's tables with update(), bulk_create(), bulk_update() or raw SQL,
+or writes a table not listed in DOMAIN_MODELS, bypasses the signals and must call
+invalidate() itself.
+"""
+import functools
+import hashlib
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+ANALYTICS_TIMEOUT = 60 * 60 * 6
+
+# domain -> models ("app_label" for a whole app, "app_label.Model" for one model)
+# Tables only written in bulk (order lines, the ProductSalesYear / StoreSalesDaily rollups,
+# the envelope map) are left out: a delete receiver costs a model Django's fast delete, so
+# their writers call invalidate() instead.
+DOMAIN_MODELS = {
+    'online_orders': ['orders.OnlineOrder'],
+    'store_orders': [
+        'stores.Store', 'stores.StoreOrder', 'stores.SOIncludes', 'stores.StoreReturns',
+        'stores.WholesalePktPrice',
+    ],
+    'sales': ['products.Sales', 'products.MiscSales', 'products.LabelPrint'],
+    'lots': ['lots.Grower', 'lots.Lot', 'lots.RetiredLot', 'lots.Inventory', 'lots.Germination'],
+    'products': ['products.Variety', 'products.Product', 'products.MiscProduct'],
+}
+
+_MISSING = object()
+
+# domains waiting for a commit, per thread (each thread has its own connection)
+_pending = threading.local()
+
+
+def _version_key(domain):
+    return f"cache_version:{domain}"
+
+
+def domain_versions(domains):
+    """
+    Current version of each domain, in order (one cache round trip).
+    A missing version (never set, or culled) starts at the current time, so it can't
+    collide with a version used before.
+    """
+    versions = cache.get_many([_version_key(domain) for domain in domains])
+    result = []
+    for domain in domains:
+        version = versions.get(_version_key(domain))
+        if version is None:
+            cache.add(_version_key(domain), time.time_ns(), None)
+            version = cache.get(_version_key(domain))
+        result.append(version)
+    return result
+
+
+def _bump(domains):
+    now = time.time_ns()
+    cache.set_many({_version_key(domain): now for domain in domains}, None)
+
+
+def invalidate(*domains):
+    """
+    Bump the domains' versions once the current transaction commits (right away outside one).
+    Domains invalidated before a commit are collected in one set and bumped by the first of
+    their callbacks to run, so saving thousands of rows doesn't mean thousands of cache writes.
+    Callbacks dropped by a rollback leave their domains in the set for the next commit,
+    which only costs an extra bump.
+    """
+    for domain in domains:
+        if domain not in DOMAIN_MODELS:
+            raise ValueError(f"Unknown cache domain: {domain}")
+
+    pending = getattr(_pending, 'domains', None)
+    if pending is None:
+        pending = _pending.domains = set()
+    pending.update(domains)
+
+    def bump():
+        if getattr(_pending, 'domains', None) is pending:
+            _pending.domains = None
+            _bump(pending)
+
+    transaction.on_commit(bump)
+
+
+def versioned_cache(*domains, timeout=ANALYTICS_TIMEOUT):
+    """
+    Cache a function's return value until any of the domains changes.
+    Arguments become part of the key, so pass plain values (years, sku prefixes), not
+    model instances. The undecorated function is available as .uncached.
+    """
+    def decorator(func):
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            versions = ":".join(str(version) for version in domain_versions(domains))
+            call = hashlib.md5(repr((args, sorted(kwargs.items()))).encode()).hexdigest()
+            key = f"analytics:{name}:{versions}:{call}"
+
+            value = cache.get(key, _MISSING)
+            if value is _MISSING:
+                value = func(*args, **kwargs)
+                cache.set(key, value, timeout)
+            return value
+
+        wrapper.uncached = func
+        return wrapper
+
+    return decorator